@@ -1,3 +1,223 @@
-from django.contrib import admin
+"""
+Admin of aliases, which stays fast on tables of millions of rows.
 
-# Register your models here.
+The default admin counts all rows for every page, lists distinct values of
+filtered fields and searches with unindexed icontains conditions. Here counts
+are capped and estimated, filters and search are conditions of indexes, and
+bulk actions write in batches.
+"""
+import datetime
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import ActiveAlias, Alias
+from .search import prefix_condition
+
+
+def estimate_rows(queryset):
+    """Return estimated number of rows of the table of queryset: statistics of the database, else the max pk."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    row = None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 exists once ANALYZE ran, the first number of a stat is the number of rows.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+    estimate = int(str(row[0]).split()[0]) if row and row[0] else 0
+    if estimate > 0:
+        return estimate
+    return queryset.model.objects.using(queryset.db).aggregate(Max('pk'))['pk__max'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, which counts at most count_limit rows.
+
+    Larger unfiltered lists use the estimated table size, larger filtered
+    lists report count_limit + 1 rows, so pages after it are not linked.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        count = queryset.order_by()[:self.count_limit + 1].count()
+        if count <= self.count_limit or queryset.query.where:
+            return count
+        return max(count, estimate_rows(queryset))
+
+
+class TargetFilter(admin.SimpleListFilter):
+    """Exact target typed into a text input, targets are not listed: that reads the whole index."""
+    title = 'target'
+    parameter_name = 'target'
+    template = 'admin/alias/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return [(self.value(), self.value())] if self.value() else []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+            'parameter_name': self.parameter_name,
+            'value': self.value() or '',
+            # Other parameters of the list are kept by hidden inputs of the form.
+            'params': [(name, value) for name, value in changelist.params.items()
+                       if name not in (self.parameter_name, 'p')],
+        }
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(target=self.value())
+        return queryset
+
+
+class ActiveFilter(admin.SimpleListFilter):
+    title = 'state'
+    parameter_name = 'state'
+
+    def lookups(self, request, model_admin):
+        return [('active', 'Active now'), ('future', 'Not started'), ('ended', 'Ended')]
+
+    def queryset(self, request, queryset):
+        now = timezone.now()
+        if self.value() == 'active':
+            # The projection of active aliases is much smaller than the alias table.
+            if ActiveAlias.enabled():
+                return queryset.filter(pk__in=ActiveAlias.current(queryset.db).values('alias_pk'))
+            return queryset.filter(Q(start__lte=now) & Alias._ends_after(now))
+        if self.value() == 'future':
+            return queryset.filter(start__gt=now)
+        if self.value() == 'ended':
+            return queryset.filter(end__lte=now)
+        return queryset
+
+
+class StartFilter(admin.SimpleListFilter):
+    """
+    Years and months of start, a date hierarchy without SELECT DISTINCT of truncated dates.
+
+    Years are between the first and the last start, two probes of the start index.
+    """
+    title = 'start'
+    parameter_name = 'started'
+
+    def _period(self):
+        """Return (start, end) of the year or month of the value, raise IncorrectLookupParameters if invalid."""
+        try:
+            parts = [int(part) for part in self.value().split('-')]
+            if len(parts) == 1:
+                start = datetime.datetime(parts[0], 1, 1, tzinfo=timezone.utc)
+                return start, start.replace(year=start.year + 1)
+            if len(parts) == 2:
+                start = datetime.datetime(parts[0], parts[1], 1, tzinfo=timezone.utc)
+                if start.month == 12:
+                    return start, start.replace(year=start.year + 1, month=1)
+                return start, start.replace(month=start.month + 1)
+        except (ValueError, OverflowError):
+            pass
+        raise IncorrectLookupParameters(f'Invalid start period: {self.value()}')
+
+    def lookups(self, request, model_admin):
+        data = model_admin.get_queryset(request)
+        first = data.order_by('start').values_list('start', flat=True).first()
+        last = data.order_by('-start').values_list('start', flat=True).first()
+        if first is None:
+            return []
+        lookups = [(str(year), str(year)) for year in range(first.year, last.year + 1)]
+        year = self.value() and self.value().split('-')[0]
+        if year and year.isdigit():
+            lookups += [(f'{year}-{month:02d}', f'{year}-{month:02d}') for month in range(1, 13)]
+        return lookups
+
+    def queryset(self, request, queryset):
+        if self.value():
+            start, end = self._period()
+            return queryset.filter(start__gte=start, start__lt=end)
+        return queryset
+
+
+class AliasActionForm(ActionForm):
+    at = forms.DateTimeField(required=False, help_text='Moment of closing or replacing, now by default.')
+    new_alias = forms.CharField(required=False, max_length=120,
+                                help_text='New alias value of replacing, {alias} stands for the replaced value.')
+
+
+@admin.register(Alias)
+class AliasAdmin(admin.ModelAdmin):
+    list_display = ('alias', 'target', 'start', 'end')
+    list_filter = (ActiveFilter, TargetFilter, StartFilter)
+    search_fields = ('alias', 'target')
+    # Ordered by the primary key index.
+    ordering = ('-id',)
+    list_per_page = 100
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = AliasActionForm
+    actions = ('close_aliases', 'replace_aliases')
+
+    def get_search_results(self, request, queryset, search_term):
+        """Return aliases starting with the search term or of the target equal to it, both are index lookups."""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(prefix_condition(search_term) | Q(target=search_term)), False
+
+    def delete_queryset(self, request, queryset):
+        Alias.delete_many(queryset.values_list('pk', flat=True))
+
+    def _action_moment(self, request):
+        """Return the moment of the action form, None if it is invalid."""
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(request, 'Invalid moment of the action.', messages.ERROR)
+            return None
+        return form.cleaned_data['at'] or timezone.now()
+
+    def close_aliases(self, request, queryset):
+        at = self._action_moment(request)
+        if at is not None:
+            count = Alias.close_many(queryset.values_list('pk', flat=True), at)
+            self.message_user(request, f'{count} aliases closed.', messages.SUCCESS)
+
+    def replace_aliases(self, request, queryset):
+        at = self._action_moment(request)
+        if at is None:
+            return
+        new_alias = request.POST.get('new_alias', '')
+        if not new_alias:
+            self.message_user(request, 'New alias value is required.', messages.ERROR)
+            return
+        active = queryset.filter(Q(start__lte=at) & Alias._ends_after(at))
+        replacements = {alias: new_alias.replace('{alias}', alias)
+                        for alias in active.values_list('alias', flat=True).distinct()}
+        try:
+            created = Alias.alias_replace_many(replacements, at)
+        except ValidationError as error:
+            self.message_user(request, ' '.join(error.messages), messages.ERROR)
+            return
+        self.message_user(request, f'{len(created)} aliases replaced.', messages.SUCCESS)
+
+    close_aliases.short_description = 'Close selected aliases'
+    replace_aliases.short_description = 'Replace selected aliases'
@@ -0,0 +1,13 @@
+"""Bounded thread pool running blocking Alias database work for async code."""
+import asyncio
+
+from django.conf import settings
+
+from .utils import SettingExecutor
+
+_executor = SettingExecutor('ALIAS_ASYNC_WORKERS', lambda: getattr(settings, 'ALIAS_ASYNC_WORKERS', 8), 'alias-db')
+
+
+async def run_sync(func, *args, **kwargs):
+    """Await func(*args, **kwargs) called on the alias thread pool of ALIAS_ASYNC_WORKERS threads."""
+    return await asyncio.wrap_future(_executor.submit(func, *args, **kwargs))
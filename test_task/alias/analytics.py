@@ -0,0 +1,168 @@
+"""
+Timeline, gaps and coverage of the aliases of a target computed in SQL.
+
+Intervals are clipped to the time range by the query. Gaps are found with a
+running maximum of the ends (a window function). Coverage counts aliases per
+hour or day from a running sum of +1 at the bucket of every start and -1
+after the bucket of every end, so only buckets where the count changes are
+read. Rows are streamed from the cursor in chunks.
+"""
+import datetime
+from collections import Counter
+
+import pytz
+from django.conf import settings
+from django.db import connections, router
+from django.utils.dateparse import parse_datetime
+
+from .instrumentation import instrument
+from .models import Alias, AliasArchive, AliasArchiveCutoff
+from .sharding import shard_for
+
+# strftime format of bucket starts, SQLite modifier and step to the next bucket.
+BUCKETS = {
+    'hour': ('%Y-%m-%d %H:00:00', '+1 hour', datetime.timedelta(hours=1)),
+    'day': ('%Y-%m-%d 00:00:00', '+1 day', datetime.timedelta(days=1)),
+}
+
+
+def _database(target: str):
+    return shard_for(target) or router.db_for_read(Alias)
+
+
+def _datetime(value):
+    """Return aware datetime of a value read from an expression, which SQLite returns as text."""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if settings.USE_TZ and value.tzinfo is None:
+        value = pytz.utc.localize(value)
+    return value
+
+
+def _bucket_start(moment: datetime, bucket: str):
+    moment = moment.astimezone(pytz.utc).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if bucket == 'day' else moment
+
+
+def _spans(connection, target: str, from_: datetime, to: datetime):
+    """
+    Return (sql, params) of (alias, span_start, span_end) of aliases of target clipped to the time range.
+
+    Archived aliases are included if the range reaches before the archive cutoff,
+    the cutoff is a condition of the query.
+    """
+    quote = connection.ops.quote_name
+    start, end = quote('start'), quote('end')
+    from_value = connection.ops.adapt_datetimefield_value(from_)
+    to_value = connection.ops.adapt_datetimefield_value(to)
+    params = [from_value, from_value, to_value, to_value, target, to_value, from_value]
+
+    # (table, extra condition, its params)
+    tables = [(Alias._meta.db_table, '', [])]
+    if AliasArchive.enabled():
+        cutoff = (f'SELECT 1 FROM {quote(AliasArchiveCutoff._meta.db_table)} '
+                  f'WHERE {quote("id")} = 1 AND {quote("cutoff")} > %s')
+        tables.append((AliasArchive._meta.db_table, f' AND EXISTS ({cutoff})', [from_value]))
+    sql = ' UNION ALL '.join(
+        f'SELECT {quote("alias")} AS alias, '
+        f'CASE WHEN {start} < %s THEN %s ELSE {start} END AS span_start, '
+        f'CASE WHEN {end} IS NULL OR {end} > %s THEN %s ELSE {end} END AS span_end '
+        f'FROM {quote(table)} WHERE {quote("target")} = %s AND {start} < %s AND ({end} > %s OR {end} IS NULL)'
+        f'{condition}'
+        for table, condition, _ in tables)
+    return sql, [value for _, _, extra in tables for value in params + extra]
+
+
+def _rows(connection, sql: str, params, chunk_size: int = 2000):
+    """Yield rows of a query fetched in chunks."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+
+
+@instrument('timeline')
+def timeline(target: str, from_: datetime, to: datetime):
+    """Yield (alias, start, end) of aliases of target clipped to the time range, ordered by start."""
+    connection = connections[_database(target)]
+    spans, params = _spans(connection, target, from_, to)
+    sql = f'SELECT alias, span_start, span_end FROM ({spans}) spans ORDER BY span_start, alias'
+    for alias, start, end in _rows(connection, sql, params):
+        yield alias, _datetime(start), _datetime(end)
+
+
+@instrument('gaps')
+def gaps(target: str, from_: datetime, to: datetime):
+    """Yield (start, end) of parts of the time range, where target has no alias."""
+    connection = connections[_database(target)]
+    spans, params = _spans(connection, target, from_, to)
+    from_value, to_value = (connection.ops.adapt_datetimefield_value(moment) for moment in (from_, to))
+    # A row at the end of the range closes the last gap; covered is the maximum end of the earlier rows.
+    sql = (f'WITH spans AS ({spans} UNION ALL SELECT NULL, %s, %s), '
+           f'covered AS (SELECT span_start, MAX(span_end) OVER ('
+           f'ORDER BY span_start ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS covered FROM spans) '
+           f'SELECT COALESCE(covered, %s), span_start FROM covered '
+           f'WHERE span_start > COALESCE(covered, %s) ORDER BY span_start')
+    last = None
+    for start, end in _rows(connection, sql, params + [to_value, to_value, from_value, from_value]):
+        start, end = _datetime(start), _datetime(end)
+        # Empty aliases split a gap in two.
+        if last and last[1] == start:
+            last = (last[0], end)
+            continue
+        if last:
+            yield last
+        last = (start, end)
+    if last:
+        yield last
+
+
+@instrument('coverage')
+def coverage(target: str, from_: datetime, to: datetime, bucket: str = 'hour'):
+    """Yield (bucket start, number of aliases active in the bucket) of every bucket of the time range."""
+    connection = connections[_database(target)]
+    step = BUCKETS[bucket][2]
+    changes = iter(_count_changes(connection, target, from_, to, bucket))
+    change = next(changes, None)
+    count = 0
+    moment = _bucket_start(from_, bucket)
+    while moment < to:
+        while change and change[0] <= moment:
+            count = change[1]
+            change = next(changes, None)
+        yield moment, count
+        moment += step
+
+
+def _count_changes(connection, target: str, from_: datetime, to: datetime, bucket: str):
+    """Yield (bucket start, number of aliases) of buckets, where the number changes."""
+    if connection.vendor != 'sqlite':
+        yield from _count_changes_python(target, from_, to, bucket)
+        return
+
+    format_, modifier, _ = BUCKETS[bucket]
+    spans, params = _spans(connection, target, from_, to)
+    # An alias ending at the start of a bucket is not active in it.
+    sql = (f'WITH spans AS ({spans}), deltas AS ('
+           f'SELECT strftime(%s, span_start) AS bucket, 1 AS delta FROM spans WHERE span_start < span_end '
+           f'UNION ALL SELECT CASE WHEN span_end > strftime(%s, span_end) THEN strftime(%s, span_end, %s) '
+           f'ELSE strftime(%s, span_end) END, -1 FROM spans WHERE span_start < span_end) '
+           f'SELECT bucket, SUM(SUM(delta)) OVER (ORDER BY bucket) FROM deltas GROUP BY bucket ORDER BY bucket')
+    for moment, count in _rows(connection, sql, params + [format_, format_, format_, modifier, format_]):
+        yield _datetime(moment), count
+
+
+def _count_changes_python(target: str, from_: datetime, to: datetime, bucket: str):
+    step = BUCKETS[bucket][2]
+    deltas = Counter()
+    for alias, start, end in timeline(target, from_, to):
+        if start < end:
+            deltas[_bucket_start(start, bucket)] += 1
+            deltas[_bucket_start(end - datetime.timedelta(microseconds=1), bucket) + step] -= 1
+    count = 0
+    for moment in sorted(deltas):
+        count += deltas[moment]
+        yield moment, count
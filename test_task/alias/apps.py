@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class AliasConfig(AppConfig):
     name = 'alias'
+
+    def ready(self):
+        from .instrumentation import install_query_wrapper
+        from .search import install_search_triggers_after_migrate
+        from .sqlite import apply_pragmas, install_trigger_after_migrate
+
+        connection_created.connect(apply_pragmas)
+        connection_created.connect(install_query_wrapper)
+        post_migrate.connect(install_trigger_after_migrate, sender=self)
+        post_migrate.connect(install_search_triggers_after_migrate, sender=self)
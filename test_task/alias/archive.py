@@ -0,0 +1,97 @@
+"""Archival of aliases ended before a cutoff into AliasArchive, with compaction of adjacent intervals."""
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ActiveAlias, Alias, AliasArchive, AliasArchiveCutoff
+
+
+def _merge(intervals):
+    """Return sorted (start, end) intervals with adjacent ones merged, intervals of a pair do not overlap."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _store(rows, using):
+    """
+    Add (alias, target, start, end) rows to the archive, merged with adjacent archived intervals.
+
+    Intervals of alias values, which are used by several targets, are not merged.
+
+    Return:
+        number of archive rows added (negative if rows joined archived intervals).
+    """
+    pairs = defaultdict(list)
+    for alias, target, start, end in rows:
+        pairs[alias, target].append((start, end))
+
+    # resolve() prefers the latest start among targets of an alias value, which merging
+    # moves earlier, so intervals of alias values of several targets are kept apart.
+    targets = defaultdict(set)
+    for model in (Alias, AliasArchive):
+        data = model.objects.using(using).filter(alias__in={alias for alias, _ in pairs})
+        for alias, target in data.values_list('alias', 'target').distinct():
+            targets[alias].add(target)
+    shared = {alias for alias, alias_targets in targets.items() if len(alias_targets) > 1}
+
+    # Archived intervals, which end where a row starts or start where it ends.
+    data = AliasArchive.objects.using(using).filter(alias__in={alias for alias, _ in pairs},
+                                                    target__in={target for _, target in pairs})
+    data = data.filter(Q(end__in={row[2] for row in rows}) | Q(start__in={row[3] for row in rows}))
+    neighbours = []
+    for pk, alias, target, start, end in data.values_list('pk', 'alias', 'target', 'start', 'end'):
+        if (alias, target) in pairs and alias not in shared:
+            neighbours.append(pk)
+            pairs[alias, target].append((start, end))
+
+    archived = [AliasArchive(alias=alias, target=target, start=start, end=end)
+                for (alias, target), intervals in pairs.items()
+                for start, end in (sorted(intervals) if alias in shared else _merge(intervals))]
+    AliasArchive.objects.using(using).filter(pk__in=neighbours).delete()
+    AliasArchive.objects.using(using).bulk_create(archived)
+    return len(archived) - len(neighbours)
+
+
+def archive(cutoff, using, chunk_size=1000):
+    """
+    Move aliases of the using database, which ended at cutoff or before it, to the archive.
+
+    The cutoff is advanced first, so readers consult the archive for the whole
+    range before any alias leaves the alias table. Every chunk is moved in a
+    transaction: rows are deleted from the alias table (and the projection of
+    active aliases) and added to the archive. Merged intervals cover the same
+    time and only alias values of a single target are merged, so moving does
+    not change results of reads, cached data stays valid and no changes are
+    recorded.
+
+    Return:
+        dict with numbers of archived aliases and of archive rows added.
+    """
+    # Reads consult the archive only with ALIAS_ARCHIVE, moved aliases would be lost to them otherwise.
+    if not AliasArchive.enabled():
+        raise ImproperlyConfigured('Archiving aliases requires ALIAS_ARCHIVE = True.')
+    if cutoff > timezone.now():
+        raise ValueError('Archive cutoff can not be in the future.')
+    AliasArchiveCutoff.advance(cutoff, using)
+
+    report = {'archived': 0, 'rows': 0}
+    data = Alias.objects.using(using).filter(end__lte=cutoff).order_by('pk')
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(data.values_list('pk', 'alias', 'target', 'start', 'end')[:chunk_size])
+            if not rows:
+                break
+            pks = [row[0] for row in rows]
+            report['rows'] += _store([row[1:] for row in rows], using)
+            Alias.objects.using(using).filter(pk__in=pks).delete()
+            ActiveAlias.objects.using(using).filter(alias_pk__in=pks).delete()
+        report['archived'] += len(rows)
+    return report
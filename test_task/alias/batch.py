@@ -0,0 +1,184 @@
+"""
+Vectorized resolution of many (alias, moment) pairs with NumPy.
+
+NumPy is an optional dependency, it is imported by BatchResolver only.
+"""
+import heapq
+import itertools
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+
+from .index import to_microseconds
+from .models import Alias, AliasArchive
+from .sharding import fan_out, get_databases
+from .utils import chunks
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Open ends of intervals.
+NEVER = 2 ** 63 - 1
+
+
+def _segments(intervals):
+    """
+    Yield disjoint (start, end, target code) segments of intervals of one alias.
+
+    Every moment of a segment resolves to its target like Alias.resolve does:
+    to the latest started interval active at the moment.
+    """
+    intervals = sorted(intervals)
+    bounds = sorted({bound for start, end, target in intervals for bound in (start, end)})
+    active, position, segment = [], 0, None
+    for start, end in zip(bounds, bounds[1:]):
+        while position < len(intervals) and intervals[position][0] <= start:
+            interval_start, interval_end, target = intervals[position]
+            heapq.heappush(active, (-interval_start, interval_end, target))
+            position += 1
+        # Intervals ended before the top one are removed once they get to the top.
+        while active and active[0][1] <= start:
+            heapq.heappop(active)
+        target = active[0][2] if active else None
+        if segment and segment[2] == target and segment[1] == start:
+            segment = (segment[0], end, target)
+            continue
+        if segment and segment[2] is not None:
+            yield segment
+        segment = (start, end, target)
+    if segment and segment[2] is not None:
+        yield segment
+
+
+class BatchResolver:
+    """
+    Resolve (alias, moment) pairs to targets with vectorized searches.
+
+    Intervals are loaded once into int64 arrays of microseconds and category
+    codes of aliases and targets. Overlapping intervals of an alias are split
+    into disjoint segments resolving to one target, then segments are sorted
+    by a combined key: alias code and the rank of the segment start among all
+    segment starts. A pair is resolved by one searchsorted of its key.
+    """
+
+    def __init__(self, rows):
+        """Build arrays of (alias, target, start, end) rows, use load() to read them from the database."""
+        if np is None:
+            raise ImproperlyConfigured('BatchResolver requires NumPy, install it with `pip install numpy`.')
+
+        rows = [(alias, target, to_microseconds(start), to_microseconds(end, default=NEVER))
+                for alias, target, start, end in rows]
+        self.aliases = np.unique(np.array([row[0] for row in rows], dtype=str))
+        self.targets, target_codes = np.unique(np.array([row[1] for row in rows], dtype=str), return_inverse=True)
+        alias_codes = np.searchsorted(self.aliases, np.array([row[0] for row in rows], dtype=str))
+        starts = np.array([row[2] for row in rows], dtype=np.int64)
+        ends = np.array([row[3] for row in rows], dtype=np.int64)
+
+        order = np.lexsort((starts, alias_codes))
+        alias_codes, target_codes = alias_codes[order], target_codes[order]
+        starts, ends = starts[order], ends[order]
+
+        # Sorted by start, intervals of an alias overlap if any of them overlaps the next one.
+        same_alias = alias_codes[1:] == alias_codes[:-1]
+        overlapping = np.unique(alias_codes[1:][same_alias & (starts[1:] < ends[:-1])])
+        plain = ~np.isin(alias_codes, overlapping)
+        segments = [(alias_codes[plain], starts[plain], ends[plain], target_codes[plain])]
+        for code in overlapping:
+            lo, hi = np.searchsorted(alias_codes, code), np.searchsorted(alias_codes, code, side='right')
+            split = np.array(list(_segments(zip(starts[lo:hi].tolist(), ends[lo:hi].tolist(),
+                                                target_codes[lo:hi].tolist()))), dtype=np.int64)
+            if len(split):
+                segments.append((np.full(len(split), code), split[:, 0], split[:, 1], split[:, 2]))
+
+        alias_codes, starts, ends, target_codes = (np.concatenate(column) for column in zip(*segments))
+        order = np.lexsort((starts, alias_codes))
+        self.alias_codes, self.starts = alias_codes[order], starts[order]
+        self.ends, self.target_codes = ends[order], target_codes[order]
+
+        # Ranks of starts keep combined keys small: codes times the number of starts plus a rank.
+        self.bounds = np.unique(self.starts)
+        self.keys = self._keys(self.alias_codes, self.starts)
+
+    @classmethod
+    def load(cls, aliases=None, from_=None, to=None, chunk_size=500):
+        """
+        Return resolver of aliases stored in all databases.
+
+        Archived aliases are included if from_ is before the archive cutoff.
+
+        Keyword arguments:
+            aliases -- only these alias values, all by default.
+            from_, to -- only intervals active in this time range, all by default.
+            chunk_size -- number of alias values per query.
+        """
+        condition = Q()
+        if from_ is not None:
+            condition &= Alias._ends_after(Alias._moment(from_))
+        if to is not None:
+            condition &= Q(start__lt=Alias._moment(to))
+        values = sorted(set(aliases)) if aliases is not None else None
+
+        def querysets(using):
+            yield Alias.objects.db_manager(using).filter(condition)
+            if from_ is not None:
+                yield AliasArchive.before(Alias._moment(from_), using).filter(condition)
+            elif AliasArchive.enabled():
+                yield AliasArchive.objects.db_manager(using).filter(condition)
+
+        def rows(using):
+            result = []
+            for data in querysets(using):
+                if values is None:
+                    result.extend(data.values_list('alias', 'target', 'start', 'end').iterator(chunk_size=2000))
+                    continue
+                result.extend(row for chunk in chunks(values, chunk_size)
+                              for row in data.filter(alias__in=chunk).values_list('alias', 'target', 'start', 'end'))
+            return result
+
+        return cls(itertools.chain.from_iterable(fan_out(rows, get_databases())))
+
+    def _keys(self, alias_codes, moments):
+        ranks = np.searchsorted(self.bounds, moments, side='right')
+        return alias_codes.astype(np.int64) * (len(self.bounds) + 1) + ranks
+
+    @staticmethod
+    def _microseconds(moments):
+        """Return int64 array of microseconds of datetime64 array or of iterable of datetimes."""
+        if isinstance(moments, np.ndarray) and np.issubdtype(moments.dtype, np.datetime64):
+            return moments.astype('datetime64[us]').astype(np.int64)
+        return np.array([to_microseconds(Alias._moment(moment)) for moment in moments], dtype=np.int64)
+
+    def resolve(self, aliases, moments):
+        """
+        Return object array of targets of aliases at moments, None where an alias is not active.
+
+        Keyword arguments:
+            aliases -- array or sequence of alias values.
+            moments -- datetime64 array (UTC) or sequence of datetimes of the same length.
+        """
+        aliases = np.asarray(aliases, dtype=str)
+        moments = self._microseconds(moments)
+        if len(aliases) != len(moments):
+            raise ValueError('Aliases and moments have to be of the same length.')
+        result = np.full(len(aliases), None, dtype=object)
+        if not len(self.keys) or not len(aliases):
+            return result
+
+        codes = np.searchsorted(self.aliases, aliases)
+        known = codes < len(self.aliases)
+        known[known] = self.aliases[codes[known]] == aliases[known]
+
+        # The last segment of the alias starting at the moment or before it.
+        positions = np.searchsorted(self.keys, self._keys(codes, moments), side='right') - 1
+        found = known & (positions >= 0)
+        positions = np.where(found, positions, 0)
+        found &= (self.alias_codes[positions] == codes) & (self.ends[positions] > moments)
+        result[found] = self.targets[self.target_codes[positions[found]]].astype(object)
+        return result
+
+    def resolve_chunks(self, chunks):
+        """Yield resolved targets of every (aliases, moments) chunk, so memory is bounded by the chunk size."""
+        for aliases, moments in chunks:
+            yield self.resolve(aliases, moments)
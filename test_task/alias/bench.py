@@ -0,0 +1,186 @@
+"""Synthetic data and timing helpers for benchmarking the alias subsystem."""
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+import pytz
+from django.db import connections
+
+from .models import Alias
+from .utils import QueryCounter
+
+BASE_MOMENT = datetime.datetime(2021, 1, 1, tzinfo=pytz.utc)
+
+
+def generate_aliases(targets=1000, aliases_per_target=10, interval=datetime.timedelta(days=1), open_ratio=0.1,
+                     seed=0, batch_size=5000, using='default', interval_spread=0.5):
+    """
+    Insert a synthetic non-overlapping dataset with bulk_create.
+
+    Keyword arguments:
+        targets -- number of targets.
+        aliases_per_target -- number of aliases of every target.
+        interval -- the average length of a finite alias.
+        open_ratio -- share of open-ended aliases.
+        interval_spread -- lengths are uniform in interval * (1 +- interval_spread).
+        seed -- seed of the random generator.
+        batch_size -- number of rows per bulk_create.
+        using -- the database alias.
+
+    Return:
+        the number of inserted rows.
+    """
+    rand = random.Random(seed)
+    seconds = interval.total_seconds()
+    batch, count = [], 0
+
+    for target_number in range(targets):
+        target = f'target-{target_number}'
+        for alias_number in range(aliases_per_target):
+            # Distinct alias values of a target never overlap.
+            start = BASE_MOMENT + datetime.timedelta(seconds=rand.uniform(0, seconds * aliases_per_target))
+            end = None
+            if rand.random() >= open_ratio:
+                end = start + datetime.timedelta(seconds=rand.uniform(1 - interval_spread, 1 + interval_spread) * seconds)
+            batch.append(Alias(alias=f'{target}-alias-{alias_number}', target=target, start=start, end=end))
+
+            if len(batch) >= batch_size:
+                Alias.objects.using(using).bulk_create(batch)
+                count += len(batch)
+                batch = []
+
+    Alias.objects.using(using).bulk_create(batch)
+    return count + len(batch)
+
+
+@contextmanager
+def temporary_database(using='default', name=None):
+    """
+    Run the block against a new test database, like the test runner does, and destroy it afterwards.
+
+    Keyword arguments:
+        name -- name of the test database instead of the TEST NAME setting.
+            SQLite uses a temporary file by default: concurrent writers of an
+            in-memory database fail on table locks, and the in-memory test
+            database of the test runner has the same name.
+    """
+    # A new connection of this thread, the current one may be an in-memory SQLite
+    # database of the test runner, which does not close.
+    old_connection = connections[using]
+    connection = old_connection.__class__(old_connection.settings_dict, using)
+    connections[using] = connection
+    if name is None and connection.vendor == 'sqlite':
+        name = os.path.join(tempfile.gettempdir(), f'alias_bench_{os.getpid()}.sqlite3')
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if name:
+        test_settings['NAME'] = name
+    old_name = connection.settings_dict['NAME']
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        test_settings['NAME'] = old_test_name
+        connections[using] = old_connection
+
+
+def random_windows(targets, span, window=datetime.timedelta(hours=6), count=1000, seed=0):
+    """Return list of (target, from_, to) lookups over the generated dataset."""
+    rand = random.Random(seed)
+    windows = []
+    for _ in range(count):
+        from_ = BASE_MOMENT + datetime.timedelta(seconds=rand.uniform(0, span.total_seconds()))
+        windows.append((f'target-{rand.randrange(targets)}', from_, from_ + window))
+    return windows
+
+
+def latency_report(wall_seconds, results):
+    """
+    Summarize results of alias.loadtest drivers.
+
+    Return:
+        dict with throughput, latency percentiles in milliseconds and error rate.
+    """
+    latencies = [latency * 1000 for name, status, latency in results]
+    errors = sum(1 for name, status, latency in results if status is None or status >= 400)
+    return {
+        'requests': len(results),
+        'seconds': wall_seconds,
+        'throughput_rps': len(results) / wall_seconds if wall_seconds else None,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'error_rate': errors / len(results) if results else None,
+    }
+
+
+def percentile(values, percent):
+    """Return the percent-th percentile of values (nearest rank)."""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def sample_aliases(count, seed=0, using='default'):
+    """Return up to count random (alias, target, start, end) rows of the table, ids are probed at random."""
+    rand = random.Random(seed)
+    data = Alias.objects.using(using)
+    first = data.order_by('pk').values_list('pk', flat=True).first()
+    last = data.order_by('-pk').values_list('pk', flat=True).first()
+    if first is None:
+        return []
+    ids = rand.sample(range(first, last + 1), min(count, last - first + 1))
+    return list(data.filter(pk__in=ids).values_list('alias', 'target', 'start', 'end'))
+
+
+def peak_memory(func, calls):
+    """Return peak memory in bytes allocated while calling func with argument tuples of calls."""
+    tracemalloc.start()
+    try:
+        for args in calls:
+            func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, calls, using='default', memory_calls=0):
+    """
+    Call func with every argument tuple of calls and report its latency.
+
+    Peak memory is measured separately on the last memory_calls calls, since
+    tracemalloc slows the calls down.
+
+    Return:
+        dict with latency percentiles in milliseconds, queries per call and peak memory.
+    """
+    calls = list(calls)
+    memory = peak_memory(func, calls[len(calls) - memory_calls:]) if memory_calls else None
+    calls = calls[:len(calls) - memory_calls]
+
+    latencies = []
+    with QueryCounter(using=using) as counter:
+        for args in calls:
+            start = time.perf_counter()
+            func(*args)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'calls': len(latencies),
+        'mean_ms': statistics.mean(latencies) if latencies else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'queries_per_call': counter.count / len(latencies) if latencies else None,
+        'peak_memory_bytes': memory,
+    }
@@ -0,0 +1,205 @@
+"""Bulk import of aliases with overlap validation done in memory."""
+import bisect
+import csv
+import json
+import math
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from .index import to_microseconds
+from .models import Alias, AliasArchive
+from .sharding import shard_for
+
+FIELDS = ('alias', 'target', 'start', 'end')
+
+
+def read_rows(stream, format_='csv'):
+    """
+    Stream rows of an import file.
+
+    Keyword arguments:
+        stream -- text file object.
+        format_ -- 'csv' (with a header row) or 'jsonl'.
+
+    Return:
+        iterator of (line number, row dict).
+    """
+    if format_ == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format_ == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as error:
+                    yield line_number, {'__error__': f'Invalid JSON: {error}'}
+    else:
+        raise ValueError(f'Unknown import format: {format_}')
+
+
+def _build_alias(row: dict):
+    """Return an Alias instance of an import row, raise ValidationError for invalid rows."""
+    if not isinstance(row, dict):
+        raise ValidationError('Row has to be an object!')
+    if '__error__' in row:
+        raise ValidationError(row['__error__'])
+
+    alias = Alias(**{field: row.get(field) or None for field in FIELDS})
+    alias.clean_fields()
+    alias.start = Alias._add_timezone(alias.start)
+    if alias.end:
+        alias.end = Alias._add_timezone(alias.end)
+    alias._alias_params_check()
+    return alias
+
+
+class _Interval:
+    __slots__ = ('line', 'row', 'alias', 'start', 'end')
+
+    def __init__(self, line, row, alias):
+        self.line, self.row, self.alias = line, row, alias
+        self.start = to_microseconds(alias.start)
+        self.end = to_microseconds(alias.end)
+
+
+def _existing_intervals(candidates, using):
+    """Return sorted (starts, ends) of stored aliases per (alias, target) of candidates with one query."""
+    aliases = {item.alias.alias for item in candidates}
+    targets = {item.alias.target for item in candidates}
+    data = Alias.objects.using(using).filter(alias__in=aliases, target__in=targets)
+
+    # Only rows which may overlap with the chunk.
+    first_start = min(item.alias.start for item in candidates)
+    data = data.filter(Alias._ends_after(first_start))
+    archived = AliasArchive.before(first_start, using).filter(alias__in=aliases, target__in=targets,
+                                                              end__gt=first_start)
+    if all(item.alias.end for item in candidates):
+        last_end = max(item.alias.end for item in candidates)
+        data = data.filter(start__lt=last_end)
+        archived = archived.filter(start__lt=last_end)
+
+    existing = defaultdict(list)
+    for rows in (data, archived):
+        for alias, target, start, end in rows.values_list('alias', 'target', 'start', 'end'):
+            existing[alias, target].append((to_microseconds(start), to_microseconds(end)))
+
+    result = {}
+    for key, intervals in existing.items():
+        intervals.sort()
+        result[key] = ([start for start, _ in intervals], [end for _, end in intervals])
+    return result
+
+
+def validate_chunk(candidates, using=DEFAULT_DB_ALIAS):
+    """
+    Check candidates for overlapping with stored aliases and with each other.
+
+    Stored aliases of an (alias, target) pair do not overlap, so ends are sorted
+    as well as starts, and a candidate overlaps a stored alias only if the last
+    alias starting before the candidate ends, ends after the candidate starts.
+    Remaining candidates are sorted by start and swept; the earlier starting
+    (then the earlier line) alias wins.
+
+    Return:
+        (accepted candidates, list of (candidate, message)).
+    """
+    existing = _existing_intervals(candidates, using)
+    groups = defaultdict(list)
+    rejected = []
+
+    for item in candidates:
+        key = item.alias.alias, item.alias.target
+        starts, ends = existing.get(key, ((), ()))
+        position = bisect.bisect_left(starts, item.end)
+        if position and ends[position - 1] > item.start:
+            rejected.append((item, 'Aliases can not overlap!'))
+        else:
+            groups[key].append(item)
+
+    accepted = []
+    for items in groups.values():
+        items.sort(key=lambda item: (item.start, item.line))
+        last_end = -math.inf
+        for item in items:
+            if item.start < last_end:
+                rejected.append((item, 'Aliases can not overlap with another row of the import!'))
+            else:
+                accepted.append(item)
+                last_end = item.end
+
+    return accepted, rejected
+
+
+def _import_chunk(chunk, using, report, on_error):
+    candidates = []
+    for line, row in chunk:
+        try:
+            candidates.append(_Interval(line, row, _build_alias(row)))
+        except ValidationError as error:
+            on_error(line, row, error.messages)
+        except (TypeError, ValueError) as error:
+            on_error(line, row, [str(error)])
+    report['rejected'] += len(chunk) - len(candidates)
+
+    # With ALIAS_SHARDS every row goes to the shard of its target.
+    databases = defaultdict(list)
+    for item in candidates:
+        databases[shard_for(item.alias.target) or using].append(item)
+
+    accepted, rejected = [], []
+    for database, items in databases.items():
+        with transaction.atomic(using=database):
+            database_accepted, database_rejected = validate_chunk(items, using=database)
+            created = Alias.objects.using(database).bulk_create([item.alias for item in database_accepted])
+            Alias._record_created(created, database)
+        accepted.extend(database_accepted)
+        rejected.extend(database_rejected)
+
+    Alias._invalidate(targets={item.alias.target for item in accepted},
+                      aliases={item.alias.alias for item in accepted})
+    report['created'] += len(accepted)
+    report['rejected'] += len(rejected)
+    for item, message in sorted(rejected, key=lambda pair: pair[0].line):
+        on_error(item.line, item.row, [message])
+
+
+def bulk_import(rows, chunk_size=500, using=DEFAULT_DB_ALIAS, on_error=None):
+    """
+    Import aliases in chunks.
+
+    Every chunk is validated in memory against stored aliases (fetched with one
+    query) and other rows, then valid rows are inserted with bulk_create in
+    a transaction of the chunk. Invalid rows are reported instead of aborting
+    the import.
+
+    Keyword arguments:
+        rows -- iterable of (line number, row dict) or of row dicts with alias, target, start and end.
+        chunk_size -- number of rows per chunk.
+        using -- the database alias, unless ALIAS_SHARDS are configured.
+        on_error -- callable(line, row, messages) for rejected rows; collected into the report if not given.
+
+    Return:
+        dict with numbers of created and rejected rows, and errors if on_error is not given.
+    """
+    report = {'created': 0, 'rejected': 0}
+    if on_error is None:
+        report['errors'] = []
+
+        def on_error(line, row, messages):
+            report['errors'].append({'line': line, 'row': row, 'errors': messages})
+
+    chunk = []
+    for number, row in enumerate(rows, start=1):
+        chunk.append(row if isinstance(row, tuple) else (number, row))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, using, report, on_error)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, using, report, on_error)
+
+    return report
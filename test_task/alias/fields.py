@@ -0,0 +1,78 @@
+import datetime
+
+import pytz
+from django.conf import settings
+from django.db import models
+from django.db.models.lookups import IsNull
+from django.utils import timezone
+
+# Stored instead of NULL for open-ended aliases in the sentinel storage mode.
+OPEN_END = datetime.datetime(9999, 12, 31, tzinfo=pytz.utc)
+_NAIVE_OPEN_END = OPEN_END.replace(tzinfo=None)
+
+
+def open_end_sentinel():
+    """Return True if open-ended aliases are stored as OPEN_END instead of NULL."""
+    return getattr(settings, 'ALIAS_OPEN_END_SENTINEL', False)
+
+
+def convert_open_ends(model, using, to_sentinel=True):
+    """
+    Convert stored open ends of model between NULL and OPEN_END.
+
+    Keyword arguments:
+        model -- the model with an OpenEndDateTimeField named end.
+        using -- the database alias.
+        to_sentinel -- convert NULL to OPEN_END if True, otherwise OPEN_END to NULL.
+
+    Return:
+        the number of converted rows.
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    end = connection.ops.quote_name(model._meta.get_field('end').column)
+    sentinel = connection.ops.adapt_datetimefield_value(OPEN_END)
+
+    with connection.cursor() as cursor:
+        # Raw SQL, since the isnull lookup of the field depends on the current mode.
+        if to_sentinel:
+            cursor.execute(f'UPDATE {table} SET {end} = %s WHERE {end} IS NULL', [sentinel])
+        else:
+            cursor.execute(f'UPDATE {table} SET {end} = NULL WHERE {end} = %s', [sentinel])
+        return cursor.rowcount
+
+
+class OpenEndDateTimeField(models.DateTimeField):
+    """
+    DateTimeField, where None means "never ends".
+
+    With ALIAS_OPEN_END_SENTINEL enabled None is stored as OPEN_END, so range
+    predicates become a single sargable `end > X` condition. Values read from
+    the database are always None for open ends.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        # Values are naive without USE_TZ.
+        if value is not None and value == (OPEN_END if timezone.is_aware(value) else _NAIVE_OPEN_END):
+            return None
+        return value
+
+    def get_prep_value(self, value):
+        if value is None and open_end_sentinel():
+            value = OPEN_END
+        return super().get_prep_value(value)
+
+
+@OpenEndDateTimeField.register_lookup
+class OpenEndIsNull(IsNull):
+    """Keep `end=None` and `end__isnull` filters working in the sentinel storage mode."""
+
+    def as_sql(self, compiler, connection):
+        if not open_end_sentinel():
+            return super().as_sql(compiler, connection)
+
+        sql, params = compiler.compile(self.lhs)
+        operator = '=' if self.rhs else '<>'
+        return f'{sql} {operator} %s', [*params, connection.ops.adapt_datetimefield_value(OPEN_END)]
@@ -0,0 +1,140 @@
+"""In-process interval index answering Alias.get_aliases without the database."""
+import datetime
+import math
+import threading
+from collections import OrderedDict
+
+import pytz
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+def to_microseconds(moment: datetime, default=math.inf):
+    """Return moment as integer microseconds since epoch, default for None."""
+    if moment is None:
+        return default
+    return (moment - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+class TargetIntervals:
+    """
+    Static interval tree of one target.
+
+    Intervals are sorted by start and form an implicit balanced tree: the node
+    of range [lo, hi) is its middle element, which keeps the max end of the
+    range. Range queries take O(log n + k log n) and skip subtrees ending
+    before the range.
+    """
+
+    def __init__(self, rows):
+        """rows -- iterable of (alias, start, end) with microsecond starts and ends (inf for open ends)."""
+        rows = sorted(rows, key=lambda row: row[1])
+        self.aliases = [row[0] for row in rows]
+        self.starts = [row[1] for row in rows]
+        self.ends = [row[2] for row in rows]
+        self.max_ends = list(self.ends)
+        self._build(0, len(rows))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return -math.inf
+        mid = (lo + hi) // 2
+        self.max_ends[mid] = max(self.ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_ends[mid]
+
+    def query(self, from_: int, to: int):
+        """Return set of aliases with start < to and end > from_."""
+        result = set()
+        self._query(0, len(self), from_, to, result)
+        return result
+
+    def _query(self, lo, hi, from_, to, result):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # Nothing in the subtree ends after the range starts.
+            if self.max_ends[mid] <= from_:
+                return
+            self._query(lo, mid, from_, to, result)
+            # The rest of the subtree starts after the range ends.
+            if self.starts[mid] >= to:
+                return
+            if self.ends[mid] > from_:
+                result.add(self.aliases[mid])
+            lo = mid + 1
+
+
+class AliasIntervalIndex:
+    """
+    Per-target interval trees, warmed lazily and invalidated on writes.
+
+    Holds at most ALIAS_INTERVAL_INDEX_TARGETS targets, least recently used
+    targets are dropped first.
+    """
+
+    def __init__(self):
+        self._targets = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load racing with a write is not stored.
+        self._generation = 0
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'ALIAS_INTERVAL_INDEX', False)
+
+    @staticmethod
+    def max_targets():
+        return getattr(settings, 'ALIAS_INTERVAL_INDEX_TARGETS', 10000)
+
+    def get_aliases(self, target: str, from_: datetime, to: datetime, load):
+        """
+        Return set of aliases of target in the time range.
+
+        Keyword arguments:
+            target -- the object to which alias refer.
+            from_ -- the starting point of time range.
+            to -- the ending point of time range.
+            load -- callable returning (alias, start, end) rows of a target.
+        """
+        with self._lock:
+            intervals = self._targets.get(target)
+            if intervals is not None:
+                self._targets.move_to_end(target)
+            generation = self._generation
+
+        if intervals is None:
+            intervals = TargetIntervals((alias, to_microseconds(start), to_microseconds(end))
+                                        for alias, start, end in load(target))
+            with self._lock:
+                if generation == self._generation:
+                    self._targets[target] = intervals
+                    while len(self._targets) > self.max_targets():
+                        self._targets.popitem(last=False)
+
+        return intervals.query(to_microseconds(from_), to_microseconds(to))
+
+    def invalidate(self, *targets):
+        """Drop intervals of targets, they are loaded again on the next lookup."""
+        with self._lock:
+            self._generation += 1
+            for target in targets:
+                self._targets.pop(target, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._targets.clear()
+
+
+interval_index = AliasIntervalIndex()
+
+
+@receiver(setting_changed)
+def _clear_interval_index(setting, **kwargs):
+    if setting in ('ALIAS_INTERVAL_INDEX', 'ALIAS_INTERVAL_INDEX_TARGETS', 'ALIAS_OPEN_END_SENTINEL'):
+        interval_index.clear()
@@ -0,0 +1,309 @@
+"""
+Opt-in instrumentation of Alias methods and views (ALIAS_INSTRUMENTATION).
+
+Every instrumented call records queries issued, database time, Python time
+(wall time minus database time) and rows fetched. Calls are aggregated into
+in-process histograms, and requests get a Server-Timing header. Generators
+and streamed responses are measured until they are exhausted or closed. With
+the setting off, an instrumented call costs one flag check and a query one
+context variable lookup.
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import Http404, JsonResponse
+from django.urls import Resolver404, resolve
+
+from .utils import AsyncCapableMiddleware
+
+# Histogram bucket upper bounds in milliseconds.
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+# Metrics of the calls in progress in the current context, innermost last.
+_active = contextvars.ContextVar('alias_instrumentation_active', default=())
+# Calls recorded during the current request.
+_request_calls = contextvars.ContextVar('alias_instrumentation_request', default=None)
+
+
+# Fetch methods of cursors, which count rows.
+_FETCHES = ('fetchone', 'fetchmany', 'fetchall')
+
+
+class _State:
+    enabled = False
+
+
+_state = _State()
+
+
+def _update_enabled():
+    _state.enabled = bool(getattr(settings, 'ALIAS_INSTRUMENTATION', False))
+
+
+class Metrics:
+    """Counters of one instrumented call or request."""
+    __slots__ = ('queries', 'db_time', 'rows')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+
+class Histogram:
+    """Latency histogram with totals of one instrumented operation."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.calls = 0
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.rows = 0
+
+    def record(self, total_ms, metrics):
+        self.counts[bisect.bisect_left(BUCKETS, total_ms)] += 1
+        self.calls += 1
+        self.total_ms += total_ms
+        self.db_ms += metrics.db_time * 1000
+        self.queries += metrics.queries
+        self.rows += metrics.rows
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': self.total_ms,
+            'db_ms': self.db_ms,
+            'python_ms': self.total_ms - self.db_ms,
+            'queries': self.queries,
+            'rows': self.rows,
+            'buckets_ms': {str(bound): count for bound, count in zip(BUCKETS, self.counts)},
+        }
+
+
+class Registry:
+    """In-process histograms of instrumented operations."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, total_ms, metrics):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(total_ms, metrics)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.as_dict() for name, histogram in sorted(self._histograms.items())}
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+def _record_query(execute, sql, params, many, context):
+    """Execute wrapper adding the query and the rows fetched by its cursor to every call in progress."""
+    cursor = context['cursor']
+    active = _active.get()
+    if not active:
+        # The cursor may have counted rows of an earlier query.
+        if _FETCHES[0] in vars(cursor):
+            for name in _FETCHES:
+                delattr(cursor, name)
+        return execute(sql, params, many, context)
+
+    # Rows are counted to the calls of the query, also if they are fetched after the calls returned.
+    for name in _FETCHES:
+        setattr(cursor, name, _counting_fetch(type(cursor).__getattr__(cursor, name), name == 'fetchone', active))
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for metrics in active:
+            metrics.queries += 1
+            metrics.db_time += duration
+
+
+def _counting_fetch(fetch, one, active):
+    def wrapper(*args):
+        result = fetch(*args)
+        rows = (result is not None) if one else len(result)
+        for metrics in active:
+            metrics.rows += rows
+        return result
+    return wrapper
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """connection_created receiver adding the query wrapper to the connection once."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _begin():
+    """Start a call, return (metrics, token, start) for _end."""
+    metrics = Metrics()
+    token = _active.set(_active.get() + (metrics,))
+    return metrics, token, time.perf_counter()
+
+
+def _end(name, metrics, token, start):
+    _active.reset(token)
+    _record(name, metrics, start)
+
+
+def _record(name, metrics, start):
+    total_ms = (time.perf_counter() - start) * 1000
+    registry.record(name, total_ms, metrics)
+    calls = _request_calls.get()
+    if calls is not None:
+        calls.append((name, total_ms, metrics))
+
+
+def _metered(iterator, metrics):
+    """Yield items of iterator, adding queries of every step to metrics."""
+    iterator = iter(iterator)
+    try:
+        while True:
+            token = _active.set(_active.get() + (metrics,))
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _active.reset(token)
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def _measure(name, func, args, kwargs):
+    metrics, token, start = _begin()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _end(name, metrics, token, start)
+
+
+def _measure_generator(name, func, args, kwargs):
+    metrics, start = Metrics(), time.perf_counter()
+    try:
+        yield from _metered(func(*args, **kwargs), metrics)
+    finally:
+        _record(name, metrics, start)
+
+
+def instrument(name):
+    """Decorator recording calls of a sync function as the name operation, generators until they are closed."""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator(*args, **kwargs):
+                if not _state.enabled:
+                    return func(*args, **kwargs)
+                return _measure_generator(name, func, args, kwargs)
+            return generator
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            return _measure(name, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _server_timing(total_ms, metrics, calls):
+    entries = [f'total;dur={total_ms:.3f}', f'db;dur={metrics.db_time * 1000:.3f};desc="queries={metrics.queries}"',
+               f'py;dur={total_ms - metrics.db_time * 1000:.3f};desc="rows={metrics.rows}"']
+    for number, (name, call_ms, call_metrics) in enumerate(calls):
+        entries.append(f'alias-{number}-{name};dur={call_ms:.3f};'
+                       f'desc="{name} queries={call_metrics.queries} rows={call_metrics.rows}"')
+    return ', '.join(entries)
+
+
+class AliasInstrumentationMiddleware(AsyncCapableMiddleware):
+    """Record every request as a view operation and add a Server-Timing header."""
+
+    def _call(self, request):
+        if not _state.enabled:
+            return self.get_response(request)
+
+        # Calls inside of the view are recorded by their own decorators.
+        calls = []
+        calls_token = _request_calls.set(calls)
+        metrics, token, start = _begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            _active.reset(token)
+            _request_calls.reset(calls_token)
+        return self._finish(self._name(request), response, calls, metrics, start)
+
+    async def _acall(self, request):
+        if not _state.enabled:
+            return await self.get_response(request)
+
+        calls = []
+        calls_token = _request_calls.set(calls)
+        metrics, token, start = _begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _active.reset(token)
+            _request_calls.reset(calls_token)
+        return self._finish(self._name(request), response, calls, metrics, start)
+
+    @staticmethod
+    def _name(request):
+        try:
+            return f'view:{resolve(request.path_info).view_name}'
+        except Resolver404:
+            return 'view:unresolved'
+
+    @staticmethod
+    def _finish(name, response, calls, metrics, start):
+        """Add the Server-Timing header, record the request when the response is complete."""
+        total_ms = (time.perf_counter() - start) * 1000
+        response['Server-Timing'] = _server_timing(total_ms, metrics, calls)
+        if not response.streaming:
+            registry.record(name, total_ms, metrics)
+            return response
+
+        # Queries of a streamed response run while it is sent, after the header, so only the histogram has them.
+        response.streaming_content = _metered(response.streaming_content, metrics)
+        response._resource_closers.append(
+            lambda: registry.record(name, (time.perf_counter() - start) * 1000, metrics))
+        return response
+
+
+def metrics(request):
+    """Return histograms of the instrumented operations of this process as JSON."""
+    if not _state.enabled:
+        raise Http404('Instrumentation is disabled.')
+    return JsonResponse({'buckets_ms': [str(bound) for bound in BUCKETS], 'operations': registry.snapshot()})
+
+
+@receiver(setting_changed)
+def _instrumentation_setting_changed(setting, **kwargs):
+    if setting == 'ALIAS_INSTRUMENTATION':
+        _update_enabled()
+
+
+_update_enabled()
@@ -0,0 +1,156 @@
+"""In-process HTTP drivers of the ASGI and WSGI applications, no server or network involved."""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+
+def default_host():
+    """Return a host name accepted by ALLOWED_HOSTS."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+class Request:
+    """HTTP request to send to an application."""
+    __slots__ = ('name', 'method', 'path', 'query', 'body', 'content_type')
+
+    def __init__(self, name, path, query=None, method='GET', body=b'', content_type=''):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.query = urlencode(query or {})
+        self.body = body
+        self.content_type = content_type
+
+
+async def asgi_call(application, request: Request):
+    """Send request to an ASGI application, return (status, body)."""
+    host = default_host()
+    headers = [(b'host', host.encode())]
+    if request.content_type:
+        headers.append((b'content-type', request.content_type.encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': request.method, 'path': request.path, 'raw_path': request.path.encode(), 'root_path': '',
+        'query_string': request.query.encode(), 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': (host, 80),
+    }
+    messages = [{'type': 'http.request', 'body': request.body, 'more_body': False}]
+    disconnected = asyncio.Event()
+    status, body = None, []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            body.append(message.get('body', b''))
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        disconnected.set()
+    return status, b''.join(body)
+
+
+def wsgi_call(application, request: Request):
+    """Send request to a WSGI application, return (status, body)."""
+    host = default_host()
+    environ = {
+        'REQUEST_METHOD': request.method, 'PATH_INFO': request.path, 'SCRIPT_NAME': '',
+        'QUERY_STRING': request.query, 'SERVER_NAME': host, 'SERVER_PORT': '80',
+        'HTTP_HOST': host, 'REMOTE_ADDR': '127.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': request.content_type, 'CONTENT_LENGTH': str(len(request.body)),
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(request.body),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line.split(' ', 1)[0]))
+
+    response = application(environ, start_response)
+    try:
+        body = b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return status[0], body
+
+
+def run_asgi(application, requests, concurrency, rps=None):
+    """
+    Send requests to an ASGI application with at most concurrency requests in flight.
+
+    With rps the load is an open loop: request number i arrives at i / rps
+    seconds whether earlier requests completed or not, and its latency is
+    measured from the arrival, so waiting for a free slot is included.
+
+    Return:
+        (wall seconds, list of (request name, status, latency seconds)).
+    """
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+
+        async def one(number, request):
+            if rps:
+                arrival = started + number / rps
+                await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            async with semaphore:
+                start = arrival if rps else time.perf_counter()
+                try:
+                    status, _ = await asgi_call(application, request)
+                except Exception:
+                    status = None
+                return request.name, status, time.perf_counter() - start
+
+        return await asyncio.gather(*(one(number, request) for number, request in enumerate(requests)))
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    return time.perf_counter() - start, results
+
+
+def run_wsgi(application, requests, concurrency, rps=None):
+    """
+    Send requests to a WSGI application from concurrency threads.
+
+    With rps requests arrive on the schedule of an open loop, see run_asgi.
+
+    Return:
+        (wall seconds, list of (request name, status, latency seconds)).
+    """
+    def one(request, arrival=None):
+        start = arrival or time.perf_counter()
+        try:
+            status, _ = wsgi_call(application, request)
+        except Exception:
+            status = None
+        return request.name, status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if not rps:
+            results = list(executor.map(one, requests))
+        else:
+            futures = []
+            for number, request in enumerate(requests):
+                arrival = start + number / rps
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                futures.append(executor.submit(one, request, arrival))
+            results = [future.result() for future in futures]
+    return time.perf_counter() - start, results
@@ -0,0 +1,120 @@
+"""Bounded in-process LRU cache with TTL, used for alias resolution."""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache, which entries expire after ttl seconds.
+
+    Entries may belong to a group (e.g. an alias value), so all entries of
+    the group can be invalidated at once without scanning the cache.
+
+    A value read from the database before an invalidation of its group must
+    not be cached after it: take generation(group) before the read and pass
+    it to set(), which skips the value if the group was invalidated since.
+    Generations are counted in a fixed number of slots, groups sharing a slot
+    only skip more values.
+    """
+    generation_slots = 4096
+
+    def __init__(self, max_size=10000, ttl=60, timer=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._generations = [0] * self.generation_slots
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._timer():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def generation(self, group):
+        """Return generation of group, to be passed to set() of a value read after it."""
+        with self._lock:
+            return self._generations[hash(group) % self.generation_slots]
+
+    def set(self, key, value, group=None, generation=None):
+        """Cache value, unless group was invalidated after generation was taken."""
+        with self._lock:
+            if generation is not None and generation != self._generations[hash(group) % self.generation_slots]:
+                return
+            self._remove(key)
+            self._entries[key] = (self._timer() + self.ttl, value, group)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *groups):
+        """Drop all entries of groups."""
+        with self._lock:
+            for group in groups:
+                self._generations[hash(group) % self.generation_slots] += 1
+                for key in self._groups.pop(group, ()):
+                    self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'max_size': self.max_size}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            keys = self._groups.get(entry[2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[entry[2]]
+
+
+_resolve_cache = None
+_resolve_cache_lock = threading.Lock()
+
+
+def get_resolve_cache():
+    """Return the cache of Alias.resolve configured by ALIAS_RESOLVE_CACHE, None if it is disabled."""
+    global _resolve_cache
+    config = getattr(settings, 'ALIAS_RESOLVE_CACHE', None)
+    if not config:
+        return None
+    if _resolve_cache is None:
+        with _resolve_cache_lock:
+            if _resolve_cache is None:
+                _resolve_cache = LRUCache(max_size=config.get('MAX_SIZE', 10000), ttl=config.get('TTL', 60))
+    return _resolve_cache
+
+
+def resolve_bucket_seconds():
+    return (getattr(settings, 'ALIAS_RESOLVE_CACHE', None) or {}).get('BUCKET', 60)
+
+
+@receiver(setting_changed)
+def _reset_resolve_cache(setting, **kwargs):
+    global _resolve_cache
+    if setting in ('ALIAS_RESOLVE_CACHE', 'ALIAS_OPEN_END_SENTINEL'):
+        _resolve_cache = None
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from alias import projection
+from alias.sharding import get_databases
+
+
+class Command(BaseCommand):
+    help = ('Rebuild, sweep or check the projection of active aliases (ALIAS_ACTIVE_PROJECTION). '
+            'Run sweep periodically to remove aliases, which have ended.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['rebuild', 'sweep', 'check'])
+        parser.add_argument('--database', help='Only this database, all shards by default.')
+
+    def handle(self, *args, **options):
+        databases = [options['database']] if options['database'] else [using or 'default'
+                                                                       for using in get_databases()]
+        inconsistent = False
+        for using in databases:
+            if options['action'] == 'rebuild':
+                self.stdout.write(f'{using}: {projection.rebuild(using)} active aliases projected.')
+            elif options['action'] == 'sweep':
+                self.stdout.write(f'{using}: {projection.sweep(using)} ended aliases removed.')
+            else:
+                report = projection.check(using)
+                for problem, pks in report.items():
+                    if pks:
+                        inconsistent = True
+                        self.stdout.write(f'{using}: {len(pks)} {problem}: {", ".join(map(str, pks[:20]))}')
+                if not any(report.values()):
+                    self.stdout.write(f'{using}: projection is consistent.')
+        if inconsistent:
+            raise CommandError('Projection is inconsistent, run the rebuild action.')
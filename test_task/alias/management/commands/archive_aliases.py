@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from alias.archive import archive
+from alias.models import Alias, AliasArchive
+from alias.sharding import get_databases
+
+
+class Command(BaseCommand):
+    help = ('Move aliases ended before a cutoff to the archive (ALIAS_ARCHIVE), merging adjacent '
+            'intervals of the same alias and target. Reads consult the archive only before the cutoff.')
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument('--before', help='Cutoff moment (ISO 8601).')
+        cutoff.add_argument('--days', type=int, default=365, help='Cutoff as days before now, 365 by default.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Aliases moved per transaction.')
+        parser.add_argument('--database', help='Only this database, all shards by default.')
+
+    def handle(self, *args, **options):
+        if not AliasArchive.enabled():
+            raise CommandError('Archived aliases are not read without ALIAS_ARCHIVE = True, enable it first.')
+        if options['before']:
+            cutoff = parse_datetime(options['before'])
+            if cutoff is None:
+                raise CommandError(f'Invalid cutoff: {options["before"]}')
+            cutoff = Alias._moment(cutoff)
+        else:
+            cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+
+        databases = [options['database']] if options['database'] else [using or 'default'
+                                                                       for using in get_databases()]
+        for using in databases:
+            try:
+                report = archive(cutoff, using, chunk_size=options['chunk_size'])
+            except ValueError as error:
+                raise CommandError(error)
+            self.stdout.write(f'{using}: {report["archived"]} aliases ended by {cutoff.isoformat()} archived, '
+                              f'{report["rows"]:+d} archive rows.')
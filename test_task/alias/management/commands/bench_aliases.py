@@ -0,0 +1,110 @@
+import datetime
+import json
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from alias.bench import generate_aliases, measure, random_windows, sample_aliases
+from alias.models import Alias
+
+SETTINGS = ('ALIAS_OPEN_END_SENTINEL', 'ALIAS_INTERVAL_INDEX', 'ALIAS_RESOLVE_CACHE', 'ALIAS_SHARED_CACHE')
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Benchmark public Alias methods on synthetic datasets of several sizes and print a JSON report '
+            '(p50/p95/p99 latency, queries per call, peak memory). Every dataset is generated inside '
+            'of a transaction, which is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,1000000,10000000',
+                            help='Comma separated dataset sizes in rows.')
+        parser.add_argument('--aliases-per-target', type=int, default=10)
+        parser.add_argument('--interval-hours', type=float, default=24, help='Average length of finite aliases.')
+        parser.add_argument('--interval-spread', type=float, default=0.5)
+        parser.add_argument('--open-ratio', type=float, default=0.1)
+        parser.add_argument('--calls', type=int, default=1000, help='Calls per method.')
+        parser.add_argument('--memory-calls', type=int, default=50, help='Calls per method traced for memory.')
+        parser.add_argument('--batch-targets', type=int, default=100, help='Targets per get_aliases_many call.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the report to a file instead of stdout.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        report = {
+            'revision': _git_revision(),
+            'database': connections[using].vendor,
+            'settings': {name: getattr(settings, name, None) for name in SETTINGS},
+            'options': {name: options[name] for name in ('aliases_per_target', 'interval_hours', 'interval_spread',
+                                                          'open_ratio', 'calls', 'seed')},
+            'runs': [],
+        }
+
+        for size in [int(size) for size in options['sizes'].split(',')]:
+            with transaction.atomic(using=using):
+                report['runs'].append(self.run(size, options))
+                transaction.set_rollback(True, using=using)
+            self.stderr.write(f'{size} rows done.')
+
+        output = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run(self, size, options):
+        using, calls, seed = options['database'], options['calls'], options['seed']
+        per_target = options['aliases_per_target']
+        targets = max(1, size // per_target)
+        interval = datetime.timedelta(hours=options['interval_hours'])
+        span = interval * per_target
+
+        started = time.perf_counter()
+        rows = generate_aliases(targets=targets, aliases_per_target=per_target, interval=interval,
+                                open_ratio=options['open_ratio'], interval_spread=options['interval_spread'],
+                                seed=seed, using=using)
+        run = {'rows': rows, 'generate_seconds': time.perf_counter() - started, 'methods': {}}
+        memory_calls = min(options['memory_calls'], calls)
+        total = calls + memory_calls
+
+        windows = random_windows(targets, span, count=total, seed=seed)
+        run['methods']['get_aliases'] = measure(Alias.get_aliases, windows, using=using, memory_calls=memory_calls)
+
+        batches = [([f'target-{(number * options["batch_targets"] + offset) % targets}'
+                     for offset in range(options['batch_targets'])], from_, to)
+                   for number, (target, from_, to) in enumerate(windows[:max(1, total // 10)])]
+        run['methods']['get_aliases_many'] = measure(Alias.get_aliases_many, batches, using=using,
+                                                     memory_calls=min(memory_calls, len(batches) // 2))
+
+        samples = sample_aliases(total * 2, seed=seed, using=using)
+        moments = [(alias, start + (end - start) / 2 if end else start + interval)
+                   for alias, target, start, end in samples]
+        run['methods']['resolve'] = measure(Alias.resolve, moments[:total], using=using, memory_calls=memory_calls)
+        run['methods']['active_aliases'] = measure(
+            Alias.active_aliases, [(target, at) for (alias, at), (_, target, _, _) in zip(moments, samples)][:total],
+            using=using, memory_calls=memory_calls)
+
+        # Every replaced alias and every new alias is used once.
+        replacements = [(alias, at, f'{alias}-replaced') for alias, at in moments[total:]]
+        run['methods']['alias_replace'] = measure(Alias.alias_replace, replacements, using=using,
+                                                  memory_calls=min(memory_calls, len(replacements) // 2))
+
+        def create(number, target, start):
+            Alias.objects.create(alias=f'bench-new-{number}', target=target, start=start, end=None)
+
+        creations = [(number, target, from_) for number, (target, from_, to) in enumerate(windows)]
+        run['methods']['save'] = measure(create, creations, using=using, memory_calls=memory_calls)
+
+        return run
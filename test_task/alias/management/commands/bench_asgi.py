@@ -0,0 +1,54 @@
+import datetime
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from alias.bench import BASE_MOMENT, generate_aliases, latency_report, temporary_database
+from alias.loadtest import Request, run_asgi, run_wsgi
+
+
+class Command(BaseCommand):
+    help = ('Compare concurrent-request throughput of the alias endpoints under the ASGI application '
+            '(async views) and the WSGI application, both driven in process against a temporary '
+            'test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--aliases-per-target', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--endpoint', choices=['aliases', 'resolve'], default='aliases')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            report = self.run(options)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, options):
+        from test_task.asgi import application as asgi_application
+        from test_task.wsgi import application as wsgi_application
+
+        per_target = options['aliases_per_target']
+        targets = max(1, options['rows'] // per_target)
+        generate_aliases(targets=targets, aliases_per_target=per_target, seed=options['seed'])
+
+        rand = random.Random(options['seed'])
+        requests = []
+        for _ in range(options['requests']):
+            target = rand.randrange(targets)
+            moment = BASE_MOMENT + datetime.timedelta(hours=rand.uniform(0, 24 * per_target))
+            if options['endpoint'] == 'aliases':
+                query = {'target': f'target-{target}', 'from': moment.isoformat(),
+                         'to': (moment + datetime.timedelta(hours=6)).isoformat()}
+                requests.append(Request('aliases', '/aliases/', query))
+            else:
+                query = {'alias': f'target-{target}-alias-{rand.randrange(per_target)}', 'at': moment.isoformat()}
+                requests.append(Request('resolve', '/resolve/', query))
+
+        report = {'endpoint': options['endpoint'], 'concurrency': options['concurrency']}
+        report['asgi'] = latency_report(*run_asgi(asgi_application, requests, options['concurrency']))
+        report['wsgi'] = latency_report(*run_wsgi(wsgi_application, requests, options['concurrency']))
+        report['asgi_to_wsgi_throughput'] = report['asgi']['throughput_rps'] / report['wsgi']['throughput_rps']
+        return report
@@ -0,0 +1,46 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test.utils import override_settings
+
+from alias.bench import generate_aliases, measure, random_windows
+from alias.fields import convert_open_ends
+from alias.models import Alias
+
+
+class Command(BaseCommand):
+    help = ('Compare get_aliases latency with NULL and sentinel open ends. '
+            'The dataset is generated inside of a transaction, which is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--targets', type=int, default=10000)
+        parser.add_argument('--aliases-per-target', type=int, default=10)
+        parser.add_argument('--open-ratio', type=float, default=0.1)
+        parser.add_argument('--lookups', type=int, default=1000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        interval = datetime.timedelta(days=1)
+        report = {}
+
+        with transaction.atomic(using=using):
+            with override_settings(ALIAS_OPEN_END_SENTINEL=False):
+                report['rows'] = generate_aliases(targets=options['targets'],
+                                                  aliases_per_target=options['aliases_per_target'],
+                                                  interval=interval, open_ratio=options['open_ratio'],
+                                                  using=using)
+                windows = random_windows(options['targets'], interval * options['aliases_per_target'],
+                                         count=options['lookups'])
+                report['null'] = measure(Alias.get_aliases, windows, using=using)
+
+            with override_settings(ALIAS_OPEN_END_SENTINEL=True):
+                convert_open_ends(Alias, using, to_sentinel=True)
+                report['sentinel'] = measure(Alias.get_aliases, windows, using=using)
+
+            transaction.set_rollback(True, using=using)
+
+        report['speedup_p50'] = report['null']['p50_ms'] / report['sentinel']['p50_ms']
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from alias.fields import convert_open_ends
+from alias.models import Alias
+
+
+class Command(BaseCommand):
+    help = 'Convert stored open ends of aliases between NULL and the sentinel (see ALIAS_OPEN_END_SENTINEL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=['sentinel', 'null'], default='sentinel',
+                            help='Storage representation of open ends to convert to.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            count = convert_open_ends(Alias, options['database'], to_sentinel=options['to'] == 'sentinel')
+        self.stdout.write(f'Converted {count} open-ended aliases to {options["to"]}.')
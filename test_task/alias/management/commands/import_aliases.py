@@ -0,0 +1,40 @@
+import json
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from alias.bulk import bulk_import, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Import aliases from a CSV (alias,target,start,end header) or JSONL file. '
+            'Rejected rows are written to the error report as JSON lines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Import file, "-" for stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format, guessed from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--errors', help='Error report file, stderr by default.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format_ = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        try:
+            input_file = nullcontext(sys.stdin) if path == '-' else open(path, newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+        errors_path = options['errors']
+        with input_file as stream, (open(errors_path, 'w') if errors_path else nullcontext(self.stderr)) as errors:
+            def on_error(line, row, messages):
+                errors.write(json.dumps({'line': line, 'row': row, 'errors': messages}, default=str) + '\n')
+
+            report = bulk_import(read_rows(stream, format_), chunk_size=options['chunk_size'],
+                                 using=options['database'], on_error=on_error)
+
+        self.stdout.write(f'Created {report["created"]} aliases, rejected {report["rejected"]} rows.')
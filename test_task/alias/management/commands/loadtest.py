@@ -0,0 +1,119 @@
+import datetime
+import json
+import logging
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from alias.bench import BASE_MOMENT, generate_aliases, latency_report, temporary_database
+from alias.loadtest import Request, run_asgi, run_wsgi
+from alias.models import Alias
+
+ENDPOINTS = ('list', 'aliases', 'resolve', 'replace')
+
+
+def parse_mix(value: str):
+    """Return dict of endpoint -> weight of a mix like list=1,aliases=4,resolve=4,replace=1."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError(f'Unknown endpoint in the mix: {name}, use {", ".join(ENDPOINTS)}.')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f'Invalid weight of {name}: {weight}')
+        if mix[name] < 0:
+            raise CommandError(f'Invalid weight of {name}: {weight}')
+    if not sum(mix.values()):
+        raise CommandError('The mix has no requests.')
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Load test the alias endpoints in process: a weighted mix of list, get_aliases, resolve and replace '
+            'requests arrives at a target rate (an open loop) to the ASGI and/or the WSGI application of '
+            'test_task. Data is generated in a temporary database, which is destroyed afterwards. '
+            'Reports throughput, p50/p99 latency and error rate per endpoint as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['asgi', 'wsgi', 'both'], default='both')
+        parser.add_argument('--rps', type=float, default=200, help='Target requests per second.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Maximum requests in flight.')
+        parser.add_argument('--mix', default='list=1,aliases=4,resolve=4,replace=1',
+                            help='Weights of endpoints: list, aliases, resolve, replace.')
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--aliases-per-target', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['rps'] <= 0 or options['duration'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('rps, duration and concurrency have to be positive.')
+        mix = parse_mix(options['mix'])
+        # The load writes aliases, so it always runs against a temporary database.
+        with temporary_database():
+            report = self.run(options, mix)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, options, mix):
+        from test_task.asgi import application as asgi_application
+        from test_task.wsgi import application as wsgi_application
+
+        per_target = options['aliases_per_target']
+        targets = max(1, options['rows'] // per_target)
+        generate_aliases(targets=targets, aliases_per_target=per_target, seed=options['seed'])
+
+        servers = ['asgi', 'wsgi'] if options['server'] == 'both' else [options['server']]
+        report = {'rps': options['rps'], 'duration': options['duration'], 'concurrency': options['concurrency'],
+                  'mix': mix}
+        for number, server in enumerate(servers):
+            requests = self.requests(options, mix, targets, prefix=f'loadtest-{number}')
+            application, run = (asgi_application, run_asgi) if server == 'asgi' else (wsgi_application, run_wsgi)
+            # Errors are counted by the report instead of logging a traceback per request.
+            logger = logging.getLogger('django.request')
+            level, logger.level = logger.level, logging.CRITICAL
+            try:
+                wall_seconds, results = run(application, requests, options['concurrency'], rps=options['rps'])
+            finally:
+                logger.setLevel(level)
+            report[server] = {
+                'total': latency_report(wall_seconds, results),
+                'endpoints': {name: latency_report(wall_seconds, [result for result in results if result[0] == name])
+                              for name in mix if mix[name]},
+            }
+        return report
+
+    @staticmethod
+    def requests(options, mix, targets, prefix):
+        """Return requests of the run, every replace request gets an alias of its own created here."""
+        per_target = options['aliases_per_target']
+        rand = random.Random(options['seed'])
+        names = rand.choices(list(mix), weights=list(mix.values()), k=int(options['rps'] * options['duration']))
+
+        # Replacements of separate aliases do not conflict, whatever order they complete in.
+        replaced = [Alias(alias=f'{prefix}-{number}', target=f'target-{number % targets}', start=BASE_MOMENT)
+                    for number in range(names.count('replace'))]
+        Alias.objects.bulk_create(replaced)
+        replaced = iter(replaced)
+
+        requests = []
+        for name in names:
+            target = rand.randrange(targets)
+            moment = BASE_MOMENT + datetime.timedelta(hours=rand.uniform(0, 24 * per_target))
+            if name == 'list':
+                requests.append(Request(name, '/', {'limit': 100, 'after': rand.randrange(targets * per_target)}))
+            elif name == 'aliases':
+                query = {'target': f'target-{target}', 'from': moment.isoformat(),
+                         'to': (moment + datetime.timedelta(hours=6)).isoformat()}
+                requests.append(Request(name, '/aliases/', query))
+            elif name == 'resolve':
+                query = {'alias': f'target-{target}-alias-{rand.randrange(per_target)}', 'at': moment.isoformat()}
+                requests.append(Request(name, '/resolve/', query))
+            else:
+                alias = next(replaced)
+                body = json.dumps({'existing': alias.alias, 'new': f'{alias.alias}-new', 'at': moment.isoformat()})
+                requests.append(Request(name, '/replace/', method='POST', body=body.encode(),
+                                        content_type='application/json'))
+        return requests
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from alias.sqlite import has_overlap_trigger, install_overlap_trigger, remove_overlap_trigger
+
+
+class Command(BaseCommand):
+    help = ('Install, remove or show the SQLite triggers enforcing non-overlapping aliases. '
+            'Enable ALIAS_SQLITE_OVERLAP_TRIGGER to let Alias.save() rely on them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['install', 'remove', 'status'])
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('The overlap trigger is available for SQLite databases only.')
+
+        if options['action'] == 'install':
+            install_overlap_trigger(connection)
+        elif options['action'] == 'remove':
+            remove_overlap_trigger(connection)
+        installed = has_overlap_trigger(connection)
+        self.stdout.write('Overlap trigger is ' + ('installed.' if installed else 'not installed.'))
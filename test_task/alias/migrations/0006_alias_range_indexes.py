@@ -0,0 +1,21 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0005_auto_20210205_1555'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alias',
+            index=models.Index(fields=['target', 'start', 'end'], name='alias_target_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alias',
+            index=models.Index(fields=['alias', 'target', 'start'], name='alias_alias_target_start_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:16
+
+import alias.fields
+from django.db import migrations
+
+
+def open_ends_to_sentinel(apps, schema_editor):
+    """Store open ends as the sentinel if the sentinel storage mode is enabled."""
+    if alias.fields.open_end_sentinel():
+        Alias = apps.get_model('alias', 'Alias')
+        alias.fields.convert_open_ends(Alias, schema_editor.connection.alias, to_sentinel=True)
+
+
+def open_ends_to_null(apps, schema_editor):
+    """Store open ends as NULL again."""
+    Alias = apps.get_model('alias', 'Alias')
+    alias.fields.convert_open_ends(Alias, schema_editor.connection.alias, to_sentinel=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0006_alias_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alias',
+            name='end',
+            field=alias.fields.OpenEndDateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(open_ends_to_sentinel, open_ends_to_null),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0007_alias_open_end_field'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alias',
+            index=models.Index(fields=['start', 'id'], name='alias_start_id_idx'),
+        ),
+    ]
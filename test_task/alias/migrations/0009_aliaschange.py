@@ -0,0 +1,27 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0008_alias_start_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AliasChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7)),
+                ('alias_pk', models.IntegerField()),
+                ('alias', models.CharField(max_length=120)),
+                ('target', models.SlugField(db_index=False, max_length=24)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
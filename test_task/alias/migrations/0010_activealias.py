@@ -0,0 +1,31 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0009_aliaschange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveAlias',
+            fields=[
+                ('alias_pk', models.IntegerField(primary_key=True, serialize=False)),
+                ('alias', models.CharField(max_length=120)),
+                ('target', models.SlugField(db_index=False, max_length=24)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='activealias',
+            index=models.Index(fields=['alias', 'start'], name='active_alias_alias_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activealias',
+            index=models.Index(fields=['target', 'start'], name='active_alias_target_start_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:40
+
+from django.db import migrations
+
+import alias.search
+
+
+def install_search_index(apps, schema_editor):
+    """Create the FTS5 trigram index of alias values on SQLite databases supporting it."""
+    alias.search.install_search_index(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    alias.search.remove_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0010_activealias'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, remove_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alias', '0011_alias_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AliasArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=120)),
+                ('target', models.SlugField(db_index=False, max_length=24)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AliasArchiveCutoff',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='aliasarchive',
+            index=models.Index(fields=['target', 'start', 'end'], name='alias_archive_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aliasarchive',
+            index=models.Index(fields=['alias', 'target', 'start'], name='alias_archive_alias_idx'),
+        ),
+    ]
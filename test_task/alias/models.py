@@ -1,15 +1,49 @@
 import pytz
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Exists, Q
+from django.utils import timezone
+from contextlib import ExitStack
 import datetime
+import heapq
+import itertools
+
+from .fields import OPEN_END, OpenEndDateTimeField, open_end_sentinel
+from . import shared_cache
+from .aio import run_sync
+from .instrumentation import instrument
+from .index import interval_index, to_microseconds
+from .lru import get_resolve_cache, resolve_bucket_seconds
+from .routers import mark_written
+from .search import prefix_condition, substring_condition
+from .sharding import fan_out, get_databases, get_shards, group_by_shard, shard_for
+from .sqlite import OVERLAP_MESSAGE, overlap_trigger_enabled, write_transaction
+from .utils import chunks
 
 
 class Alias(models.Model):
     alias = models.CharField(max_length=120)
     target = models.SlugField(max_length=24)
     start = models.DateTimeField()
-    end = models.DateTimeField(null=True, blank=True)
+    end = OpenEndDateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Range lookups by target: get_aliases and _get_pre_aliases(target).
+            models.Index(fields=['target', 'start', 'end'], name='alias_target_start_end_idx'),
+            # Overlap checks by alias and target.
+            models.Index(fields=['alias', 'target', 'start'], name='alias_alias_target_start_idx'),
+            # Keyset pagination of the aliases list by (start, id).
+            models.Index(fields=['start', 'id'], name='alias_start_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Alias, cls).from_db(db, field_names, values)
+        # Alias and target of the stored row, their cached data has to be invalidated if they change.
+        instance._db_state = (instance.__dict__.get('alias'), instance.__dict__.get('target'))
+        return instance
 
     def _alias_params_check(self):
         """Check correct input of start and end values."""
@@ -20,6 +54,10 @@ class Alias(models.Model):
         except TypeError:
             pass
 
+        # A row is not moved between databases, an update by pk would hit an unrelated row of the new shard.
+        if get_shards() and self._stored_shard() not in (None, shard_for(self.target)):
+            raise ValidationError('Alias can not move to a target of another shard!')
+
         return True
 
     @staticmethod
@@ -30,35 +68,119 @@ class Alias(models.Model):
                 return pytz.utc.localize(value)
             return value
 
+    @staticmethod
+    def _time_range(from_: datetime, to: datetime):
+        """Return time range with timezones added, check it does not end before start."""
+        # Add a timezone to time var.
+        try:
+            from_ = Alias._add_timezone(from_)
+            to = Alias._add_timezone(to)
+        except ValueError:
+            pass
+
+        if from_ > to:
+            raise ValidationError('Time range can not end before start!')
+
+        return from_, to
+
+    @staticmethod
+    def _moment(at: datetime = None):
+        """Return moment of time with timezone, now by default."""
+        if at is None:
+            return datetime.datetime.now(tz=pytz.utc)
+        try:
+            return Alias._add_timezone(at)
+        except ValueError:
+            return at
+
     @staticmethod
     def _get_pre_aliases(target: str or models.SlugField, alias=None):
         """Return aliases by alias and target values."""
+        data = Alias.objects.db_manager(shard_for(target))
         if not alias:
-            return Alias.objects.filter(target=target)
-        return Alias.objects.filter(alias=alias, target=target)
+            return data.filter(target=target)
+        return data.filter(alias=alias, target=target)
 
-    def _overlap_check(self):
-        """Check new instance for overlapping with existing ones."""
+    @staticmethod
+    def _ends_after(moment: datetime):
+        """Return condition for aliases, which end after the moment or never end."""
+        # Open ends stored as a sentinel satisfy `end > moment` by themselves.
+        if open_end_sentinel():
+            return Q(end__gt=moment)
+        return Q(end__gt=moment) | Q(end__isnull=True)
+
+    @staticmethod
+    def _get_range_aliases(target: str, from_: datetime, to: datetime):
+        """Return aliases of target which are active in the specified time range."""
+        data = Alias._get_pre_aliases(target=target)
+        return data.filter(Q(start__lt=to) & Alias._ends_after(from_))
+
+    def _get_overlapping(self):
+        """Return queryset of existing aliases, which overlap with the instance."""
         data = self._get_pre_aliases(alias=self.alias, target=self.target).exclude(id=self.pk)
+        # Read from the database written to, not from a lagging replica.
+        data = data.using(self._write_connection().alias)
 
-        # For creating of finite alias.
+        # Existing finite and infinite aliases, which end after the instance starts.
+        overlap = self._ends_after(self.start)
+        # For creating of finite alias they also have to start before it ends.
         if self.end:
-            # Compare with finite and infinite aliases.
-            if data.filter(Q(start__lt=self.end) & (Q(end__gt=self.start) | Q(end__isnull=True))):
-                raise ValidationError('Aliases can not overlap!')
-
-        # For creating of infinite alias.
-        if not self.end:
-            # Compare with finite aliases.
-            if data.filter(end__gt=self.start):
-                raise ValidationError('Aliases can not overlap!')
-            # Compare with infinite aliases.
-            if data.filter(end=None):
-                raise ValidationError('Aliases can not overlap!')
+            overlap &= Q(start__lt=self.end)
+
+        return data.filter(overlap)
+
+    @staticmethod
+    def _load_intervals(target: str):
+        """Return (alias, start, end) rows of target for the interval index."""
+        return Alias._get_pre_aliases(target=target).values_list('alias', 'start', 'end')
+
+    @staticmethod
+    def _invalidate(targets=(), aliases=(), using=None):
+        """Invalidate cached data of targets and alias values after a write to the using database."""
+        # Reads of the request have to see the write, in its transaction as well as after the commit.
+        mark_written()
+        Alias._drop_cached(targets, aliases)
+        # Readers between the write and the commit may cache old data again.
+        if transaction.get_connection(using).in_atomic_block:
+            transaction.on_commit(lambda: Alias._drop_cached(targets, aliases), using=using)
+
+    @staticmethod
+    def _drop_cached(targets, aliases):
+        interval_index.invalidate(*targets)
+        cache = get_resolve_cache()
+        if cache is not None:
+            cache.invalidate(*aliases)
+        cache = shared_cache.get_shared_cache()
+        if cache is not None:
+            shared_cache.bump_versions(cache, targets)
+
+    def _stored_shard(self):
+        """Return shard of a stored instance, None for new instances or without sharding."""
+        if self._state.adding or self._state.db not in get_shards():
+            return None
+        return self._state.db
+
+    def _write_connection(self):
+        return connections[self._stored_shard() or router.db_for_write(Alias, instance=self)]
+
+    def _overlap_check(self):
+        """Check new instance for overlapping with existing ones in a single EXISTS query."""
+        # The trigger of the database checks it on write instead.
+        if not overlap_trigger_enabled(self._write_connection()) and self._get_overlapping().exists():
+            raise ValidationError('Aliases can not overlap!')
+
+        # Archived aliases end before the cutoff, only aliases starting before it can overlap them.
+        archived = AliasArchive.before(self.start, self._write_connection().alias)
+        archived = archived.filter(alias=self.alias, target=self.target, end__gt=self.start)
+        if self.end:
+            archived = archived.filter(start__lt=self.end)
+        if archived.exists():
+            raise ValidationError('Aliases can not overlap!')
 
         return True
 
     @staticmethod
+    @instrument('get_aliases')
     def get_aliases(target: str, from_: datetime, to: datetime):
         """
         Return set of aliases.
@@ -72,25 +194,300 @@ class Alias(models.Model):
             the set of aliases in the specified time range.
         """
 
-        # Add a timezone to time var.
-        try:
-            from_ = Alias._add_timezone(from_)
-            to = Alias._add_timezone(to)
-        except ValueError:
-            pass
+        from_, to = Alias._time_range(from_, to)
 
-        if from_ > to:
-            raise ValidationError('Time range can not end before start!')
+        cache = shared_cache.get_shared_cache()
+        if cache is not None:
+            return shared_cache.get_aliases(cache, target, from_, to, load=Alias._get_aliases)
+        return Alias._get_aliases(target, from_, to)
+
+    @staticmethod
+    def _get_aliases(target: str, from_: datetime, to: datetime):
+        """Return set of aliases of target in the checked time range, bypassing the shared cache."""
+        if interval_index.enabled():
+            aliases = interval_index.get_aliases(target, from_, to, load=Alias._load_intervals)
+            return aliases | Alias._archived_aliases(target, from_, to)
 
-        data = Alias._get_pre_aliases(target=target)
         # QuerySet of aliases in the specified time range.
+        data = Alias._get_range_aliases(target=target, from_=from_, to=to)
+        aliases = set(data.values_list('alias', flat=True))
+
+        return aliases | Alias._archived_aliases(target, from_, to)
+
+    @staticmethod
+    def _archived_aliases(target: str, from_: datetime, to: datetime):
+        """Return set of archived aliases of target in the time range, empty if it starts after the cutoff."""
+        data = AliasArchive.before(from_, shard_for(target))
+        return set(data.filter(target=target, start__lt=to, end__gt=from_).values_list('alias', flat=True))
+
+    @staticmethod
+    @instrument('get_aliases_many')
+    def get_aliases_many(targets, from_: datetime, to: datetime, chunk_size: int = 500):
+        """
+        Return sets of aliases of several targets.
+
+        Keyword arguments:
+            targets -- iterable of objects to which aliases refer.
+            from_ -- the starting point of time range.
+            to -- the ending point of time range.
+            chunk_size -- number of targets per query.
+
+        Return:
+            dict of target -> the set of its aliases in the specified time range.
+        """
+        from_, to = Alias._time_range(from_, to)
+
+        aliases = {target: set() for target in targets}
 
-        data = data.filter((Q(start__lt=to) & (Q(end__gt=from_) | Q(end__isnull=True))))
-        aliases = set(item.alias for item in data)
+        def collect(shard):
+            using, shard_targets = shard
+            archived = AliasArchive.before(from_, using)
+            return [row for chunk in chunks(shard_targets, chunk_size)
+                    for row in Alias._collect_aliases(using, chunk, from_, to, archived)]
+
+        # Shards are queried in parallel.
+        for rows in fan_out(collect, group_by_shard(aliases).items()):
+            for target, alias in rows:
+                aliases[target].add(alias)
 
         return aliases
 
     @staticmethod
+    def _collect_aliases(using, targets: list, from_: datetime, to: datetime, archived):
+        """Return (target, alias) rows of targets in the time range, a second query reads the archived queryset."""
+        data = Alias.objects.db_manager(using).filter(Q(target__in=targets, start__lt=to) & Alias._ends_after(from_))
+        archived = archived.filter(target__in=targets, start__lt=to, end__gt=from_)
+        return list(data.values_list('target', 'alias')) + list(archived.values_list('target', 'alias'))
+
+    @staticmethod
+    @instrument('resolve')
+    def resolve(alias: str, at: datetime = None):
+        """
+        Return target of alias at a moment of time.
+
+        Keyword arguments:
+            alias -- alias value.
+            at -- a moment of time, now by default.
+
+        Return:
+            target of the alias active at the moment, None if there is no
+            such alias. If several targets share the alias at the moment,
+            the target of the latest started alias is returned.
+        """
+        if at is None and ActiveAlias.enabled():
+            return Alias._latest_target(lambda using: ActiveAlias.current(using).filter(alias=alias))
+
+        at = Alias._moment(at)
+
+        if AliasArchive.enabled():
+            # Before the cutoff an archived alias may be the latest started one.
+            archived = Alias._latest_rows(lambda using: AliasArchive.before(at, using).filter(
+                alias=alias, start__lte=at, end__gt=at))
+            if archived:
+                rows = archived + Alias._latest_rows(lambda using: Alias.objects.db_manager(using).filter(
+                    Q(alias=alias, start__lte=at) & Alias._ends_after(at)))
+                return max(rows, key=lambda row: row[0])[1]
+
+        cache = get_resolve_cache()
+        if cache is None:
+            return Alias._latest_target(lambda using: Alias.objects.db_manager(using).filter(
+                Q(alias=alias, start__lte=at) & Alias._ends_after(at)))
+
+        # Cache intervals of the alias, which overlap the time bucket of the moment,
+        # so every moment of the bucket is resolved exactly.
+        bucket_seconds = resolve_bucket_seconds()
+        bucket = int(at.timestamp() // bucket_seconds)
+        intervals = cache.get((alias, bucket))
+        if intervals is None:
+            # Intervals read before a concurrent write are not cached after its invalidation.
+            generation = cache.generation(alias)
+            bucket_start = datetime.datetime.fromtimestamp(bucket * bucket_seconds, tz=pytz.utc)
+            bucket_end = bucket_start + datetime.timedelta(seconds=bucket_seconds)
+
+            def load(using):
+                data = Alias.objects.db_manager(using)
+                data = data.filter(Q(alias=alias, start__lt=bucket_end) & Alias._ends_after(bucket_start))
+                return list(data.order_by('-start').values_list('target', 'start', 'end'))
+
+            rows = heapq.merge(*fan_out(load, get_databases()), key=lambda row: row[1], reverse=True)
+            intervals = tuple((target, to_microseconds(start), to_microseconds(end)) for target, start, end in rows)
+            cache.set((alias, bucket), intervals, group=alias, generation=generation)
+
+        moment = to_microseconds(at)
+        for target, start, end in intervals:
+            if start <= moment < end:
+                return target
+        return None
+
+    @staticmethod
+    def _latest_target(query):
+        """Return target of the latest started row of query(using) in all databases, None if there are no rows."""
+        rows = Alias._latest_rows(query)
+        return max(rows, key=lambda row: row[0])[1] if rows else None
+
+    @staticmethod
+    def _latest_rows(query):
+        """Return list of (start, target) of the latest started row of query(using) of every database having rows."""
+        def latest(using):
+            return query(using).order_by('-start').values_list('start', 'target').first()
+
+        # The alias may be used by targets of every shard.
+        return [row for row in fan_out(latest, get_databases()) if row]
+
+    @staticmethod
+    @instrument('active_aliases')
+    def active_aliases(target: str, at: datetime = None):
+        """
+        Return set of aliases of target at a moment of time.
+
+        Keyword arguments:
+            target -- the object to which alias refer.
+            at -- a moment of time, now by default.
+        """
+        if at is None and ActiveAlias.enabled():
+            return set(ActiveAlias.current(shard_for(target)).filter(target=target).values_list('alias', flat=True))
+
+        at = Alias._moment(at)
+        # start < at + 1 microsecond is start <= at.
+        archived = Alias._archived_aliases(target, at, at + datetime.timedelta(microseconds=1))
+
+        if interval_index.enabled():
+            return archived | interval_index.get_aliases(target, at, at + datetime.timedelta(microseconds=1),
+                                                         load=Alias._load_intervals)
+
+        data = Alias._get_pre_aliases(target=target).filter(Q(start__lte=at) & Alias._ends_after(at))
+        return archived | set(data.values_list('alias', flat=True))
+
+    @staticmethod
+    @instrument('search')
+    def search(query: str, mode: str = 'prefix', target: str = None, from_: datetime = None, to: datetime = None,
+               limit: int = 20):
+        """
+        Return aliases with alias values matching a query.
+
+        Keyword arguments:
+            query -- the prefix or the substring of alias values.
+            mode -- 'prefix' (case-sensitive, a range of the alias index) or
+                'substring' (case-insensitive, the trigram index of SQLite).
+            target -- only aliases of the target.
+            from_, to -- only aliases active in the time range.
+            limit -- maximal number of aliases.
+
+        Return:
+            list of Alias instances ordered by alias value, target and start.
+        """
+        if not query:
+            raise ValidationError('Query is required!')
+        if mode not in ('prefix', 'substring'):
+            raise ValidationError('Mode has to be prefix or substring!')
+
+        condition = Q()
+        if target:
+            condition &= Q(target=target)
+        if from_ is not None and to is not None:
+            from_, to = Alias._time_range(from_, to)
+        if from_ is not None:
+            condition &= Alias._ends_after(Alias._moment(from_))
+        if to is not None:
+            condition &= Q(start__lt=Alias._moment(to))
+
+        def load(using):
+            data = Alias.objects.db_manager(using)
+            if mode == 'prefix':
+                data = data.filter(prefix_condition(query))
+            elif target:
+                # The target index leaves few rows, cheaper to check than all rows with the trigrams.
+                data = data.filter(alias__icontains=query)
+            else:
+                data = data.filter(substring_condition(query, connections[data.db]))
+            return list(data.filter(condition).order_by('alias', 'target', 'start')[:limit])
+
+        databases = (shard_for(target),) if target else get_databases()
+        aliases = heapq.merge(*fan_out(load, databases), key=lambda alias: (alias.alias, alias.target, alias.start))
+        return list(itertools.islice(aliases, limit))
+
+    @staticmethod
+    def timeline(target: str, from_: datetime, to: datetime):
+        """
+        Return iterator of aliases of target in a time range.
+
+        Keyword arguments:
+            target -- the object to which alias refer.
+            from_ -- the starting point of time range.
+            to -- the ending point of time range.
+
+        Return:
+            iterator of (alias, start, end) ordered by start, intervals are
+            clipped to the time range. Rows are streamed from the database.
+        """
+        from .analytics import timeline
+        from_, to = Alias._time_range(from_, to)
+        return timeline(target, from_, to)
+
+    @staticmethod
+    def gaps(target: str, from_: datetime, to: datetime):
+        """Return iterator of (start, end) of parts of the time range, where target has no alias."""
+        from .analytics import gaps
+        from_, to = Alias._time_range(from_, to)
+        return gaps(target, from_, to)
+
+    @staticmethod
+    def coverage(target: str, from_: datetime, to: datetime, bucket: str = 'hour'):
+        """
+        Return iterator of numbers of aliases of target per time bucket.
+
+        Keyword arguments:
+            target -- the object to which alias refer.
+            from_ -- the starting point of time range.
+            to -- the ending point of time range.
+            bucket -- 'hour' or 'day', buckets start at full UTC hours or days.
+
+        Return:
+            iterator of (bucket start, number of aliases active in the
+            bucket) of every bucket of the time range. An alias active in
+            several intervals of the bucket is counted for every interval.
+        """
+        from .analytics import BUCKETS, coverage
+        if bucket not in BUCKETS:
+            raise ValidationError('Bucket has to be hour or day!')
+        from_, to = Alias._time_range(from_, to)
+        return coverage(target, from_, to, bucket)
+
+    @staticmethod
+    async def aget_aliases(target: str, from_: datetime, to: datetime):
+        """Async get_aliases, the query runs on the alias thread pool."""
+        return await run_sync(Alias.get_aliases, target, from_, to)
+
+    @staticmethod
+    async def aresolve(alias: str, at: datetime = None):
+        """Async resolve, the query runs on the alias thread pool."""
+        return await run_sync(Alias.resolve, alias, at)
+
+    @staticmethod
+    async def aalias_replace(existing_alias: str, replace_at: datetime, new_alias_value: str):
+        """Async alias_replace, the transaction runs on the alias thread pool."""
+        return await run_sync(Alias.alias_replace, existing_alias, replace_at, new_alias_value)
+
+    @staticmethod
+    @instrument('bulk_import')
+    def bulk_import(rows, chunk_size: int = 500, using: str = 'default', on_error=None):
+        """
+        Import aliases in chunks, validating overlapping in memory (see alias.bulk.bulk_import).
+
+        Keyword arguments:
+            rows -- iterable of row dicts with alias, target, start and end values.
+            chunk_size -- number of rows per query and transaction.
+            using -- the database alias, unless ALIAS_SHARDS are configured.
+            on_error -- callable(line, row, messages) for rejected rows.
+
+        Return:
+            dict with numbers of created and rejected rows.
+        """
+        from .bulk import bulk_import
+        return bulk_import(rows, chunk_size=chunk_size, using=using, on_error=on_error)
+
+    @staticmethod
+    @instrument('alias_replace')
     def alias_replace(existing_alias: str, replace_at: datetime, new_alias_value: str):
         """
         Replace existing alias with a new one.
@@ -103,6 +500,9 @@ class Alias(models.Model):
         Return:
             set alias.end = replace_at for existing_alias. Creates new alias
             with alias value = new_alias_value, start = replace_at, end = None.
+            Both happen in one transaction, the existing alias row is locked
+            where the database supports it, SQLite is locked for writes at
+            the start of the transaction.
         """
         # Check for new alias value.
         if existing_alias == new_alias_value:
@@ -114,15 +514,201 @@ class Alias(models.Model):
         except ValueError:
             pass
 
-        # Process no alias to replace.
-        try:
-            alias = Alias.objects.get(alias=existing_alias, start__lte=replace_at, end__gt=replace_at)
-        except models.ObjectDoesNotExist:
+        active = Q(alias=existing_alias, start__lte=replace_at) & Alias._ends_after(replace_at)
+        # The new alias has the same target, so both writes go to one database.
+        using = Alias._replace_database(existing_alias, active)
+        with write_transaction(using):
+            # Process no alias to replace.
+            try:
+                alias = Alias.objects.db_manager(using).select_for_update().get(active)
+            except models.ObjectDoesNotExist:
+                raise ValidationError('Alias does not exist!')
+            # The alias value is active for several targets.
+            except Alias.MultipleObjectsReturned:
+                raise ValidationError(f'Alias {existing_alias} is ambiguous!')
+
+            new_alias = Alias(alias=new_alias_value, target=alias.target, start=replace_at, end=None)
+            new_alias._overlap_check()
+
+            # Closing an alias only shrinks it, so it can not overlap. The condition is
+            # repeated to detect a concurrent replacement on databases without row locks.
+            if not Alias.objects.db_manager(using).filter(active, pk=alias.pk).update(end=replace_at):
+                raise ValidationError('Alias does not exist!')
+            alias.end = replace_at
+            Alias._record_changes(AliasChange.UPDATED, [alias._change_row()], using)
+            new_alias._save_checked()
+
+        Alias._invalidate(aliases=[existing_alias], using=using)
+        return new_alias
+
+    @staticmethod
+    def _replace_database(existing_alias: str, active: Q):
+        """Return database of the active alias to replace, the shard is found querying all shards in parallel."""
+        shards = get_shards()
+        if not shards:
+            return router.db_for_write(Alias)
+
+        found = fan_out(lambda using: Alias.objects.using(using).filter(active).exists(), shards)
+        found = [using for using, exists in zip(shards, found) if exists]
+        if not found:
             raise ValidationError('Alias does not exist!')
-        alias.end = replace_at
-        alias.save()
-        Alias.objects.create(alias=new_alias_value, target=alias.target, start=replace_at, end=None)
+        if len(found) > 1:
+            raise ValidationError(f'Alias {existing_alias} is ambiguous!')
+        return found[0]
 
+    @staticmethod
+    @instrument('alias_replace_many')
+    def alias_replace_many(replacements, replace_at: datetime, chunk_size: int = 500):
+        """
+        Replace several existing aliases at the same moment.
+
+        Keyword arguments:
+            replacements -- dict or iterable of (existing alias value, new alias value) pairs.
+            replace_at -- a moment of time.
+            chunk_size -- number of aliases per statement.
+
+        Return:
+            list of new Alias instances. Works like alias_replace for every
+            pair in one transaction: either all aliases are replaced, or
+            ValidationError with all problems is raised. With ALIAS_SHARDS
+            there is a transaction per shard, they are committed one by one
+            after all checks passed.
+        """
+        replacements = dict(replacements.items() if isinstance(replacements, dict) else replacements)
+        errors = [f'You can not replace alias {existing} with the same alias value!'
+                  for existing, new in replacements.items() if existing == new]
+        if errors:
+            raise ValidationError(errors)
+
+        try:
+            replace_at = Alias._add_timezone(replace_at)
+        except ValueError:
+            pass
+
+        existing_values = list(replacements)
+        existing_chunks = chunks(existing_values, chunk_size)
+        active = Q(start__lte=replace_at) & Alias._ends_after(replace_at)
+        databases = get_shards() or (router.db_for_write(Alias),)
+
+        with ExitStack() as transactions:
+            for using in databases:
+                transactions.enter_context(write_transaction(using))
+
+            # Lock aliases to replace.
+            closing = {}
+            for using in databases:
+                for chunk in existing_chunks:
+                    data = Alias.objects.db_manager(using).select_for_update().filter(active, alias__in=chunk)
+                    for pk, alias, target, start in data.values_list('pk', 'alias', 'target', 'start'):
+                        if alias in closing:
+                            errors.append(f'Alias {alias} is ambiguous!')
+                        closing[alias] = (using, pk, target, start)
+            errors.extend(f'Alias {existing} does not exist!' for existing in existing_values
+                          if existing not in closing)
+
+            # New aliases can overlap with each other and with stored aliases, which are not closed here.
+            new_aliases, databases_aliases = [], {}
+            for existing, (using, pk, target, start) in closing.items():
+                new_alias = Alias(alias=replacements[existing], target=target, start=replace_at, end=None)
+                new_aliases.append(new_alias)
+                databases_aliases.setdefault(using, []).append(new_alias)
+            new_pairs = {}
+            for new_alias in new_aliases:
+                if (new_alias.alias, new_alias.target) in new_pairs:
+                    errors.append(f'Aliases can not overlap: {new_alias.alias} ({new_alias.target})!')
+                new_pairs[new_alias.alias, new_alias.target] = new_alias
+
+            # Closed aliases and their new aliases are in the database of their target.
+            closing_pks = {}
+            for using, pk, target, start in closing.values():
+                closing_pks.setdefault(using, set()).add(pk)
+            new_values = list({new_alias.alias for new_alias in new_aliases})
+            for using, pks in closing_pks.items():
+                targets = {target for db, pk, target, start in closing.values() if db == using}
+                archived = AliasArchive.before(replace_at, using)
+                for chunk in chunks(new_values, chunk_size):
+                    data = Alias.objects.db_manager(using)
+                    data = data.filter(Alias._ends_after(replace_at), alias__in=chunk, target__in=targets)
+                    for pk, alias, target in data.values_list('pk', 'alias', 'target'):
+                        if (alias, target) in new_pairs and pk not in pks:
+                            errors.append(f'Aliases can not overlap: {alias} ({target})!')
+                    data = archived.filter(end__gt=replace_at, alias__in=chunk, target__in=targets)
+                    for alias, target in data.values_list('alias', 'target'):
+                        if (alias, target) in new_pairs:
+                            errors.append(f'Aliases can not overlap: {alias} ({target})!')
+
+            if errors:
+                raise ValidationError(errors)
+
+            for using, pks in closing_pks.items():
+                pks = sorted(pks)
+                for chunk in chunks(pks, chunk_size):
+                    data = Alias.objects.db_manager(using).filter(active, pk__in=chunk)
+                    if data.update(end=replace_at) != len(chunk):
+                        raise ValidationError('Aliases were replaced concurrently!')
+                Alias._record_changes(AliasChange.UPDATED, [(pk, alias, target, start, replace_at)
+                                                            for alias, (db, pk, target, start) in closing.items()
+                                                            if db == using], using)
+                Alias.objects.db_manager(using).bulk_create(databases_aliases[using], batch_size=chunk_size)
+                Alias._record_created(databases_aliases[using], using)
+
+        Alias._invalidate(targets={target for using, pk, target, start in closing.values()},
+                          aliases=set(closing) | {new_alias.alias for new_alias in new_aliases})
+        return new_aliases
+
+    @staticmethod
+    @instrument('close_many')
+    def close_many(pks, close_at: datetime, using: str = None, chunk_size: int = 500):
+        """
+        Close several aliases at the same moment.
+
+        Keyword arguments:
+            pks -- primary keys of aliases.
+            close_at -- a moment of time.
+            using -- database of the aliases, the database for writes by default.
+            chunk_size -- number of aliases per statement.
+
+        Return:
+            number of closed aliases. Every alias active at close_at gets
+            end = close_at in one transaction, other aliases are skipped.
+        """
+        close_at = Alias._moment(close_at)
+        using = using or router.db_for_write(Alias)
+        pks = sorted(set(pks))
+        active = Q(start__lte=close_at) & Alias._ends_after(close_at)
+        closed = []
+        with transaction.atomic(using=using):
+            for chunk in chunks(pks, chunk_size):
+                data = Alias.objects.using(using).select_for_update().filter(active, pk__in=chunk)
+                rows = list(data.values_list('pk', 'alias', 'target', 'start'))
+                # Closing an alias only shrinks it, so it can not overlap.
+                Alias.objects.using(using).filter(pk__in=[row[0] for row in rows]).update(end=close_at)
+                closed.extend((pk, alias, target, start, close_at) for pk, alias, target, start in rows)
+            if Alias._records_changes():
+                Alias._record_changes(AliasChange.UPDATED, closed, using)
+
+        Alias._invalidate(targets={row[2] for row in closed}, aliases={row[1] for row in closed}, using=using)
+        return len(closed)
+
+    @staticmethod
+    @instrument('delete_many')
+    def delete_many(pks, using: str = None, chunk_size: int = 500):
+        """Delete several aliases in one transaction, return number of deleted aliases."""
+        using = using or router.db_for_write(Alias)
+        pks = sorted(set(pks))
+        deleted = []
+        with transaction.atomic(using=using):
+            for chunk in chunks(pks, chunk_size):
+                data = Alias.objects.using(using).filter(pk__in=chunk)
+                deleted.extend(data.values_list('pk', 'alias', 'target', 'start', 'end'))
+                data.delete()
+            if Alias._records_changes():
+                Alias._record_changes(AliasChange.DELETED, deleted, using)
+
+        Alias._invalidate(targets={row[2] for row in deleted}, aliases={row[1] for row in deleted}, using=using)
+        return len(deleted)
+
+    @instrument('save')
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
         """Save alias."""
@@ -131,4 +717,260 @@ class Alias(models.Model):
         if self._alias_params_check():
             # Check for overlapping.
             if self._overlap_check():
-                super(Alias, self).save()
+                self._save_checked()
+
+    def _save_checked(self):
+        """Save alias, which is already checked."""
+        connection = self._write_connection()
+        if Alias._records_changes():
+            # The change is recorded in the transaction of the write.
+            action = AliasChange.CREATED if self._state.adding else AliasChange.UPDATED
+            with transaction.atomic(using=connection.alias):
+                self._save_row(connection)
+                Alias._record_changes(action, [self._change_row()], connection.alias)
+        else:
+            self._save_row(connection)
+        db_alias, db_target = getattr(self, '_db_state', (None, None))
+        self._invalidate(targets={self.target, db_target} - {None}, aliases={self.alias, db_alias} - {None},
+                         using=connection.alias)
+        self._db_state = (self.alias, self.target)
+
+    def _save_row(self, connection):
+        if not overlap_trigger_enabled(connection):
+            super(Alias, self).save(using=connection.alias)
+        elif not connection.in_atomic_block:
+            self._save_with_trigger(connection)
+        else:
+            # Keep the outer transaction usable after the trigger aborts the statement.
+            with transaction.atomic(using=connection.alias):
+                self._save_with_trigger(connection)
+
+    def _save_with_trigger(self, connection):
+        try:
+            super(Alias, self).save(using=connection.alias)
+        except IntegrityError as error:
+            if OVERLAP_MESSAGE in str(error):
+                raise ValidationError(OVERLAP_MESSAGE) from error
+            raise
+
+    @instrument('delete')
+    def delete(self, using=None, keep_parents=False):
+        """Delete alias."""
+        using = using or self._write_connection().alias
+        if not Alias._records_changes():
+            result = super(Alias, self).delete(using=using, keep_parents=keep_parents)
+        else:
+            row = self._change_row()
+            with transaction.atomic(using=using):
+                result = super(Alias, self).delete(using=using, keep_parents=keep_parents)
+                if result[0]:
+                    Alias._record_changes(AliasChange.DELETED, [row], using)
+        self._invalidate(targets=[self.target], aliases=[self.alias], using=using)
+        return result
+
+    def _change_row(self):
+        return self.pk, self.alias, self.target, self.start, self.end
+
+    @staticmethod
+    def _records_changes():
+        return AliasChange.enabled() or ActiveAlias.enabled()
+
+    @staticmethod
+    def _record_changes(action: str, rows, using: str):
+        """Apply written (pk, alias, target, start, end) rows to the change log and the active aliases projection."""
+        rows = list(rows)
+        if AliasChange.enabled():
+            changed_at = timezone.now()
+            AliasChange.objects.using(using).bulk_create(
+                [AliasChange(action=action, alias_pk=pk, alias=alias, target=target, start=start, end=end,
+                             changed_at=changed_at) for pk, alias, target, start, end in rows])
+        if ActiveAlias.enabled():
+            ActiveAlias.project(rows, using, deleted=action == AliasChange.DELETED)
+
+    @staticmethod
+    def _record_created(instances, using: str):
+        """Record aliases created by bulk_create."""
+        if not Alias._records_changes() or not instances:
+            return
+        Alias._set_created_pks(instances, using)
+        Alias._record_changes(AliasChange.CREATED, [instance._change_row() for instance in instances], using)
+
+    @staticmethod
+    def _set_created_pks(instances, using: str):
+        """Set primary keys of aliases created by bulk_create, if the database does not return them."""
+        # Aliases with the same alias value and target do not overlap, so they start at different moments.
+        missing = {(instance.alias, instance.target, instance.start): instance
+                   for instance in instances if instance.pk is None}
+        if not missing:
+            return
+        data = Alias.objects.db_manager(using).filter(alias__in={key[0] for key in missing},
+                                                      target__in={key[1] for key in missing},
+                                                      start__in={key[2] for key in missing})
+        for pk, alias, target, start in data.values_list('pk', 'alias', 'target', 'start'):
+            instance = missing.get((alias, target, start))
+            if instance is not None:
+                instance.pk = pk
+                instance._state.adding, instance._state.db = False, using
+
+    @staticmethod
+    @instrument('changes')
+    def changes(after: str = None, limit: int = 1000):
+        """
+        Return changes of aliases after a cursor.
+
+        Keyword arguments:
+            after -- cursor returned by the previous call, None to start from the beginning.
+            limit -- maximal number of changes.
+
+        Return:
+            (list of AliasChange instances, cursor of the next call). Changes
+            are ordered by their sequence. With ALIAS_SHARDS every shard has its
+            own sequence, changes of shards are merged by time and the cursor
+            holds the sequences of all shards.
+
+        The cursor assumes that ids of changes become visible in the order of
+        their values. SQLite assigns them under its database write lock, so
+        they commit in order. With concurrent writers of other databases (e.g.
+        sequences of PostgreSQL) a lower id may commit after a higher one was
+        read, and a consumer past the higher id never sees that change.
+        """
+        databases = get_databases()
+        sequences = str(after).split('.') if after else ['0'] * len(databases)
+        if len(sequences) != len(databases) or not all(sequence.isdigit() for sequence in sequences):
+            raise ValidationError('Invalid cursor!')
+        sequences = [int(sequence) for sequence in sequences]
+
+        def load(item):
+            using, sequence = item
+            return list(AliasChange.objects.db_manager(using).filter(id__gt=sequence).order_by('id')[:limit])
+
+        batches = fan_out(load, zip(databases, sequences))
+        merged = heapq.merge(*[[(index, change) for change in batch] for index, batch in enumerate(batches)],
+                             key=lambda item: (item[1].changed_at, item[0], item[1].id))
+        changes = []
+        for index, change in itertools.islice(merged, limit):
+            sequences[index] = change.id
+            changes.append(change)
+        return changes, '.'.join(str(sequence) for sequence in sequences)
+
+
+class AliasChange(models.Model):
+    """Append-only log of alias writes (ALIAS_CHANGE_LOG), the id is the sequence number of the change."""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    id = models.BigAutoField(primary_key=True)
+    action = models.CharField(max_length=7, choices=ACTIONS)
+    # Not a foreign key: changes of deleted aliases stay in the log.
+    alias_pk = models.IntegerField()
+    alias = models.CharField(max_length=120)
+    target = models.SlugField(max_length=24, db_index=False)
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'ALIAS_CHANGE_LOG', False)
+
+
+class ActiveAlias(models.Model):
+    """
+    Projection of aliases, which have not ended yet (ALIAS_ACTIVE_PROJECTION).
+
+    Alias writes keep it up to date, `manage.py active_aliases sweep` removes
+    rows ended since. Open ends are stored as OPEN_END, so lookups of the current moment
+    are one probe of an index without the NULL branch.
+    """
+    alias_pk = models.IntegerField(primary_key=True)
+    alias = models.CharField(max_length=120)
+    target = models.SlugField(max_length=24, db_index=False)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['alias', 'start'], name='active_alias_alias_start_idx'),
+            models.Index(fields=['target', 'start'], name='active_alias_target_start_idx'),
+        ]
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'ALIAS_ACTIVE_PROJECTION', False)
+
+    @staticmethod
+    def project(rows, using: str, deleted: bool = False, chunk_size: int = 500):
+        """Replace projected rows of written (pk, alias, target, start, end) alias rows."""
+        now = timezone.now()
+        for chunk in chunks(list(rows), chunk_size):
+            ActiveAlias.objects.using(using).filter(alias_pk__in=[row[0] for row in chunk]).delete()
+            if not deleted:
+                ActiveAlias.objects.using(using).bulk_create(
+                    [ActiveAlias(alias_pk=pk, alias=alias, target=target, start=start, end=end or OPEN_END)
+                     for pk, alias, target, start, end in chunk if end is None or end > now])
+
+    @staticmethod
+    def current(using=None):
+        """Return queryset of projected aliases active now."""
+        now = timezone.now()
+        return ActiveAlias.objects.db_manager(using).filter(start__lte=now, end__gt=now)
+
+
+class AliasArchive(models.Model):
+    """
+    Cold storage of aliases ended before the archive cutoff (ALIAS_ARCHIVE).
+
+    `manage.py archive_aliases` moves them out of the alias table, adjacent
+    intervals of an (alias, target) pair are merged into one row. Reads consult
+    the archive only for time ranges reaching before the cutoff.
+    """
+    alias = models.CharField(max_length=120)
+    target = models.SlugField(max_length=24, db_index=False)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['target', 'start', 'end'], name='alias_archive_target_idx'),
+            models.Index(fields=['alias', 'target', 'start'], name='alias_archive_alias_idx'),
+        ]
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'ALIAS_ARCHIVE', False)
+
+    @staticmethod
+    def before(moment: datetime, using=None):
+        """
+        Return queryset of archived aliases of the using database, empty unless moment is before its cutoff.
+
+        The cutoff is a condition of the query itself, so it is never read stale
+        from another connection or process.
+        """
+        data = AliasArchive.objects.db_manager(using)
+        if not AliasArchive.enabled():
+            return data.none()
+        return data.filter(Exists(AliasArchiveCutoff.objects.filter(pk=1, cutoff__gt=moment)))
+
+
+class AliasArchiveCutoff(models.Model):
+    """The single row of a database: aliases ended before the cutoff may be archived."""
+    cutoff = models.DateTimeField()
+
+    @staticmethod
+    def get(using=None):
+        """Return cutoff of the using database, None if nothing was archived."""
+        return AliasArchiveCutoff.objects.db_manager(using).filter(pk=1).values_list('cutoff', flat=True).first()
+
+    @staticmethod
+    def advance(cutoff: datetime, using: str):
+        """Move cutoff of the using database forward to the moment, return the resulting cutoff."""
+        with transaction.atomic(using=using):
+            row, created = AliasArchiveCutoff.objects.using(using).select_for_update().get_or_create(
+                pk=1, defaults={'cutoff': cutoff})
+            if not created and row.cutoff < cutoff:
+                row.cutoff = cutoff
+                row.save(using=using, update_fields=['cutoff'])
+        return row.cutoff
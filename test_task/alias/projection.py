@@ -0,0 +1,69 @@
+"""Maintenance of the ActiveAlias projection: rebuild, sweep and consistency check."""
+from django.db import transaction
+from django.utils import timezone
+
+from .fields import OPEN_END
+from .models import ActiveAlias, Alias
+
+ROW_FIELDS = ('alias', 'target', 'start', 'end')
+
+
+def _active_rows(using, now):
+    """Yield (pk, alias, target, start, end) of aliases not ended at now, ordered by pk."""
+    data = Alias.objects.db_manager(using).filter(Alias._ends_after(now)).order_by('pk')
+    for pk, alias, target, start, end in data.values_list('pk', *ROW_FIELDS).iterator(chunk_size=2000):
+        yield pk, alias, target, start, end or OPEN_END
+
+
+def rebuild(using, chunk_size=2000):
+    """Fill the projection of the using database from the alias table, return number of rows."""
+    now = timezone.now()
+    count = 0
+    with transaction.atomic(using=using):
+        ActiveAlias.objects.using(using).all().delete()
+        chunk = []
+        for row in _active_rows(using, now):
+            chunk.append(ActiveAlias(alias_pk=row[0], **dict(zip(ROW_FIELDS, row[1:]))))
+            if len(chunk) >= chunk_size:
+                ActiveAlias.objects.using(using).bulk_create(chunk)
+                count += len(chunk)
+                chunk = []
+        ActiveAlias.objects.using(using).bulk_create(chunk)
+        count += len(chunk)
+    return count
+
+
+def sweep(using):
+    """Delete projected aliases, which have ended, return number of rows deleted."""
+    deleted, _ = ActiveAlias.objects.using(using).filter(end__lte=timezone.now()).delete()
+    return deleted
+
+
+def check(using):
+    """
+    Compare the projection with the alias table by merging both ordered by primary key.
+
+    Rows ended, but not swept yet, are not reported.
+
+    Return:
+        dict of missing, extra and different lists of alias primary keys.
+    """
+    now = timezone.now()
+    report = {'missing': [], 'extra': [], 'different': []}
+    expected = _active_rows(using, now)
+    projected = ActiveAlias.objects.using(using).filter(end__gt=now).order_by('alias_pk')
+    projected = projected.values_list('alias_pk', *ROW_FIELDS).iterator(chunk_size=2000)
+
+    row, projected_row = next(expected, None), next(projected, None)
+    while row is not None or projected_row is not None:
+        if projected_row is None or (row is not None and row[0] < projected_row[0]):
+            report['missing'].append(row[0])
+            row = next(expected, None)
+        elif row is None or projected_row[0] < row[0]:
+            report['extra'].append(projected_row[0])
+            projected_row = next(projected, None)
+        else:
+            if row != projected_row:
+                report['different'].append(row[0])
+            row, projected_row = next(expected, None), next(projected, None)
+    return report
@@ -0,0 +1,92 @@
+"""Database routing of the alias app: reads to replicas, writes to the primary."""
+import contextvars
+import random
+
+from django.conf import settings
+
+from .sharding import get_shards, shard_for
+from .utils import AsyncCapableMiddleware
+
+# Stickiness of the current request: after a write its reads go to the primary,
+# so the request reads its own writes. Outside of requests there is no scope.
+_stickiness = contextvars.ContextVar('alias_replica_stickiness', default=None)
+
+
+class _Stickiness:
+    __slots__ = ('primary',)
+
+    def __init__(self):
+        self.primary = False
+
+
+def read_replicas():
+    return getattr(settings, 'ALIAS_READ_REPLICAS', ())
+
+
+def mark_written():
+    """Send the following reads of the request to the primary, called by Alias write paths after a write."""
+    stickiness = _stickiness.get()
+    # Threads outside of requests, e.g. the writer worker, would stay on the primary for good.
+    if stickiness is not None:
+        stickiness.primary = True
+
+
+def start_request():
+    """Start a new stickiness scope reading from replicas."""
+    _stickiness.set(_Stickiness())
+
+
+def reads_from_primary():
+    stickiness = _stickiness.get()
+    return stickiness is not None and stickiness.primary
+
+
+class AliasReplicaRouter:
+    """
+    Route reads of alias models to one of ALIAS_READ_REPLICAS and writes to the primary.
+
+    Reads of a request, which already wrote, stay on the primary (see
+    ReplicaStickinessMiddleware and mark_written). Write paths read through the
+    write database explicitly, e.g. the overlap check of Alias.save().
+
+    With ALIAS_SHARDS instances are routed to the shard of their target instead,
+    queries without an instance are routed by Alias methods themselves.
+    """
+
+    def _shard(self, hints):
+        instance = hints.get('instance')
+        # Models without a target, e.g. AliasArchiveCutoff, are not sharded.
+        if instance is not None and hasattr(instance, 'target') and get_shards():
+            return shard_for(instance.target)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'alias':
+            return None
+        if get_shards():
+            return self._shard(hints)
+        replicas = read_replicas()
+        if not replicas or reads_from_primary():
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'alias':
+            return None
+        return self._shard(hints)
+
+
+class ReplicaStickinessMiddleware(AsyncCapableMiddleware):
+    """
+    Scope read-your-writes stickiness of AliasReplicaRouter to one request.
+
+    The scope is not reset after the response, streamed content is read within it.
+    """
+
+    def _call(self, request):
+        start_request()
+        return self.get_response(request)
+
+    async def _acall(self, request):
+        start_request()
+        return await self.get_response(request)
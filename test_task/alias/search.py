@@ -0,0 +1,94 @@
+"""
+Search of alias values: prefix ranges of the alias index and an SQLite FTS5 trigram index for substrings.
+
+The trigram index is an external content FTS5 table over alias_alias, kept in
+sync by triggers, so every write (save, alias_replace, bulk_create, raw SQL)
+updates it in the same transaction.
+"""
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'alias_alias_search'
+SEARCH_TRIGGERS = ('alias_alias_search_insert', 'alias_alias_search_delete', 'alias_alias_search_update')
+
+# Trigrams match substrings of at least three characters.
+MIN_SUBSTRING = 3
+
+# Alias values starting with a prefix sort below the prefix followed by the largest character.
+_PREFIX_END = chr(0x10FFFF)
+
+_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"alias, content='alias_alias', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS alias_alias_search_insert AFTER INSERT ON alias_alias BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, alias) VALUES (NEW.id, NEW.alias); END",
+    f"CREATE TRIGGER IF NOT EXISTS alias_alias_search_delete AFTER DELETE ON alias_alias BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, alias) VALUES ('delete', OLD.id, OLD.alias); END",
+    f"CREATE TRIGGER IF NOT EXISTS alias_alias_search_update AFTER UPDATE OF id, alias ON alias_alias BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, alias) VALUES ('delete', OLD.id, OLD.alias); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, alias) VALUES (NEW.id, NEW.alias); END",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+)
+
+
+def supports_search_index(connection):
+    """Return True if the database has the FTS5 trigram tokenizer (SQLite 3.34+)."""
+    if connection.vendor != 'sqlite':
+        return False
+    return connection.Database.sqlite_version_info >= (3, 34, 0)
+
+
+def install_search_index(connection):
+    """Create the trigram index and its triggers, index stored aliases."""
+    if not supports_search_index(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in _STATEMENTS:
+            cursor.execute(statement)
+    connection.alias_search_index = True
+
+
+def remove_search_index(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in SEARCH_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+    connection.alias_search_index = False
+
+
+def has_search_index(connection):
+    """Return True if the trigram index exists, checked once per connection."""
+    if not supports_search_index(connection):
+        return False
+    if getattr(connection, 'alias_search_index', None) is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+            connection.alias_search_index = cursor.fetchone() is not None
+    return connection.alias_search_index
+
+
+def install_search_triggers_after_migrate(sender, using, **kwargs):
+    """post_migrate receiver restoring the triggers, which are lost if a migration rebuilds alias_alias."""
+    from django.db import connections
+
+    connection = connections[using]
+    if has_search_index(connection):
+        with connection.cursor() as cursor:
+            for statement in _STATEMENTS[1:-1]:
+                cursor.execute(statement)
+
+
+def prefix_condition(prefix: str):
+    """Return condition of alias values starting with prefix, a range of the (alias, ...) index."""
+    return Q(alias__gte=prefix, alias__lt=prefix + _PREFIX_END)
+
+
+def substring_condition(substring: str, connection):
+    """Return condition of alias values containing substring, case-insensitive."""
+    if len(substring) < MIN_SUBSTRING or not has_search_index(connection):
+        return Q(alias__icontains=substring)
+    # A quoted phrase of the trigram tokenizer matches the substring.
+    phrase = '"' + substring.replace('"', '""') + '"'
+    return Q(id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [phrase]))
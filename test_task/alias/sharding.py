@@ -0,0 +1,49 @@
+"""Sharding of aliases by a hash of target across the ALIAS_SHARDS databases."""
+import zlib
+
+from django.conf import settings
+
+from .utils import SettingExecutor
+
+
+def get_shards():
+    """Return database aliases of the shards, empty if sharding is disabled."""
+    return tuple(getattr(settings, 'ALIAS_SHARDS', ()))
+
+
+def shard_for(target: str):
+    """Return database alias of the shard of target, None if sharding is disabled."""
+    shards = get_shards()
+    if not shards:
+        return None
+    # crc32 is stable between processes unlike hash() of str.
+    return shards[zlib.crc32(str(target).encode()) % len(shards)]
+
+
+def get_databases():
+    """Return databases to query for all aliases: the shards, or None for the routed database."""
+    return get_shards() or (None,)
+
+
+def group_by_shard(targets):
+    """Return dict of shard (None if sharding is disabled) -> list of its targets."""
+    groups = {}
+    for target in targets:
+        groups.setdefault(shard_for(target), []).append(target)
+    return groups
+
+
+_executor = SettingExecutor('ALIAS_SHARDS', lambda: max(len(get_shards()), 1), 'alias-shard')
+
+
+def fan_out(func, items):
+    """
+    Return list of func(item) for items, called in parallel threads.
+
+    Single items are called in the current thread, so they see its transaction.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    futures = [_executor.submit(func, item) for item in items]
+    return [future.result() for future in futures]
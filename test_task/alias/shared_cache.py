@@ -0,0 +1,53 @@
+"""Read-through cache of Alias.get_aliases in Django's cache framework, shared by worker processes."""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .index import to_microseconds
+
+
+def get_shared_cache():
+    """Return the cache configured by ALIAS_SHARED_CACHE, None if it is disabled."""
+    name = getattr(settings, 'ALIAS_SHARED_CACHE', None)
+    return caches[name] if name else None
+
+
+def _version_key(target: str):
+    return f'alias:version:{target}'
+
+
+def target_version(cache, target: str):
+    """Return the current version of target, every write of the target bumps it."""
+    key = _version_key(target)
+    version = cache.get(key)
+    if version is None:
+        # Start from a new number, so entries of a lost version can not become current again.
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(cache, targets):
+    """Make all cached windows of targets unreachable in O(1) per target."""
+    for target in targets:
+        try:
+            cache.incr(_version_key(target))
+        except ValueError:
+            cache.add(_version_key(target), time.time_ns() // 1000, timeout=None)
+
+
+def get_aliases(cache, target: str, from_, to, load):
+    """
+    Return set of aliases of target in the time range from cache, load and cache it on a miss.
+
+    Keyword arguments:
+        cache -- the shared cache.
+        load -- callable(target, from_, to) returning the set of aliases.
+    """
+    key = f'alias:aliases:{target}:{target_version(cache, target)}:{to_microseconds(from_)}:{to_microseconds(to)}'
+    aliases = cache.get(key)
+    if aliases is None:
+        aliases = load(target, from_, to)
+        cache.set(key, aliases, timeout=getattr(settings, 'ALIAS_SHARED_CACHE_TIMEOUT', 300))
+    return aliases
@@ -0,0 +1,118 @@
+"""SQLite production tuning: connection pragmas and a trigger enforcing non-overlapping aliases."""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+TRIGGER_NAMES = ('alias_alias_no_overlap_insert', 'alias_alias_no_overlap_update')
+
+# Same rule as Alias._overlap_check. Datetimes are stored as UTC text, which compares
+# chronologically, and open ends are either NULL or the 9999-12-31 sentinel.
+_OVERLAP_CONDITION = '''
+    EXISTS (
+        SELECT 1 FROM {table} AS other
+        WHERE other.alias = NEW.alias AND other.target = NEW.target {exclude}
+          AND (NEW."end" IS NULL OR other.start < NEW."end")
+          AND (other."end" IS NULL OR other."end" > NEW.start)
+    )
+'''
+
+_TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS alias_alias_no_overlap_insert BEFORE INSERT ON {table} '
+    'WHEN ' + _OVERLAP_CONDITION.format(table='{table}', exclude='') +
+    "BEGIN SELECT RAISE(ABORT, 'Aliases can not overlap!'); END",
+    'CREATE TRIGGER IF NOT EXISTS alias_alias_no_overlap_update BEFORE UPDATE OF alias, target, start, "end" '
+    'ON {table} WHEN ' + _OVERLAP_CONDITION.format(table='{table}', exclude='AND other.id <> NEW.id') +
+    "BEGIN SELECT RAISE(ABORT, 'Aliases can not overlap!'); END",
+)
+
+OVERLAP_MESSAGE = 'Aliases can not overlap!'
+
+
+def _trigger_configured(connection):
+    return connection.vendor == 'sqlite' and getattr(settings, 'ALIAS_SQLITE_OVERLAP_TRIGGER', False)
+
+
+def overlap_trigger_enabled(connection):
+    """
+    Return True if the overlap check is left to the trigger of an SQLite database.
+
+    The setting alone is not enough, Python checks stay on until the trigger is installed.
+    """
+    return _trigger_configured(connection) and has_overlap_trigger(connection)
+
+
+@contextmanager
+def write_transaction(using):
+    """
+    transaction.atomic, which takes the write lock of SQLite before its first read.
+
+    A deferred SQLite transaction, which reads before it writes, can not wait for
+    the lock of a concurrent writer: the write fails with "database is locked"
+    at once. A write statement matching no rows takes the lock first and waits
+    for it up to the busy timeout, like BEGIN IMMEDIATE.
+    """
+    from .models import AliasArchiveCutoff
+
+    with transaction.atomic(using=using):
+        connection = transaction.get_connection(using)
+        if connection.vendor == 'sqlite':
+            # A table without triggers: triggers of the search index read before the statement writes.
+            table = connection.ops.quote_name(AliasArchiveCutoff._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'UPDATE {table} SET id = id WHERE 0')
+        yield
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """connection_created receiver applying ALIAS_SQLITE_PRAGMAS to new SQLite connections."""
+    pragmas = getattr(settings, 'ALIAS_SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def install_overlap_trigger(connection):
+    """Create the triggers enforcing non-overlapping aliases."""
+    from .models import Alias
+
+    table = connection.ops.quote_name(Alias._meta.db_table)
+    with connection.cursor() as cursor:
+        for trigger in _TRIGGERS:
+            cursor.execute(trigger.format(table=table))
+    connection.alias_overlap_trigger = (connection.connection, True)
+
+
+def remove_overlap_trigger(connection):
+    with connection.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    connection.alias_overlap_trigger = (connection.connection, False)
+
+
+def has_overlap_trigger(connection):
+    """
+    Return True if the triggers exist, checked once per connection.
+
+    The result is kept with the raw connection it was checked on, so it is checked again after a reconnect.
+    """
+    connection.ensure_connection()
+    raw, installed = getattr(connection, 'alias_overlap_trigger', (None, None))
+    if raw is not connection.connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s)",
+                           TRIGGER_NAMES)
+            installed = len(cursor.fetchall()) == len(TRIGGER_NAMES)
+        connection.alias_overlap_trigger = (connection.connection, installed)
+    return installed
+
+
+def install_trigger_after_migrate(sender, using, **kwargs):
+    """post_migrate receiver installing the triggers if ALIAS_SQLITE_OVERLAP_TRIGGER is enabled."""
+    from django.db import connections
+
+    connection = connections[using]
+    if _trigger_configured(connection):
+        install_overlap_trigger(connection)
@@ -1,9 +1,47 @@
-from django.test import TestCase
-from alias.models import Alias
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import Max
+from django.test import TestCase, TransactionTestCase, override_settings
+from alias import analytics
+from alias.admin import EstimatedCountPaginator
+from alias.archive import archive as archive_aliases
+from alias.batch import BatchResolver
+from alias.fields import OPEN_END, convert_open_ends
+from alias.index import TargetIntervals, interval_index
+from alias.instrumentation import registry
+from alias.lru import LRUCache, get_resolve_cache
+from alias.models import ActiveAlias, Alias, AliasArchive, AliasArchiveCutoff, AliasChange
+from alias.projection import check as check_projection
+from alias.routers import AliasReplicaRouter, start_request
+from alias.sqlite import has_overlap_trigger, install_overlap_trigger, remove_overlap_trigger
+from alias.sharding import fan_out
+from alias.utils import QueryCounter
+from alias.writer import AliasWriter
 from django.utils import timezone
+import contextvars
+import csv
 import datetime
-from django.core.exceptions import ValidationError
+import io
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 import unittest
+from unittest import mock
+from urllib.parse import urlencode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class AliasTest(TestCase):
@@ -199,6 +237,1408 @@ class AliasTest(TestCase):
                                    to=self.moment + datetime.timedelta(days=3))
         self.assertEqual(1, len(result))
 
+        # Alias value active for two targets
+        Alias.objects.create(alias='test-alias-shared', target='test-alias-target-one', start=self.moment)
+        Alias.objects.create(alias='test-alias-shared', target='test-alias-target-two', start=self.moment)
+        with self.assertRaises(ValidationError) as error:
+            Alias.alias_replace(existing_alias='test-alias-shared',
+                                replace_at=self.moment + datetime.timedelta(hours=2), new_alias_value='test-alias-three')
+        self.assertEqual(['Alias test-alias-shared is ambiguous!'], error.exception.messages)
+
+
+class AliasQueryPlanTest(TestCase):
+    """Query plans of the Alias lookups must not fall back to a table scan."""
+    moment = timezone.now()
+
+    def assertNoTableScan(self, queryset):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            self.assertNotRegex(line, r'SCAN (TABLE )?alias_alias\b', msg=plan)
+        self.assertIn('USING', plan)
+
+    def test_get_aliases_plan(self):
+        data = Alias._get_range_aliases(target='test-alias-target-one', from_=self.moment,
+                                        to=self.moment + datetime.timedelta(days=2))
+        self.assertNoTableScan(data)
+
+    def test_pre_aliases_plan(self):
+        self.assertNoTableScan(Alias._get_pre_aliases(target='test-alias-target-one'))
+        self.assertNoTableScan(Alias._get_pre_aliases(target='test-alias-target-one', alias='test-alias-one'))
+
+    def test_overlap_check_plan(self):
+        # Finite alias.
+        alias = Alias(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                      end=self.moment + datetime.timedelta(hours=5))
+        self.assertNoTableScan(alias._get_overlapping())
+
+        # Infinite alias.
+        alias.end = None
+        self.assertNoTableScan(alias._get_overlapping())
+
+
+class AliasQueryCountTest(TestCase):
+    """Database round-trips of Alias methods."""
+    moment = timezone.now()
+
+    def test_save_queries(self):
+        # Overlap check and insert.
+        with QueryCounter() as counter:
+            Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                                 end=self.moment + datetime.timedelta(hours=5))
+        self.assertEqual(2, counter.count)
+
+        with QueryCounter() as counter:
+            Alias.objects.create(alias='test-alias-one', target='test-alias-target-one',
+                                 start=self.moment + datetime.timedelta(hours=5), end=None)
+        self.assertEqual(2, counter.count)
+
+        # Overlap check only.
+        with QueryCounter() as counter:
+            with self.assertRaises(ValidationError):
+                Alias.objects.create(alias='test-alias-one', target='test-alias-target-one',
+                                     start=self.moment + datetime.timedelta(hours=6), end=None)
+        self.assertEqual(1, counter.count)
+
+
+@override_settings(ALIAS_OPEN_END_SENTINEL=True)
+class AliasOpenEndSentinelTest(AliasTest):
+    """AliasTest with open ends stored as the sentinel."""
+
+    def test_open_end_storage(self):
+        alias = Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                                     end=None)
+        self.assertIsNone(alias.end)
+        self.assertIsNone(Alias.objects.get(pk=alias.pk).end)
+        self.assertEqual([alias.pk], list(Alias.objects.filter(end=None).values_list('pk', flat=True)))
+        self.assertEqual(0, Alias.objects.filter(end__isnull=False).count())
+
+        # Stored as the sentinel, so the range lookup is a single condition.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT "end" FROM alias_alias WHERE id = %s', [alias.pk])
+            self.assertEqual(OPEN_END.year, cursor.fetchone()[0].year)
+        self.assertNotIn('IS NULL', str(Alias._get_range_aliases('test-alias-target-one', self.moment,
+                                                                 self.moment).query))
+
+    def test_year_of_sentinel(self):
+        # Only the exact sentinel is an open end, not other moments of its year.
+        end = OPEN_END - datetime.timedelta(days=1)
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=end)
+        self.assertEqual(end, Alias.objects.get(alias='test-alias-one').end)
+        with override_settings(USE_TZ=False):
+            self.assertEqual(end.replace(tzinfo=None), Alias.objects.get(alias='test-alias-one').end)
+
+    def test_convert_open_ends(self):
+        with override_settings(ALIAS_OPEN_END_SENTINEL=False):
+            Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                                 end=None)
+            self.assertEqual(1, convert_open_ends(Alias, 'default', to_sentinel=True))
+
+        self.assertEqual(1, Alias.objects.filter(end=None).count())
+        self.assertEqual({'test-alias-one'}, Alias.get_aliases(target='test-alias-target-one',
+                                                               from_=self.moment + datetime.timedelta(days=1),
+                                                               to=self.moment + datetime.timedelta(days=2)))
+
+        self.assertEqual(1, convert_open_ends(Alias, 'default', to_sentinel=False))
+        with override_settings(ALIAS_OPEN_END_SENTINEL=False):
+            self.assertEqual(1, Alias.objects.filter(end=None).count())
+
+    def test_bench_open_ends(self):
+        out = io.StringIO()
+        call_command('bench_open_ends', targets=10, aliases_per_target=3, lookups=10, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(30, report['rows'])
+        self.assertEqual(1, report['sentinel']['queries_per_call'])
+        self.assertEqual(0, Alias.objects.count())
+
+
+@override_settings(ALIAS_INTERVAL_INDEX=True)
+class AliasIntervalIndexTest(AliasTest):
+    """AliasTest with get_aliases answered by the interval index."""
+
+    def setUp(self):
+        interval_index.clear()
+
+    def test_index_lookups(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                             end=self.moment + datetime.timedelta(hours=5))
+        window = dict(target='test-alias-target-one', from_=self.moment, to=self.moment + datetime.timedelta(days=1))
+
+        # Warmed by the first lookup.
+        with QueryCounter() as counter:
+            self.assertEqual({'test-alias-one'}, Alias.get_aliases(**window))
+            self.assertEqual({'test-alias-one'}, Alias.get_aliases(**window))
+        self.assertEqual(1, counter.count)
+
+        # Invalidated by save() and alias_replace().
+        Alias.objects.create(alias='test-alias-two', target='test-alias-target-one', start=self.moment,
+                             end=None)
+        self.assertEqual({'test-alias-one', 'test-alias-two'}, Alias.get_aliases(**window))
+        Alias.alias_replace(existing_alias='test-alias-two', replace_at=self.moment + datetime.timedelta(hours=1),
+                            new_alias_value='test-alias-three')
+        self.assertEqual({'test-alias-one', 'test-alias-two', 'test-alias-three'}, Alias.get_aliases(**window))
+
+        # Moving an alias to another target invalidates both targets.
+        alias = Alias.objects.get(alias='test-alias-one')
+        alias.target = 'test-alias-target-two'
+        alias.save()
+        self.assertEqual({'test-alias-two', 'test-alias-three'}, Alias.get_aliases(**window))
+
+    def test_target_intervals(self):
+        rand = random.Random(0)
+        rows = []
+        for number in range(300):
+            start = rand.randrange(1000)
+            end = start + rand.randrange(1, 100) if rand.random() > 0.1 else math.inf
+            rows.append((f'alias-{number}', start, end))
+        intervals = TargetIntervals(rows)
+
+        for _ in range(300):
+            from_ = rand.randrange(-50, 1100)
+            to = from_ + rand.randrange(0, 100)
+            expected = {alias for alias, start, end in rows if start < to and end > from_}
+            self.assertEqual(expected, intervals.query(from_, to))
+
+
+class AliasManyTest(TestCase):
+    """Test case for get_aliases_many method."""
+    moment = timezone.now()
+
+    def test_get_aliases_many(self):
+        for number in range(5):
+            Alias.objects.create(alias=f'test-alias-{number}', target=f'test-alias-target-{number % 3}',
+                                 start=self.moment, end=self.moment + datetime.timedelta(hours=number + 1))
+        Alias.objects.create(alias='test-alias-open', target='test-alias-target-0',
+                             start=self.moment + datetime.timedelta(hours=3), end=None)
+
+        targets = [f'test-alias-target-{number}' for number in range(4)]
+        window = dict(from_=self.moment + datetime.timedelta(hours=2), to=self.moment + datetime.timedelta(hours=4))
+        expected = {target: Alias.get_aliases(target=target, **window) for target in targets}
+
+        # One query per chunk of targets.
+        with QueryCounter() as counter:
+            result = Alias.get_aliases_many(targets, chunk_size=3, **window)
+        self.assertEqual(2, counter.count)
+        self.assertEqual(expected, result)
+        self.assertEqual({'test-alias-3', 'test-alias-open'}, result['test-alias-target-0'])
+        self.assertEqual(set(), result['test-alias-target-3'])
+
+        with self.assertRaises(ValidationError):
+            Alias.get_aliases_many(targets, from_=self.moment, to=self.moment - datetime.timedelta(hours=1))
+
+
+class AliasBulkImportTest(TestCase):
+    """Test case for bulk_import method and import_aliases command."""
+    moment = timezone.now()
+
+    def row(self, alias, start, end, target='test-alias-target-one'):
+        return {'alias': alias, 'target': target,
+                'start': (self.moment + datetime.timedelta(hours=start)).isoformat(),
+                'end': end is not None and (self.moment + datetime.timedelta(hours=end)).isoformat() or ''}
+
+    def test_bulk_import(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                             end=self.moment + datetime.timedelta(hours=5))
+        rows = [
+            self.row('test-alias-one', 5, 6),
+            # Overlaps with the existing alias.
+            self.row('test-alias-one', 4, 7),
+            # Overlaps with the first row.
+            self.row('test-alias-one', 5.5, None),
+            self.row('test-alias-one', 6, None),
+            self.row('test-alias-one', -3, 0, target='test-alias-target-two'),
+            self.row('test-alias-two', -3, 0, target='test-alias-target-two'),
+            # Invalid rows.
+            self.row('test-alias-three', 2, 1),
+            self.row('test-alias-three', 2, 1, target='not a slug'),
+            {'alias': 'test-alias-three', 'target': 'test-alias-target-one'},
+        ]
+
+        with QueryCounter() as counter:
+            report = Alias.bulk_import(rows, chunk_size=5)
+        self.assertEqual(4, report['created'])
+        self.assertEqual(5, report['rejected'])
+        self.assertEqual([2, 3, 7, 8, 9], sorted(error['line'] for error in report['errors']))
+        self.assertEqual(5, Alias.objects.count())
+        # Select and insert for each of two chunks, plus savepoints.
+        self.assertEqual(8, counter.count)
+
+        # Imported aliases are checked by save() as usual.
+        with self.assertRaises(ValidationError):
+            Alias.objects.create(alias='test-alias-one', target='test-alias-target-one',
+                                 start=self.moment + datetime.timedelta(hours=10), end=None)
+        self.assertEqual({'test-alias-one', 'test-alias-two'},
+                         Alias.get_aliases(target='test-alias-target-two', from_=self.moment - datetime.timedelta(hours=1),
+                                           to=self.moment))
+
+    def test_import_aliases_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'aliases.csv')
+            with open(path, 'w', newline='') as stream:
+                writer = csv.DictWriter(stream, fieldnames=['alias', 'target', 'start', 'end'])
+                writer.writeheader()
+                writer.writerow(self.row('test-alias-one', 0, 5))
+                writer.writerow(self.row('test-alias-one', 1, None))
+            errors = os.path.join(directory, 'errors.jsonl')
+
+            call_command('import_aliases', path, errors=errors, stdout=io.StringIO())
+            with open(errors) as stream:
+                report = [json.loads(line) for line in stream]
+
+        self.assertEqual(1, Alias.objects.count())
+        self.assertEqual([3], [error['line'] for error in report])
+
+
+class AliasReplaceTest(TestCase):
+    """Test case for atomic alias_replace and alias_replace_many methods."""
+    moment = timezone.now()
+
+    def test_replace_open_alias(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=None)
+        replace_at = self.moment + datetime.timedelta(hours=2)
+
+        # Take the SQLite write lock, lock and find, check the new alias, close the existing one, insert.
+        with QueryCounter() as counter:
+            new_alias = Alias.alias_replace(existing_alias='test-alias-one', replace_at=replace_at,
+                                            new_alias_value='test-alias-two')
+        self.assertEqual(5, counter.count - sum('SAVEPOINT' in sql for sql in counter.queries))
+        self.assertEqual(replace_at, Alias.objects.get(alias='test-alias-one').end)
+        self.assertEqual(('test-alias-target-one', replace_at, None), (new_alias.target, new_alias.start, new_alias.end))
+
+        # The new alias overlaps: nothing is changed.
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one',
+                             start=self.moment + datetime.timedelta(hours=5), end=None)
+        with self.assertRaises(ValidationError):
+            Alias.alias_replace(existing_alias='test-alias-two', replace_at=self.moment + datetime.timedelta(hours=3),
+                                new_alias_value='test-alias-one')
+        self.assertIsNone(Alias.objects.get(alias='test-alias-two').end)
+
+    def test_alias_replace_many(self):
+        for number in range(3):
+            Alias.objects.create(alias=f'test-alias-{number}', target=f'test-alias-target-{number}',
+                                 start=self.moment, end=None)
+        replace_at = self.moment + datetime.timedelta(hours=1)
+
+        with self.assertRaises(ValidationError) as error:
+            Alias.alias_replace_many({'test-alias-0': 'test-alias-0', 'test-alias-9': 'test-alias-10'}, replace_at)
+        self.assertEqual(1, len(error.exception.messages))
+        with self.assertRaises(ValidationError) as error:
+            Alias.alias_replace_many({'test-alias-0': 'test-alias-5', 'test-alias-9': 'test-alias-10'}, replace_at)
+        self.assertEqual(['Alias test-alias-9 does not exist!'], error.exception.messages)
+        self.assertEqual(3, Alias.objects.count())
+
+        # Rotation: a new alias may take a value, which is closed at the same moment.
+        Alias.objects.create(alias='test-alias-7', target='test-alias-target-0',
+                             start=self.moment + datetime.timedelta(minutes=1), end=None)
+        with self.assertRaises(ValidationError):
+            Alias.alias_replace_many({'test-alias-0': 'test-alias-7'}, replace_at)
+        Alias.alias_replace_many({'test-alias-0': 'test-alias-8', 'test-alias-7': 'test-alias-0',
+                                  'test-alias-1': 'test-alias-9'}, replace_at)
+
+        later = dict(from_=replace_at, to=replace_at + datetime.timedelta(hours=1))
+        self.assertEqual({'test-alias-8', 'test-alias-0'}, Alias.get_aliases(target='test-alias-target-0', **later))
+        self.assertEqual({'test-alias-9'}, Alias.get_aliases(target='test-alias-target-1', **later))
+        self.assertEqual({'test-alias-2'}, Alias.get_aliases(target='test-alias-target-2', **later))
+
+
+class AliasResolveTest(TestCase):
+    """Test case for resolve and active_aliases methods."""
+    moment = timezone.now()
+
+    def setUp(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                             end=self.moment + datetime.timedelta(hours=5))
+        Alias.objects.create(alias='test-alias-two', target='test-alias-target-one', start=self.moment, end=None)
+
+    def test_resolve(self):
+        self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-one', at=self.moment))
+        self.assertIsNone(Alias.resolve('test-alias-one', at=self.moment + datetime.timedelta(hours=5)))
+        self.assertIsNone(Alias.resolve('test-alias-one', at=self.moment - datetime.timedelta(microseconds=1)))
+        self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-two'))
+        self.assertIsNone(Alias.resolve('test-alias-three'))
+
+    def test_active_aliases(self):
+        self.assertEqual({'test-alias-one', 'test-alias-two'},
+                         Alias.active_aliases('test-alias-target-one', at=self.moment))
+        self.assertEqual({'test-alias-one', 'test-alias-two'}, Alias.active_aliases('test-alias-target-one'))
+        self.assertEqual({'test-alias-two'}, Alias.active_aliases('test-alias-target-one',
+                                                                  at=self.moment + datetime.timedelta(hours=5)))
+        with override_settings(ALIAS_INTERVAL_INDEX=True):
+            self.assertEqual({'test-alias-one', 'test-alias-two'},
+                             Alias.active_aliases('test-alias-target-one', at=self.moment))
+            self.assertEqual(set(), Alias.active_aliases('test-alias-target-one',
+                                                         at=self.moment - datetime.timedelta(microseconds=1)))
+
+    @override_settings(ALIAS_RESOLVE_CACHE={'MAX_SIZE': 100, 'TTL': 60, 'BUCKET': 3600})
+    def test_resolve_cache(self):
+        cache = get_resolve_cache()
+        at = self.moment + datetime.timedelta(hours=1)
+
+        with QueryCounter() as counter:
+            self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-two', at=at))
+            self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-two', at=at))
+            self.assertIsNone(Alias.resolve('test-alias-three', at=at))
+            self.assertIsNone(Alias.resolve('test-alias-three', at=at))
+        self.assertEqual(2, counter.count)
+        self.assertEqual((2, 2), (cache.hits, cache.misses))
+
+        # Replacing invalidates both alias values.
+        Alias.alias_replace(existing_alias='test-alias-two', replace_at=at, new_alias_value='test-alias-three')
+        self.assertIsNone(Alias.resolve('test-alias-two', at=at))
+        self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-two', at=at - datetime.timedelta(seconds=1)))
+        self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-three', at=at))
+
+        # Intervals read while a write invalidates the alias are not cached.
+        def write_during_read(*args):
+            get_resolve_cache().invalidate('test-alias-one')
+            return fan_out(*args)
+
+        with mock.patch('alias.models.fan_out', write_during_read):
+            self.assertEqual('test-alias-target-one', Alias.resolve('test-alias-one', at=at))
+        with QueryCounter() as counter:
+            Alias.resolve('test-alias-one', at=at)
+        self.assertEqual(1, counter.count)
+
+    def test_lru_cache(self):
+        now = [0]
+        cache = LRUCache(max_size=2, ttl=10, timer=lambda: now[0])
+        cache.set('a', 1, group='x')
+        cache.set('b', 2, group='y')
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3, group='x')
+        # Least recently used entry is dropped.
+        self.assertIsNone(cache.get('b'))
+        cache.invalidate('x')
+        self.assertEqual(0, len(cache))
+
+        # A value read before an invalidation of its group is not cached.
+        generation = cache.generation('x')
+        cache.invalidate('x')
+        cache.set('a', 1, group='x', generation=generation)
+        self.assertEqual(0, len(cache))
+        cache.set('a', 1, group='x', generation=cache.generation('x'))
+        self.assertEqual(1, len(cache))
+        cache.invalidate('x')
+
+        cache.set('a', 1)
+        now[0] = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual({'hits': 1, 'misses': 2, 'size': 0, 'max_size': 2}, cache.info())
+
+
+class AliasListViewTest(TestCase):
+    """Test case for the streaming aliases list."""
+    moment = timezone.now()
+
+    def setUp(self):
+        for number in range(5):
+            Alias.objects.create(alias=f'test-alias-{number}', target=f'test-alias-target-{number % 2}',
+                                 start=self.moment - datetime.timedelta(hours=number),
+                                 end=self.moment + datetime.timedelta(hours=1) if number else None)
+
+    def get(self, **params):
+        response = self.client.get('/', params)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_list(self):
+        data = self.get()
+        self.assertEqual([f'test-alias-{number}' for number in range(5)], [row['alias'] for row in data['results']])
+        self.assertIsNone(data['results'][0]['end'])
+        self.assertIsNone(data['next'])
+
+        self.assertEqual(['test-alias-1', 'test-alias-3'],
+                         [row['alias'] for row in self.get(target='test-alias-target-1')['results']])
+        window = {'from': (self.moment + datetime.timedelta(hours=2)).isoformat(),
+                  'to': (self.moment + datetime.timedelta(hours=3)).isoformat()}
+        self.assertEqual(['test-alias-0'], [row['alias'] for row in self.get(**window)['results']])
+
+    def test_keyset_pagination(self):
+        for order, expected in (('id', [0, 1, 2, 3, 4]), ('start', [4, 3, 2, 1, 0])):
+            aliases, after = [], ''
+            while True:
+                data = self.get(order=order, limit=2, after=after)
+                aliases.extend(int(row['alias'].rsplit('-', 1)[1]) for row in data['results'])
+                if not data['next']:
+                    break
+                after = data['next']
+            self.assertEqual(expected, aliases)
+
+    def test_invalid_params(self):
+        for params in ({'order': 'alias'}, {'limit': '0'}, {'after': 'x'}, {'order': 'start', 'after': 'x,1'},
+                       {'from': 'yesterday'}):
+            self.assertEqual(400, self.client.get('/', params).status_code)
+
+
+@override_settings(ALIAS_SHARED_CACHE='default')
+class AliasSharedCacheTest(AliasTest):
+    """AliasTest with get_aliases read through the shared cache."""
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_shared_cache(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=None)
+        windows = [dict(target='test-alias-target-one', from_=self.moment + datetime.timedelta(hours=hours),
+                        to=self.moment + datetime.timedelta(hours=hours + 1)) for hours in range(3)]
+
+        with QueryCounter() as counter:
+            for _ in range(2):
+                for window in windows:
+                    self.assertEqual({'test-alias-one'}, Alias.get_aliases(**window))
+        self.assertEqual(3, counter.count)
+
+        # One write invalidates every cached window of the target.
+        Alias.alias_replace(existing_alias='test-alias-one', replace_at=self.moment + datetime.timedelta(hours=1),
+                            new_alias_value='test-alias-two')
+        self.assertEqual({'test-alias-one'}, Alias.get_aliases(**windows[0]))
+        self.assertEqual({'test-alias-two'}, Alias.get_aliases(**windows[1]))
+        self.assertEqual({'test-alias-two'}, Alias.get_aliases(**windows[2]))
+
+
+class AliasBenchTest(TestCase):
+    """Smoke test of the bench_aliases command."""
+
+    def test_bench_aliases(self):
+        out = io.StringIO()
+        call_command('bench_aliases', sizes='30,60', aliases_per_target=3, calls=6, memory_calls=2,
+                     batch_targets=4, stdout=out, stderr=io.StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual([30, 60], [run['rows'] for run in report['runs']])
+        methods = report['runs'][0]['methods']
+        self.assertEqual({'get_aliases', 'get_aliases_many', 'resolve', 'active_aliases', 'alias_replace', 'save'},
+                         set(methods))
+        self.assertEqual(1, methods['get_aliases']['queries_per_call'])
+        self.assertEqual(6, methods['save']['calls'])
+        self.assertGreater(methods['save']['peak_memory_bytes'], 0)
+        self.assertEqual(0, Alias.objects.count())
+
+
+class AliasAsyncTest(TransactionTestCase):
+    """Test case for the async Alias API and async views."""
+    moment = timezone.now()
+
+    def setUp(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=None)
+
+    async def test_async_api(self):
+        window = dict(from_=self.moment, to=self.moment + datetime.timedelta(hours=1))
+        self.assertEqual({'test-alias-one'}, await Alias.aget_aliases('test-alias-target-one', **window))
+        self.assertEqual('test-alias-target-one', await Alias.aresolve('test-alias-one', self.moment))
+
+        new_alias = await Alias.aalias_replace('test-alias-one', self.moment + datetime.timedelta(minutes=30),
+                                               'test-alias-two')
+        self.assertEqual('test-alias-two', new_alias.alias)
+        self.assertEqual({'test-alias-one', 'test-alias-two'},
+                         await Alias.aget_aliases('test-alias-target-one', **window))
+        with self.assertRaises(ValidationError):
+            await Alias.aalias_replace('test-alias-one', self.moment + datetime.timedelta(hours=2), 'test-alias-three')
+
+    async def test_async_views(self):
+        # Query parameters are passed in the path, the async client of this Django version drops data of GET.
+        query = urlencode({'target': 'test-alias-target-one', 'from': self.moment.isoformat(),
+                           'to': (self.moment + datetime.timedelta(hours=1)).isoformat()})
+        response = await self.async_client.get(f'/aliases/?{query}')
+        self.assertEqual({'aliases': ['test-alias-one']}, response.json())
+        response = await self.async_client.get('/resolve/?alias=test-alias-one')
+        self.assertEqual({'alias': 'test-alias-one', 'target': 'test-alias-target-one'}, response.json())
+        self.assertEqual(400, (await self.async_client.get('/aliases/?target=x')).status_code)
+
+        at = (self.moment + datetime.timedelta(hours=1)).isoformat()
+        body = json.dumps({'existing': 'test-alias-one', 'new': 'test-alias-two', 'at': at})
+        response = await self.async_client.post('/replace/', body, content_type='application/json')
+        self.assertEqual(201, response.status_code)
+        self.assertEqual('test-alias-two', response.json()['alias'])
+        response = await self.async_client.post('/replace/', body, content_type='application/json')
+        self.assertEqual({'error': ['Alias does not exist!']}, response.json())
+
+        # Only JSON objects are accepted.
+        response = await self.async_client.post('/replace/', {'existing': 'test-alias-two', 'new': 'test-alias-three'})
+        self.assertEqual(415, response.status_code)
+        response = await self.async_client.post('/replace/', '[1]', content_type='application/json')
+        self.assertEqual({'error': ['JSON object is required!']}, response.json())
+        self.assertEqual(400, response.status_code)
+
+        # Lock contention is reported as a temporary failure.
+        with mock.patch.object(Alias, 'aalias_replace', side_effect=OperationalError('database is locked')):
+            response = await self.async_client.post('/replace/', body, content_type='application/json')
+        self.assertEqual((503, '1'), (response.status_code, response['Retry-After']))
+
+        # The list is rendered as a page under ASGI.
+        with override_settings(ALIAS_LIST_ASGI_LIMIT=1):
+            response = await self.async_client.get('/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(1, len(response.json()['results']))
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_bench_asgi(self):
+        out = io.StringIO()
+        call_command('bench_asgi', rows=20, aliases_per_target=2, requests=10, concurrency=3, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(0, report['asgi']['error_rate'])
+        self.assertEqual(0, report['wsgi']['error_rate'])
+        self.assertEqual(10, report['wsgi']['requests'])
+        # The configured database is left untouched.
+        self.assertEqual(['test-alias-one'], list(Alias.objects.values_list('alias', flat=True)))
+
+    def test_loadtest(self):
+        # Concurrent writers run against a temporary database file.
+        out = io.StringIO()
+        call_command('loadtest', rows=20, aliases_per_target=2, rps=100, duration=0.2, concurrency=4,
+                     mix='list=1,aliases=1,resolve=1,replace=1', seed=2, stdout=out)
+        report = json.loads(out.getvalue())
+        for server in ('asgi', 'wsgi'):
+            self.assertEqual(20, report[server]['total']['requests'])
+            endpoints = report[server]['endpoints']
+            self.assertEqual({'list', 'aliases', 'resolve', 'replace'}, set(endpoints))
+            self.assertTrue(endpoints['replace']['requests'])
+            self.assertEqual(0, report[server]['total']['error_rate'])
+        # The configured database is left untouched.
+        self.assertEqual(['test-alias-one'], list(Alias.objects.values_list('alias', flat=True)))
+        with self.assertRaises(CommandError):
+            call_command('loadtest', mix='list=1,delete=1')
+
+
+@override_settings(ALIAS_INSTRUMENTATION=True)
+class AliasInstrumentationTest(TransactionTestCase):
+    """Test case for instrumentation of Alias methods and views."""
+    moment = timezone.now()
+
+    def setUp(self):
+        registry.clear()
+
+    def test_methods(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=None)
+        Alias.get_aliases(target='test-alias-target-one', from_=self.moment,
+                          to=self.moment + datetime.timedelta(hours=1))
+        list(Alias.objects.all())
+
+        operations = registry.snapshot()
+        self.assertEqual({'save', 'get_aliases'}, set(operations))
+        self.assertEqual((1, 2, 0), (operations['save']['calls'], operations['save']['queries'],
+                                     operations['save']['rows']))
+        self.assertEqual(1, operations['get_aliases']['queries'])
+        self.assertEqual(1, sum(operations['get_aliases']['buckets_ms'].values()))
+        # Rows are counted by the cursor, values_list rows included.
+        self.assertEqual(1, operations['get_aliases']['rows'])
+
+        # Generators are measured until they are exhausted.
+        timeline = Alias.timeline('test-alias-target-one', self.moment, self.moment + datetime.timedelta(hours=1))
+        self.assertNotIn('timeline', registry.snapshot())
+        self.assertEqual(1, len(list(timeline)))
+        self.assertEqual((1, 1, 1), tuple(registry.snapshot()['timeline'][key] for key in ('calls', 'queries', 'rows')))
+
+    def test_views(self):
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=None)
+        response = self.client.get('/resolve/', {'alias': 'test-alias-one'})
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('alias-0-resolve;dur=', timing)
+        self.assertIn('desc="queries=1"', timing)
+
+        operations = self.client.get('/metrics/').json()['operations']
+        self.assertEqual(1, operations['view:alias.views.resolve']['calls'])
+        self.assertEqual(1, operations['resolve']['queries'])
+
+        with override_settings(ALIAS_INSTRUMENTATION=False):
+            self.assertFalse(self.client.get('/resolve/', {'alias': 'test-alias-one'}).has_header('Server-Timing'))
+            self.assertEqual(404, self.client.get('/metrics/').status_code)
+            Alias.get_aliases(target='test-alias-target-one', from_=self.moment, to=self.moment)
+        self.assertNotIn('get_aliases', registry.snapshot())
+
+    def test_streaming_views(self):
+        for number in range(3):
+            Alias.objects.create(alias=f'test-alias-{number}', target='test-alias-target-one', start=self.moment)
+        response = self.client.get('/')
+        self.assertTrue(response.has_header('Server-Timing'))
+        self.assertNotIn('view:alias.views.index', registry.snapshot())
+
+        # Queries of the stream are recorded when it is closed.
+        self.assertEqual(3, len(json.loads(b''.join(response.streaming_content))['results']))
+        operations = registry.snapshot()['view:alias.views.index']
+        self.assertEqual(1, operations['calls'])
+        self.assertGreaterEqual(operations['queries'], 1)
+        self.assertEqual(3, operations['rows'])
+
+    async def test_async_views(self):
+        # With DEBUG, Django logs every middleware, which it adapts to the async chain.
+        with self.assertLogs('django.request', 'DEBUG') as logs, override_settings(DEBUG=True):
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Middleware loaded.')
+        self.assertFalse([line for line in logs.output if 'adapted' in line and 'alias.instrumentation' in line])
+
+        await sync_to_async(Alias.objects.create)(alias='test-alias-one', target='test-alias-target-one',
+                                                  start=self.moment)
+        response = await self.async_client.get('/resolve/?alias=test-alias-one')
+        self.assertIn('alias-0-resolve;dur=', response['Server-Timing'])
+        self.assertEqual(1, registry.snapshot()['view:alias.views.resolve']['calls'])
+
+
+@override_settings(ALIAS_SQLITE_OVERLAP_TRIGGER=True)
+class AliasSqliteTriggerTest(AliasTest):
+    """AliasTest with overlapping checked by the SQLite trigger."""
+
+    def setUp(self):
+        install_overlap_trigger(connection)
+
+    def test_trigger(self):
+        self.assertTrue(has_overlap_trigger(connection))
+        # A result checked on another raw connection, like one before a reconnect, is checked again.
+        connection.alias_overlap_trigger = (object(), False)
+        self.assertTrue(has_overlap_trigger(connection))
+
+        # Insert only, the check runs inside of the database.
+        with QueryCounter() as counter:
+            Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment,
+                                 end=self.moment + datetime.timedelta(hours=5))
+        self.assertEqual(1, counter.count - sum('SAVEPOINT' in sql for sql in counter.queries))
+
+        # Writes bypassing Python checks are rejected as well.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Alias.objects.bulk_create([Alias(alias='test-alias-one', target='test-alias-target-one',
+                                             start=self.moment + datetime.timedelta(hours=4), end=None)])
+        Alias.objects.bulk_create([Alias(alias='test-alias-one', target='test-alias-target-one',
+                                         start=self.moment + datetime.timedelta(hours=5), end=None)])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Alias.objects.filter(end__isnull=False).update(end=None)
+
+        call_command('sqlite_overlap_trigger', 'remove', stdout=io.StringIO())
+        self.assertFalse(has_overlap_trigger(connection))
+
+    def test_missing_trigger(self):
+        # Without the trigger the setting does not turn the Python check off.
+        remove_overlap_trigger(connection)
+        Alias.objects.create(alias='test-alias-one', target='test-alias-target-one', start=self.moment, end=None)
+        with self.assertRaises(ValidationError):
+            Alias.objects.create(alias='test-alias-one', target='test-alias-target-one',
+                                 start=self.moment + datetime.timedelta(hours=1), end=None)
+
+
+class SqlitePragmasTest(TestCase):
+    """Test case for pragmas of the production connection profile."""
+
+    @override_settings(ALIAS_SQLITE_PRAGMAS={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234})
+    def test_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}
+            wrapper = connections['default'].__class__(settings_dict, alias='pragmas')
+            try:
+                with wrapper.cursor() as cursor:
+                    values = [cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                              for name in ('journal_mode', 'synchronous', 'busy_timeout')]
+            finally:
+                wrapper.close()
+        # synchronous=NORMAL is 1.
+        self.assertEqual(['wal', 1, 1234], values)
+
+
+@override_settings(ALIAS_READ_REPLICAS=['replica'])
+class AliasReplicaRouterTest(TestCase):
+    """Test case for routing of alias reads to replicas."""
+    databases = {'default', 'replica'}
+    moment = timezone.now()
+
+    def setUp(self):
+        start_request()
+
+    def test_reads_from_replica(self):
+        self.assertEqual('replica', Alias.objects.all().db)
+        self.assertEqual('default', Alias.objects.select_for_update().db)
+
+    def test_read_your_writes(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        self.assertEqual('default', Alias.objects.all().db)
+
+        # A new request reads from the replica again.
+        start_request()
+        self.assertEqual('replica', Alias.objects.all().db)
+
+    def test_overlap_check_reads_primary(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        start_request()
+        with QueryCounter('replica') as replica, QueryCounter('default') as default:
+            with self.assertRaises(ValidationError):
+                Alias.objects.create(alias='test-alias', target='test-target',
+                                     start=self.moment + datetime.timedelta(hours=1))
+        self.assertEqual(0, replica.count)
+        self.assertTrue(default.count)
+
+    def test_failed_write_reads_from_replica(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        start_request()
+        with self.assertRaises(ValidationError):
+            Alias.objects.create(alias='test-alias', target='test-target',
+                                 start=self.moment + datetime.timedelta(hours=1))
+        self.assertEqual('replica', Alias.objects.all().db)
+
+    def test_writes_outside_of_requests(self):
+        def write():
+            Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+            return Alias.objects.all().db
+
+        # A new context has no request, e.g. the writer worker, so it does not stick to the primary.
+        self.assertEqual('replica', contextvars.Context().run(write))
+
+    def test_middleware_async_capable(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs, override_settings(DEBUG=True):
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Middleware loaded.')
+        self.assertFalse([line for line in logs.output if 'adapted' in line and 'alias.routers' in line])
+
+
+@override_settings(ALIAS_READ_REPLICAS=['replica'])
+class AliasReplicaViewTest(TransactionTestCase):
+    """Test case for the replica stickiness of requests, which needs committed data."""
+    databases = {'default', 'replica'}
+    moment = timezone.now()
+
+    def test_views_stick_per_request(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        with QueryCounter('replica') as replica, QueryCounter('default') as default:
+            response = self.client.get('/', {'target': 'test-target'})
+            data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(['test-alias'], [row['alias'] for row in data['results']])
+        # The write before the request does not make it stick to the primary.
+        self.assertTrue(replica.count)
+        self.assertEqual(0, default.count)
+
+
+@override_settings(ALIAS_SHARDS=['default', 'shard_1'])
+class AliasShardingTest(TransactionTestCase):
+    """Test case for sharding of aliases by target: target-0 is stored in shard_1, target-4 in default."""
+    databases = {'default', 'shard_1'}
+    moment = timezone.now()
+
+    def setUp(self):
+        for number, target in enumerate(['target-0', 'target-4']):
+            Alias.objects.create(alias=f'{target}-alias', target=target,
+                                 start=self.moment + datetime.timedelta(hours=number))
+        self.window = (self.moment - datetime.timedelta(days=1), self.moment + datetime.timedelta(days=1))
+
+    def test_routing(self):
+        self.assertEqual(['target-0-alias'], list(Alias.objects.using('shard_1').values_list('alias', flat=True)))
+        self.assertEqual(['target-4-alias'], list(Alias.objects.using('default').values_list('alias', flat=True)))
+        self.assertEqual({'target-0-alias'}, Alias.get_aliases('target-0', *self.window))
+        self.assertEqual({'target-0': {'target-0-alias'}, 'target-4': {'target-4-alias'}, 'target-1': set()},
+                         Alias.get_aliases_many(['target-0', 'target-4', 'target-1'], *self.window))
+
+        # Overlap checks and updates use the shard of the target.
+        with self.assertRaises(ValidationError):
+            Alias.objects.create(alias='target-0-alias', target='target-0',
+                                 start=self.moment + datetime.timedelta(hours=5))
+        alias = Alias.objects.using('shard_1').get()
+        alias.end = self.moment + datetime.timedelta(hours=1)
+        alias.save()
+        self.assertEqual(set(), Alias.get_aliases('target-0', self.moment + datetime.timedelta(hours=2),
+                                                  self.moment + datetime.timedelta(hours=3)))
+
+        # Retargeting to another shard is rejected, rows of both shards are kept.
+        alias.target = 'target-4'
+        with self.assertRaises(ValidationError):
+            alias.save()
+        self.assertEqual([('target-0-alias', 'target-0')], list(Alias.objects.using('shard_1').values_list(
+            'alias', 'target')))
+        self.assertEqual([('target-4-alias', 'target-4')], list(Alias.objects.using('default').values_list(
+            'alias', 'target')))
+        alias.target = 'target-0'
+        alias.delete()
+        self.assertFalse(Alias.objects.using('shard_1').exists())
+
+        # Instances without a target are left to the default routing.
+        router = AliasReplicaRouter()
+        self.assertIsNone(router.db_for_write(AliasArchiveCutoff, instance=AliasArchiveCutoff(cutoff=self.moment)))
+        self.assertIsNone(router.db_for_read(AliasArchiveCutoff, instance=AliasArchiveCutoff(cutoff=self.moment)))
+
+    def test_resolve(self):
+        Alias.objects.create(alias='shared', target='target-0', start=self.moment)
+        Alias.objects.create(alias='shared', target='target-4', start=self.moment + datetime.timedelta(hours=1))
+        self.assertEqual('target-0', Alias.resolve('shared', self.moment + datetime.timedelta(minutes=30)))
+        self.assertEqual('target-4', Alias.resolve('shared', self.moment + datetime.timedelta(hours=2)))
+        with override_settings(ALIAS_RESOLVE_CACHE={'MAX_SIZE': 100}):
+            self.assertEqual('target-4', Alias.resolve('shared', self.moment + datetime.timedelta(hours=2)))
+
+    def test_replace(self):
+        replace_at = self.moment + datetime.timedelta(hours=3)
+        new_alias = Alias.alias_replace('target-0-alias', replace_at, 'target-0-new')
+        self.assertEqual('shard_1', new_alias._state.db)
+        self.assertEqual(2, Alias.objects.using('shard_1').count())
+
+        new_aliases = Alias.alias_replace_many({'target-0-new': 'target-0-newer', 'target-4-alias': 'target-4-new'},
+                                               replace_at + datetime.timedelta(hours=1))
+        self.assertEqual({'target-0-newer', 'target-4-new'}, {new_alias.alias for new_alias in new_aliases})
+        self.assertEqual({'target-0': {'target-0-newer'}, 'target-4': {'target-4-new'}},
+                         Alias.get_aliases_many(['target-0', 'target-4'], replace_at + datetime.timedelta(hours=2),
+                                                replace_at + datetime.timedelta(hours=3)))
+
+        # Nothing is replaced if a shard fails the checks.
+        with self.assertRaises(ValidationError):
+            Alias.alias_replace_many({'target-0-newer': 'target-0-last', 'missing': 'target-4-last'},
+                                     replace_at + datetime.timedelta(hours=4))
+        self.assertFalse(Alias.objects.using('shard_1').filter(alias='target-0-last').exists())
+
+    def test_bulk_import(self):
+        report = Alias.bulk_import([{'alias': 'imported', 'target': target, 'start': self.moment.isoformat()}
+                                    for target in ('target-0', 'target-4', 'target-5')])
+        self.assertEqual(3, report['created'])
+        self.assertEqual(1, Alias.objects.using('shard_1').filter(alias='imported').count())
+        self.assertEqual(2, Alias.objects.using('default').filter(alias='imported').count())
+
+    def test_list(self):
+        # Ids of both shards start from 1.
+        expected = {'id': ['target-0-alias', 'target-4-alias'], 'start': ['target-0-alias', 'target-4-alias']}
+        for order, aliases in expected.items():
+            response = self.client.get('/', {'order': order})
+            data = json.loads(b''.join(response.streaming_content))
+            self.assertEqual(aliases, [row['alias'] for row in data['results']])
+
+            pages, params = [], {'order': order, 'limit': 1}
+            while True:
+                response = self.client.get('/', params)
+                data = json.loads(b''.join(response.streaming_content))
+                pages.extend(row['alias'] for row in data['results'])
+                if not data['next']:
+                    break
+                params['after'] = data['next']
+            self.assertEqual(aliases, pages)
+
+
+@override_settings(ALIAS_CHANGE_LOG=True)
+class AliasChangeLogTest(TestCase):
+    """Test case for the change log of aliases."""
+    moment = timezone.now()
+
+    def log(self, after=None):
+        return [(change.action, change.alias_pk, change.alias, change.end)
+                for change in Alias.changes(after)[0]]
+
+    def test_writes(self):
+        alias = Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        alias.end = self.moment + datetime.timedelta(hours=2)
+        alias.save()
+        new_alias = Alias.alias_replace('test-alias', self.moment + datetime.timedelta(hours=1), 'test-new')
+        new_pk = new_alias.pk
+        new_alias.delete()
+
+        self.assertEqual([('created', alias.pk, 'test-alias', None),
+                          ('updated', alias.pk, 'test-alias', self.moment + datetime.timedelta(hours=2)),
+                          ('updated', alias.pk, 'test-alias', self.moment + datetime.timedelta(hours=1)),
+                          ('created', new_pk, 'test-new', None),
+                          ('deleted', new_pk, 'test-new', None)], self.log())
+
+        # Failed writes are not logged.
+        with self.assertRaises(ValidationError):
+            Alias.alias_replace('test-alias', self.moment + datetime.timedelta(hours=5), 'test-new')
+        with self.assertRaises(ValidationError):
+            Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        self.assertEqual(5, AliasChange.objects.count())
+
+    def test_bulk_writes(self):
+        Alias.bulk_import([{'alias': f'test-alias-{number}', 'target': 'test-target',
+                            'start': self.moment.isoformat()} for number in range(3)])
+        new_aliases = Alias.alias_replace_many({'test-alias-0': 'test-new-0', 'test-alias-1': 'test-new-1'},
+                                               self.moment + datetime.timedelta(hours=1))
+        pks = dict(Alias.objects.values_list('alias', 'pk'))
+        log = self.log()
+        self.assertEqual([('created', pks[f'test-alias-{number}'], f'test-alias-{number}', None) for number in range(3)],
+                         log[:3])
+        self.assertEqual({('updated', pks['test-alias-0'], 'test-alias-0', self.moment + datetime.timedelta(hours=1)),
+                          ('updated', pks['test-alias-1'], 'test-alias-1', self.moment + datetime.timedelta(hours=1)),
+                          ('created', pks['test-new-0'], 'test-new-0', None),
+                          ('created', pks['test-new-1'], 'test-new-1', None)}, set(log[3:]))
+        self.assertEqual(2, len(new_aliases))
+
+    def test_cursor(self):
+        for number in range(5):
+            Alias.objects.create(alias=f'test-alias-{number}', target='test-target', start=self.moment)
+
+        synced, cursor = [], None
+        while True:
+            changes, next_cursor = Alias.changes(cursor, limit=2)
+            if not changes:
+                break
+            synced.extend(change.alias for change in changes)
+            cursor = next_cursor
+        self.assertEqual([f'test-alias-{number}' for number in range(5)], synced)
+
+        # The cursor does not move without changes and reads only new ones.
+        self.assertEqual(([], cursor), Alias.changes(cursor))
+        Alias.objects.create(alias='test-alias-5', target='test-target', start=self.moment)
+        pk = Alias.objects.get(alias='test-alias-5').pk
+        with QueryCounter() as counter:
+            self.assertEqual([('created', pk, 'test-alias-5', None)], self.log(cursor))
+        self.assertEqual(1, counter.count)
+
+        with self.assertRaises(ValidationError):
+            Alias.changes('1.2')
+
+    def test_view(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        data = self.client.get('/changes/', {'limit': 10}).json()
+        self.assertEqual([('created', 'test-alias')], [(change['action'], change['alias']) for change in data['changes']])
+        self.assertEqual([], self.client.get('/changes/', {'after': data['next']}).json()['changes'])
+        self.assertEqual(400, self.client.get('/changes/', {'after': 'x'}).status_code)
+
+        with override_settings(ALIAS_CHANGE_LOG=False):
+            self.assertEqual(404, self.client.get('/changes/').status_code)
+            Alias.objects.create(alias='test-alias-2', target='test-target', start=self.moment)
+        self.assertEqual(1, AliasChange.objects.count())
+
+
+@override_settings(ALIAS_ACTIVE_PROJECTION=True)
+class AliasActiveProjectionTest(TestCase):
+    """Test case for the projection of active aliases."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        hour = datetime.timedelta(hours=1)
+        for alias, start, end in [('active', -hour, None), ('ended', -2 * hour, -hour), ('future', hour, None),
+                                  ('finite', -hour, hour)]:
+            Alias.objects.create(alias=alias, target='test-target', start=self.now + start,
+                                 end=end and self.now + end)
+
+    def test_lookups(self):
+        with QueryCounter() as counter:
+            self.assertEqual('test-target', Alias.resolve('active'))
+        self.assertEqual(1, counter.count)
+        self.assertIn('alias_activealias', counter.queries[0])
+        self.assertIsNone(Alias.resolve('ended'))
+        self.assertIsNone(Alias.resolve('future'))
+        self.assertEqual({'active', 'finite'}, Alias.active_aliases('test-target'))
+        with override_settings(ALIAS_ACTIVE_PROJECTION=False):
+            self.assertEqual({'active', 'finite'}, Alias.active_aliases('test-target'))
+        self.assertEqual(['active', 'finite', 'future'], sorted(ActiveAlias.objects.values_list('alias', flat=True)))
+
+    def test_maintained(self):
+        Alias.alias_replace('active', self.now, 'replaced')
+        alias = Alias.objects.get(alias='finite')
+        alias.end = self.now - datetime.timedelta(minutes=1)
+        alias.save()
+        Alias.objects.get(alias='future').delete()
+        Alias.alias_replace_many({'replaced': 'replaced-again'}, self.now + datetime.timedelta(minutes=1))
+        Alias.bulk_import([{'alias': 'imported', 'target': 'test-target', 'start': self.now.isoformat()}])
+
+        self.assertEqual({'missing': [], 'extra': [], 'different': []}, check_projection('default'))
+        self.assertEqual({'imported', 'replaced'}, Alias.active_aliases('test-target'))
+        self.assertEqual('test-target', Alias.resolve('replaced'))
+
+    def test_sweep(self):
+        later = self.now + datetime.timedelta(hours=2)
+        with mock.patch.object(timezone, 'now', return_value=later):
+            self.assertEqual({'active', 'future'}, Alias.active_aliases('test-target'))
+            self.assertEqual({'missing': [], 'extra': [], 'different': []}, check_projection('default'))
+            out = io.StringIO()
+            call_command('active_aliases', 'sweep', stdout=out)
+        self.assertIn('1 ended aliases removed', out.getvalue())
+        self.assertFalse(ActiveAlias.objects.filter(alias='finite').exists())
+
+    def test_check(self):
+        ActiveAlias.objects.filter(alias='active').delete()
+        ActiveAlias.objects.filter(alias='finite').update(target='other-target')
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('active_aliases', 'check', stdout=out)
+        self.assertIn('1 missing', out.getvalue())
+        self.assertIn('1 different', out.getvalue())
+
+        call_command('active_aliases', 'rebuild', stdout=io.StringIO())
+        call_command('active_aliases', 'check', stdout=out)
+        self.assertIn('projection is consistent', out.getvalue())
+
+
+@unittest.skipUnless(numpy, 'NumPy is not installed.')
+class AliasBatchResolverTest(TestCase):
+    """Test case for the vectorized batch resolution."""
+    moment = timezone.now().replace(microsecond=0)
+
+    def setUp(self):
+        random.seed(7)
+        hour = datetime.timedelta(hours=1)
+        for number in range(40):
+            start = self.moment + random.randint(0, 48) * hour
+            end = None if number % 5 == 0 else start + random.randint(1, 24) * hour
+            # Aliases of different targets may overlap.
+            Alias.objects.create(alias=f'test-alias-{number % 7}', target=f'test-target-{number % 3}-{number}',
+                                 start=start, end=end)
+
+    def test_resolve(self):
+        resolver = BatchResolver.load()
+        pairs = [(f'test-alias-{random.randint(0, 8)}',
+                  self.moment + datetime.timedelta(minutes=random.randint(-60, 80 * 60))) for _ in range(300)]
+        with QueryCounter() as counter:
+            targets = resolver.resolve([alias for alias, at in pairs], [at for alias, at in pairs])
+        self.assertEqual(0, counter.count)
+        self.assertEqual([Alias.resolve(alias, at) for alias, at in pairs], list(targets))
+
+        # datetime64 moments and chunks of pairs.
+        aliases = numpy.array([alias for alias, at in pairs])
+        moments = numpy.array([at.replace(tzinfo=None) for alias, at in pairs], dtype='datetime64[us]')
+        chunks = resolver.resolve_chunks((aliases[i:i + 100], moments[i:i + 100]) for i in range(0, 300, 100))
+        self.assertEqual(list(targets), list(numpy.concatenate(list(chunks))))
+
+    def test_load(self):
+        resolver = BatchResolver.load(aliases=['test-alias-1'], from_=self.moment, to=self.moment)
+        self.assertEqual([None], list(resolver.resolve(['test-alias-2'], [self.moment])))
+        self.assertEqual([Alias.resolve('test-alias-1', self.moment)],
+                         list(resolver.resolve(['test-alias-1'], [self.moment])))
+
+    @override_settings(ALIAS_ARCHIVE=True)
+    def test_archived(self):
+        past, day = self.moment - datetime.timedelta(days=10), datetime.timedelta(days=1)
+        for number in range(6):
+            Alias.objects.create(alias=f'test-alias-{number % 4}', target=f'test-target-archived-{number}',
+                                 start=past + number * day, end=past + (number + 2) * day)
+        pairs = [(f'test-alias-{number % 4}', past + datetime.timedelta(hours=12 * number)) for number in range(16)]
+        expected = [Alias.resolve(alias, at) for alias, at in pairs]
+        call_command('archive_aliases', '--before', (past + 8 * day).isoformat(), stdout=io.StringIO())
+        self.assertFalse(Alias.objects.filter(target__startswith='test-target-archived').exists())
+
+        for resolver in (BatchResolver.load(), BatchResolver.load(from_=past),
+                         BatchResolver.load(aliases={alias for alias, at in pairs}, from_=past)):
+            self.assertEqual(expected, list(resolver.resolve([alias for alias, at in pairs],
+                                                             [at for alias, at in pairs])))
+
+        # After the cutoff archived aliases are not loaded.
+        resolver = BatchResolver.load(from_=past + 8 * day)
+        self.assertFalse([target for target in resolver.targets if target.startswith('test-target-archived')])
+
+    def test_without_numpy(self):
+        with mock.patch('alias.batch.np', None), self.assertRaises(ImproperlyConfigured):
+            BatchResolver([])
+
+
+class AliasWriterTest(TransactionTestCase):
+    """Test case for the group-commit writer."""
+    moment = timezone.now()
+
+    def test_create(self):
+        hour = datetime.timedelta(hours=1)
+        futures = {}
+
+        def submit(writer, thread):
+            for number in range(20):
+                # Every alias value is submitted by two threads, one of them overlaps.
+                futures[thread, number] = writer.create(f'test-alias-{number}', 'test-target',
+                                                        self.moment + thread % 2 * 2 * hour + hour * (thread // 2),
+                                                        self.moment + thread % 2 * 2 * hour + 2 * hour)
+
+        # The batch waits for more requests until the writer is closed.
+        with AliasWriter(max_delay=60) as writer:
+            threads = [threading.Thread(target=submit, args=(writer, thread)) for thread in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        results = {key: future.exception() or future.result() for key, future in futures.items()}
+        self.assertEqual(1, writer.batches)
+
+        for number in range(20):
+            self.assertIsInstance(results[0, number], Alias)
+            self.assertIsNotNone(results[0, number].pk)
+            self.assertIsInstance(results[1, number], Alias)
+            # Thread 2 overlaps with thread 0.
+            self.assertIsInstance(results[2, number], ValidationError)
+        self.assertEqual(40, Alias.objects.count())
+
+    def test_replace(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        with AliasWriter() as writer:
+            replaced = writer.replace('test-alias', self.moment + datetime.timedelta(hours=1), 'test-new')
+            missing = writer.replace('test-missing', self.moment, 'test-new')
+            invalid = writer.create('test-other', 'test-target', 'not a date')
+            created = writer.create('test-new', 'test-target', self.moment + datetime.timedelta(hours=2))
+        self.assertEqual('test-new', replaced.result().alias)
+        self.assertIsInstance(missing.exception(), ValidationError)
+        self.assertIsInstance(invalid.exception(), ValidationError)
+        # Requests are applied in order: the replacement already created test-new.
+        self.assertIsInstance(created.exception(), ValidationError)
+        self.assertEqual(['test-alias', 'test-new'],
+                         list(Alias.objects.order_by('start').values_list('alias', flat=True)))
+
+        with self.assertRaises(RuntimeError):
+            writer.create('test-other', 'test-target', self.moment)
+
+    def test_failed_batch(self):
+        Alias.objects.create(alias='test-alias', target='test-target', start=self.moment)
+        with mock.patch.object(Alias, 'alias_replace', side_effect=IntegrityError('failed')):
+            with AliasWriter(max_delay=60) as writer:
+                created = writer.create('test-one', 'test-target', self.moment)
+                failed = writer.replace('test-alias', self.moment + datetime.timedelta(hours=1), 'test-new')
+                other = writer.create('test-two', 'test-target', self.moment)
+        # Only the failing request of the batch fails, the others are written one by one.
+        self.assertIsInstance(failed.exception(), IntegrityError)
+        self.assertEqual('test-one', created.result().alias)
+        self.assertEqual('test-two', other.result().alias)
+        self.assertEqual(['test-alias', 'test-one', 'test-two'],
+                         list(Alias.objects.order_by('alias').values_list('alias', flat=True)))
+
+    def test_close(self):
+        writer = AliasWriter()
+        futures, refused = [], []
+
+        def submit(thread):
+            for number in range(20):
+                try:
+                    futures.append(writer.create(f'test-alias-{thread}-{number}', 'test-target', self.moment))
+                except RuntimeError:
+                    refused.append(number)
+
+        threads = [threading.Thread(target=submit, args=(thread,)) for thread in range(3)]
+        for thread in threads:
+            thread.start()
+        writer.close()
+        for thread in threads:
+            thread.join()
+        # Every accepted request is written before the worker stops.
+        self.assertEqual(60, len(futures) + len(refused))
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(len(futures), Alias.objects.count())
+
+
+class AliasSearchTest(TestCase):
+    """Test case for prefix and substring search of alias values."""
+    moment = timezone.now()
+
+    def setUp(self):
+        for number, (alias, target) in enumerate([('red-apple', 'fruit'), ('red-cherry', 'fruit'),
+                                                  ('Green-Apple', 'fruit'), ('red-car', 'car'), ('redo', 'car')]):
+            Alias.objects.create(alias=alias, target=target, start=self.moment + datetime.timedelta(hours=number),
+                                 end=self.moment + datetime.timedelta(hours=number + 1))
+
+    def aliases(self, *args, **kwargs):
+        return [alias.alias for alias in Alias.search(*args, **kwargs)]
+
+    def test_prefix(self):
+        self.assertEqual(['red-apple', 'red-car', 'red-cherry'], self.aliases('red-'))
+        self.assertEqual(['red-apple', 'red-cherry'], self.aliases('red', target='fruit'))
+        self.assertEqual(['red-apple', 'red-car'], self.aliases('red', limit=2))
+        self.assertEqual(['red-car'], self.aliases('red', from_=self.moment + datetime.timedelta(hours=3),
+                                                   to=self.moment + datetime.timedelta(hours=4)))
+
+        # The range of the alias index is used instead of a LIKE scan.
+        with connection.cursor() as cursor:
+            sql, params = Alias.objects.filter(alias__gte='red', alias__lt='red\U0010ffff').query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            self.assertIn('alias_alias_target_start_idx', ' '.join(str(row) for row in cursor.fetchall()))
+
+    def test_substring(self):
+        self.assertEqual(['Green-Apple', 'red-apple'], self.aliases('apple', mode='substring'))
+        self.assertEqual(['red-car'], self.aliases('car', mode='substring', target='car'))
+        # Too short for trigrams.
+        self.assertEqual(['Green-Apple', 'red-apple'], self.aliases('pp', mode='substring'))
+
+        # The index follows writes.
+        Alias.alias_replace('red-car', self.moment + datetime.timedelta(hours=3, minutes=30), 'blue-car')
+        Alias.objects.get(alias='redo').delete()
+        self.assertEqual(['blue-car', 'red-car'], self.aliases('-car', mode='substring'))
+        self.assertEqual([], self.aliases('redo', mode='substring'))
+
+        with QueryCounter() as counter:
+            self.aliases('apple', mode='substring')
+        self.assertIn('alias_alias_search', counter.queries[-1])
+
+    def test_view(self):
+        response = self.client.get('/search/', {'q': 'cherry', 'mode': 'substring'})
+        self.assertEqual(['red-cherry'], [row['alias'] for row in response.json()['results']])
+        self.assertEqual(400, self.client.get('/search/', {'q': 'red', 'mode': 'fuzzy'}).status_code)
+        self.assertEqual(400, self.client.get('/search/').status_code)
+
+
+@override_settings(ALIAS_ARCHIVE=True)
+class AliasArchiveTest(TestCase):
+    """Test case for archival of ended aliases."""
+
+    def setUp(self):
+        self.moment = timezone.now() - datetime.timedelta(days=10)
+        day = datetime.timedelta(days=1)
+        # Adjacent intervals of one pair, an ended and an active alias.
+        for alias, start, end in [('old', 0, 1), ('old', 1, 2), ('old', 2, 3), ('older', 0, 1), ('new', 1, None)]:
+            Alias.objects.create(alias=alias, target='test-target', start=self.moment + start * day,
+                                 end=end and self.moment + end * day)
+        self.day = day
+
+    def archive(self, days):
+        out = io.StringIO()
+        call_command('archive_aliases', '--before', (self.moment + days * self.day).isoformat(),
+                     '--chunk-size', '2', stdout=out)
+        return out.getvalue()
+
+    def test_archive(self):
+        self.assertIn('4 aliases ended by', self.archive(3))
+        self.assertEqual(['new'], list(Alias.objects.values_list('alias', flat=True)))
+        self.assertEqual([('old', self.moment, self.moment + 3 * self.day),
+                          ('older', self.moment, self.moment + self.day)],
+                         list(AliasArchive.objects.order_by('alias').values_list('alias', 'start', 'end')))
+
+        # Later archived intervals join the archived ones.
+        Alias.objects.create(alias='old', target='test-target', start=self.moment + 3 * self.day,
+                             end=self.moment + 4 * self.day)
+        self.archive(5)
+        self.assertEqual([(self.moment, self.moment + 4 * self.day)],
+                         list(AliasArchive.objects.filter(alias='old').values_list('start', 'end')))
+
+        with self.assertRaises(CommandError):
+            call_command('archive_aliases', '--days', '-1', stdout=io.StringIO())
+
+    def test_disabled(self):
+        with override_settings(ALIAS_ARCHIVE=False):
+            with self.assertRaises(CommandError):
+                self.archive(3)
+            with self.assertRaises(ImproperlyConfigured):
+                archive_aliases(self.moment + 3 * self.day, 'default')
+        self.assertEqual(5, Alias.objects.count())
+        self.assertFalse(AliasArchive.objects.exists())
+
+    def test_reads(self):
+        self.archive(3)
+        window = self.moment + datetime.timedelta(hours=12), self.moment + 4 * self.day
+        self.assertEqual({'old', 'older', 'new'}, Alias.get_aliases('test-target', *window))
+        self.assertEqual({'test-target': {'old', 'older', 'new'}},
+                         Alias.get_aliases_many(['test-target'], *window))
+        self.assertEqual({'old', 'older'}, Alias.active_aliases('test-target', window[0]))
+        self.assertEqual('test-target', Alias.resolve('old', window[0]))
+        self.assertEqual(['old', 'older', 'new'], [row[0] for row in Alias.timeline('test-target', *window)])
+
+        # After the cutoff the archive is not read, the cutoff is a condition of the archive query.
+        self.assertEqual({'new'}, Alias.get_aliases('test-target', self.moment + 3 * self.day, window[1]))
+        self.assertFalse(AliasArchive.before(self.moment + 3 * self.day).exists())
+
+        # A cutoff advanced by another connection or process is seen by the next read.
+        AliasArchive.objects.create(alias='oldest', target='test-target', start=self.moment + 3 * self.day,
+                                    end=self.moment + 4 * self.day)
+        AliasArchiveCutoff.objects.filter(pk=1).update(cutoff=self.moment + 5 * self.day)
+        self.assertEqual({'new', 'oldest'},
+                         Alias.get_aliases('test-target', self.moment + 3 * self.day, window[1]))
+        self.assertIn('oldest', [row[0] for row in Alias.timeline('test-target', self.moment + 3 * self.day,
+                                                                  window[1])])
+
+        with override_settings(ALIAS_ARCHIVE=False):
+            self.assertEqual({'new'}, Alias.get_aliases('test-target', *window))
+
+    def test_overlap(self):
+        self.archive(3)
+        with self.assertRaises(ValidationError):
+            Alias.objects.create(alias='old', target='test-target', start=self.moment + self.day,
+                                 end=self.moment + 2 * self.day)
+        with self.assertRaises(ValidationError):
+            Alias.alias_replace_many({'new': 'old'}, self.moment + 2 * self.day)
+        report = Alias.bulk_import([{'alias': 'older', 'target': 'test-target',
+                                     'start': (self.moment + datetime.timedelta(hours=1)).isoformat(),
+                                     'end': (self.moment + 2 * self.day).isoformat()}])
+        self.assertEqual(1, report['rejected'])
+        Alias.objects.create(alias='old', target='test-target', start=self.moment + 3 * self.day)
+
+    def test_shared_alias(self):
+        # resolve() prefers the latest start, merging would move it before the start of the other target.
+        for start, end in [(0, 1), (1, 2)]:
+            Alias.objects.create(alias='shared', target='test-target', start=self.moment + start * self.day,
+                                 end=self.moment + end * self.day)
+        Alias.objects.create(alias='shared', target='other-target', start=self.moment + self.day / 2)
+        at = self.moment + 1.5 * self.day
+        self.assertEqual('test-target', Alias.resolve('shared', at))
+
+        self.archive(3)
+        self.assertEqual(2, AliasArchive.objects.filter(alias='shared').count())
+        self.assertEqual('test-target', Alias.resolve('shared', at))
+
+
+class AliasTimelineTest(TestCase):
+    """Test case for timeline, gaps and coverage of a target."""
+
+    def setUp(self):
+        self.moment = datetime.datetime(2021, 1, 1, tzinfo=timezone.utc)
+        for alias, start, end in [('a', 30, 120), ('b', 60, 90), ('c', 195, None), ('d', -1440, 10)]:
+            Alias.objects.create(alias=alias, target='test-target', start=self.at(start), end=end and self.at(end))
+        Alias.objects.create(alias='e', target='other-target', start=self.at(0))
+
+    def at(self, minutes):
+        return self.moment + datetime.timedelta(minutes=minutes)
+
+    def test_timeline(self):
+        with QueryCounter() as counter:
+            self.assertEqual([('d', self.at(0), self.at(10)), ('a', self.at(30), self.at(120)),
+                              ('b', self.at(60), self.at(90)), ('c', self.at(195), self.at(300))],
+                             list(Alias.timeline('test-target', self.at(0), self.at(300))))
+        self.assertEqual(1, counter.count)
+        self.assertEqual([(self.at(10), self.at(30)), (self.at(120), self.at(195))],
+                         list(Alias.gaps('test-target', self.at(0), self.at(300))))
+        self.assertEqual([(self.at(0), self.at(60))], list(Alias.gaps('no-target', self.at(0), self.at(60))))
+
+    def test_coverage(self):
+        self.assertEqual([(self.at(0), 2), (self.at(60), 2), (self.at(120), 0), (self.at(180), 1), (self.at(240), 1)],
+                         list(Alias.coverage('test-target', self.at(0), self.at(300))))
+        self.assertEqual([(self.moment - datetime.timedelta(days=1), 1), (self.moment, 4)],
+                         list(Alias.coverage('test-target', self.at(-600), self.at(300), bucket='day')))
+        self.assertEqual(list(analytics._count_changes(connection, 'test-target', self.at(0), self.at(300), 'hour')),
+                         list(analytics._count_changes_python('test-target', self.at(0), self.at(300), 'hour')))
+        with self.assertRaises(ValidationError):
+            Alias.coverage('test-target', self.at(0), self.at(300), bucket='week')
+
+    def test_view(self):
+        params = {'target': 'test-target', 'from': self.at(0).isoformat(), 'to': self.at(300).isoformat()}
+        response = self.client.get('/timeline/', params)
+        self.assertEqual(['d', 'a', 'b', 'c'],
+                         [row['alias'] for row in json.loads(b''.join(response.streaming_content))['results']])
+        response = self.client.get('/timeline/', dict(params, report='coverage', bucket='day'))
+        self.assertEqual([{'bucket': '2021-01-01T00:00:00Z', 'aliases': 4}],
+                         json.loads(b''.join(response.streaming_content))['results'])
+        self.assertEqual(400, self.client.get('/timeline/', dict(params, report='median')).status_code)
+
+
+class AliasAdminTest(TestCase):
+    """Test case for the admin of aliases."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        hour = datetime.timedelta(hours=1)
+        for alias, target, start, end in [('red-apple', 'apple', -2 * hour, None), ('green-apple', 'apple', -hour, None),
+                                          ('red-car', 'car', -3 * hour, -hour), ('blue-car', 'car', hour, None)]:
+            Alias.objects.create(alias=alias, target=target, start=self.now + start, end=end and self.now + end)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def aliases(self, **params):
+        response = self.client.get('/admin/alias/alias/', params)
+        self.assertEqual(200, response.status_code)
+        return sorted(alias.alias for alias in response.context['cl'].result_list)
+
+    def test_changelist(self):
+        self.assertEqual(['blue-car', 'green-apple', 'red-apple', 'red-car'], self.aliases())
+        self.assertEqual(['green-apple', 'red-apple'], self.aliases(state='active'))
+        self.assertEqual(['blue-car'], self.aliases(state='future'))
+        self.assertEqual(['blue-car', 'red-car'], self.aliases(target='car'))
+        self.assertEqual(['red-apple', 'red-car'], self.aliases(q='red'))
+        self.assertEqual(['blue-car', 'red-car'], self.aliases(q='car'))
+        self.assertEqual(4, len(self.aliases(started=str(self.now.year))))
+        with override_settings(ALIAS_ACTIVE_PROJECTION=True):
+            call_command('active_aliases', 'rebuild', stdout=io.StringIO())
+            self.assertEqual(['green-apple', 'red-apple'], self.aliases(state='active'))
+
+        with QueryCounter() as counter:
+            self.aliases(state='active', target='apple')
+        self.assertFalse([query for query in counter.queries if 'COUNT(*)' in query and 'LIMIT' not in query])
+        self.assertFalse([query for query in counter.queries if 'DISTINCT' in query])
+
+    def test_estimated_count(self):
+        with mock.patch.object(EstimatedCountPaginator, 'count_limit', 2):
+            self.assertEqual(Alias.objects.aggregate(Max('pk'))['pk__max'],
+                             EstimatedCountPaginator(Alias.objects.order_by('-id'), 100).count)
+            self.assertEqual(3, EstimatedCountPaginator(Alias.objects.filter(start__lte=self.now).order_by('-id'), 100).count)
+
+    def test_actions(self):
+        pks = list(Alias.objects.filter(target='apple').values_list('pk', flat=True))
+        response = self.client.post('/admin/alias/alias/', {'action': 'close_aliases', '_selected_action': pks,
+                                                            'at': ''})
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(set(), Alias.active_aliases('apple'))
+        self.assertFalse(Alias.objects.filter(target='apple', end__isnull=True).exists())
+
+        pks = list(Alias.objects.filter(target='car').values_list('pk', flat=True))
+        self.client.post('/admin/alias/alias/', {'action': 'replace_aliases', '_selected_action': pks,
+                                                 'at': (self.now + 2 * datetime.timedelta(hours=1)).strftime(
+                                                     '%Y-%m-%d %H:%M:%S'), 'new_alias': '{alias}-v2'})
+        self.assertEqual('car', Alias.resolve('blue-car-v2', self.now + datetime.timedelta(hours=3)))
+
+        self.client.post('/admin/alias/alias/', {'action': 'delete_selected', '_selected_action': pks, 'post': 'yes'})
+        self.assertEqual(['blue-car-v2'], list(Alias.objects.filter(target='car').values_list('alias', flat=True)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,15 @@
 from django.urls import path
 
+from .instrumentation import metrics
 from .views import *
 
 urlpatterns = [
     path('', index),
+    path('aliases/', aliases),
+    path('resolve/', resolve),
+    path('replace/', replace),
+    path('changes/', changes),
+    path('search/', search),
+    path('timeline/', timeline),
+    path('metrics/', metrics),
 ]
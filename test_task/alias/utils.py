@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+
+class QueryCounter:
+    """
+    Count queries issued to the database inside of the context.
+
+    Works without DEBUG, since queries are counted by an execute wrapper
+    of the connection.
+
+    >> with QueryCounter() as counter:
+    ..     Alias.objects.create(alias='alias', target='target', start=moment)
+    >> counter.count
+    2
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+            self.queries.append(sql)
+
+    def __enter__(self):
+        self._wrapper = connections[self.using].execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wrapper.__exit__(exc_type, exc_value, traceback)
+        self._wrapper = None
+
+
+def chunks(values, size):
+    """Return list of consecutive slices of values of at most size items."""
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+class AsyncCapableMiddleware:
+    """
+    Base of middleware, which is sync and async capable, so it does not make
+    Django adapt async views to a thread under ASGI.
+
+    Subclasses handle requests in _call(request) and in the coroutine _acall(request).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Django recognizes the instance as async, like instances of MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        return self._call(request)
+
+    def _call(self, request):
+        raise NotImplementedError
+
+    async def _acall(self, request):
+        raise NotImplementedError
+
+
+class SettingExecutor:
+    """
+    Thread pool of database work, created on first use and again after its setting changes.
+
+    Calls run in a copy of the context of the caller (e.g. instrumentation of the request).
+    Pool threads keep their connections between calls like request threads do, subject to CONN_MAX_AGE.
+    """
+
+    def __init__(self, setting, max_workers, thread_name_prefix):
+        """
+        Keyword arguments:
+            setting -- name of the setting sizing the pool.
+            max_workers -- callable returning the number of threads.
+            thread_name_prefix -- prefix of names of the threads.
+        """
+        self.setting = setting
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._lock = threading.Lock()
+        setting_changed.connect(self._reset, weak=False)
+
+    def submit(self, func, *args, **kwargs):
+        """Return future of func(*args, **kwargs) called in the pool."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers(),
+                                                        thread_name_prefix=self._thread_name_prefix)
+        return self._executor.submit(contextvars.copy_context().run, self._call, func, args, kwargs)
+
+    @staticmethod
+    def _call(func, args, kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    def _reset(self, setting, **kwargs):
+        if setting == self.setting and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
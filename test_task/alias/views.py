@@ -1,12 +1,320 @@
-from django.shortcuts import render
-from django.http import HttpResponse
-from .models import Alias
+import heapq
+import itertools
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
+from django.db import OperationalError
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+
+from .models import Alias, AliasChange
+from .sharding import fan_out, get_shards
+
+FIELDS = ('id', 'alias', 'target', 'start', 'end')
+CHANGE_FIELDS = ('id', 'action', 'alias_pk', 'alias', 'target', 'start', 'end', 'changed_at')
+CHANGES_MAX_LIMIT = 10000
+SEARCH_MAX_LIMIT = 1000
+
+
+def _parse_moment(value: str, name: str):
+    """Return datetime of a query parameter, raise ValidationError for invalid values."""
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError(f'Invalid {name} value!')
+    return Alias._moment(moment)
+
+
+def _list_queryset(params):
+    """
+    Return (queryset, order, cursor) of aliases filtered by query parameters.
+
+    Query parameters:
+        target -- only aliases of the target.
+        from, to -- only aliases active in the time range.
+        order -- keyset order: id (default) or start (start, id).
+        after -- cursor: the next value of a previous page, see _after.
+    """
+    order = params.get('order', 'id')
+    if order not in ('id', 'start'):
+        raise ValidationError('Order has to be id or start!')
+
+    data = Alias.objects.all()
+    if params.get('target'):
+        data = data.filter(target=params['target'])
+    if params.get('from'):
+        data = data.filter(Alias._ends_after(_parse_moment(params['from'], 'from')))
+    if params.get('to'):
+        data = data.filter(start__lt=_parse_moment(params['to'], 'to'))
+
+    cursor = _parse_cursor(params['after'], order) if params.get('after') else None
+    return data.order_by(*(('id',) if order == 'id' else ('start', 'id'))), order, cursor
+
+
+def _parse_cursor(after: str, order: str):
+    """Return (start or None, id, shard index or None) of cursor: id or start,id; with :shard if sharded."""
+    start = None
+    if order == 'start':
+        start, _, after = after.rpartition(',')
+    pk, _, shard = after.partition(':')
+    if not pk.isdigit() or not (shard.isdigit() or shard == ''):
+        raise ValidationError('Invalid cursor!')
+    if order == 'start':
+        start = _parse_moment(start, 'cursor')
+    return start, int(pk), int(shard) if shard else None
+
+
+def _after(data, cursor, shard: int = None):
+    """Return rows of queryset after cursor, shard is the index of the queried shard."""
+    start, pk, cursor_shard = cursor
+    # Ids are unique per shard only, rows with the key of the cursor are ordered by shard index.
+    if shard is not None and cursor_shard is not None and shard > cursor_shard:
+        after = Q(id__gte=pk)
+    else:
+        after = Q(id__gt=pk)
+    if start is not None:
+        after = Q(start__gt=start) | Q(start=start) & after
+    return data.filter(after)
+
+
+def _cursor(row, order):
+    key = str(row[0]) if order == 'id' else f'{row[3].isoformat()},{row[0]}'
+    # Rows of shards end with the shard index.
+    return key if len(row) == len(FIELDS) else f'{key}:{row[-1]}'
+
+
+def _shard_rows(data, order, cursor, limit, chunk_size):
+    """Return rows of queryset from all ALIAS_SHARDS merged in the list order, tagged with the shard index."""
+    shards = get_shards()
+
+    def rows(index):
+        shard_data = data.using(shards[index])
+        if cursor:
+            shard_data = _after(shard_data, cursor, index)
+        shard_data = shard_data.values_list(*FIELDS)
+        if limit:
+            return [row + (index,) for row in shard_data[:limit]]
+        return (row + (index,) for row in shard_data.iterator(chunk_size=chunk_size))
+
+    # Pages are read from shards in parallel, full lists are streamed from all shards at once.
+    # Positions of the ordering fields: (id) or (start, id).
+    positions = (0,) if order == 'id' else (3, 0)
+    merged = heapq.merge(*fan_out(rows, range(len(shards))),
+                         key=lambda row: tuple(row[position] for position in positions) + (row[-1],))
+    return itertools.islice(merged, limit) if limit else merged
+
+
+def _stream_rows(rows, order, limit, chunk_size):
+    """Yield JSON document of rows piece by piece."""
+    yield '{"results": ['
+    pieces, count, row = [], 0, None
+    for row in rows:
+        pieces.append(('' if count == 0 else ',') + json.dumps(dict(zip(FIELDS, row)), cls=DjangoJSONEncoder))
+        count += 1
+        if len(pieces) >= chunk_size:
+            yield ''.join(pieces)
+            pieces = []
+    yield ''.join(pieces)
+
+    # A full page may have more rows after it.
+    next_cursor = _cursor(row, order) if limit and count == limit else None
+    yield '], "next": ' + json.dumps(next_cursor) + '}'
 
 
 def index(request):
-    smth = Alias.objects.all()
-    data =[]
-    for item in smth:
-        data.append((item.alias, item.target, item.start, item.end))
-    return HttpResponse(f'{data}')
+    """
+    Stream aliases as JSON: {"results": [...], "next": cursor or null}.
+
+    Rows are read with a server-side iterator in chunks of ALIAS_LIST_CHUNK_SIZE,
+    so memory does not depend on the table size. With the limit query parameter
+    the response is a page, next is the cursor of the following page. With
+    ALIAS_SHARDS rows of all shards are merged.
+
+    Under ASGI Django iterates streaming responses on the event loop, where the
+    database can not be used, so the page (ALIAS_LIST_ASGI_LIMIT rows by
+    default) is rendered here.
+    """
+    chunk_size = getattr(settings, 'ALIAS_LIST_CHUNK_SIZE', 2000)
+    try:
+        data, order, cursor = _list_queryset(request.GET)
+        limit = request.GET.get('limit')
+        if limit is not None and not (limit.isdigit() and int(limit) > 0):
+            raise ValidationError('Limit has to be a positive integer!')
+        limit = limit and int(limit)
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages}, status=400)
+
+    asgi = isinstance(request, ASGIRequest)
+    if asgi:
+        limit = limit or getattr(settings, 'ALIAS_LIST_ASGI_LIMIT', 1000)
+    if get_shards():
+        rows = _shard_rows(data, order, cursor, limit, chunk_size)
+    else:
+        if cursor:
+            data = _after(data, cursor)
+        if limit:
+            data = data[:limit]
+        rows = data.values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    if asgi:
+        return HttpResponse(''.join(_stream_rows(rows, order, limit, chunk_size)), content_type='application/json')
+    return StreamingHttpResponse(_stream_rows(rows, order, limit, chunk_size), content_type='application/json')
+
+
+def changes(request):
+    """
+    Return {"changes": [...], "next": cursor} of alias changes after a cursor (GET after, limit).
+
+    Consumers pass next as after of the following call; it does not move while
+    there are no new changes.
+    """
+    if not AliasChange.enabled():
+        raise Http404('Change log is disabled.')
+    try:
+        limit = request.GET.get('limit', '1000')
+        if not (limit.isdigit() and int(limit) > 0):
+            raise ValidationError('Limit has to be a positive integer!')
+        data, next_cursor = Alias.changes(request.GET.get('after'), limit=min(int(limit), CHANGES_MAX_LIMIT))
+    except ValidationError as error:
+        return _error(error)
+    return JsonResponse({'changes': [{field: getattr(change, field) for field in CHANGE_FIELDS} for change in data],
+                         'next': next_cursor})
+
+
+def search(request):
+    """
+    Return {"results": [...]} of aliases matching a query (GET q, mode, target, from, to, limit).
+
+    Mode is prefix (default, for autocomplete) or substring, see Alias.search.
+    """
+    try:
+        limit = request.GET.get('limit', '20')
+        if not (limit.isdigit() and int(limit) > 0):
+            raise ValidationError('Limit has to be a positive integer!')
+        from_ = _parse_moment(request.GET['from'], 'from') if request.GET.get('from') else None
+        to = _parse_moment(request.GET['to'], 'to') if request.GET.get('to') else None
+        data = Alias.search(request.GET.get('q', ''), mode=request.GET.get('mode', 'prefix'),
+                            target=request.GET.get('target'), from_=from_, to=to,
+                            limit=min(int(limit), SEARCH_MAX_LIMIT))
+    except ValidationError as error:
+        return _error(error)
+    return JsonResponse({'results': [{field: getattr(alias, field) for field in FIELDS} for alias in data]})
+
+
+def timeline(request):
+    """
+    Stream {"results": [...]} of a report of target in a time range (GET target, from, to, report, bucket).
+
+    Report is timeline (default, aliases clipped to the range), gaps or
+    coverage (number of aliases per hour or day bucket), see Alias.timeline,
+    Alias.gaps and Alias.coverage.
+    """
+    try:
+        if not request.GET.get('target'):
+            raise ValidationError('Target is required!')
+        target = request.GET['target']
+        from_ = _parse_moment(request.GET.get('from', ''), 'from')
+        to = _parse_moment(request.GET.get('to', ''), 'to')
+        report = request.GET.get('report', 'timeline')
+        if report == 'timeline':
+            rows = ({'alias': alias, 'start': start, 'end': end} for alias, start, end in
+                    Alias.timeline(target, from_, to))
+        elif report == 'gaps':
+            rows = ({'start': start, 'end': end} for start, end in Alias.gaps(target, from_, to))
+        elif report == 'coverage':
+            rows = ({'bucket': bucket, 'aliases': count} for bucket, count in
+                    Alias.coverage(target, from_, to, request.GET.get('bucket', 'hour')))
+        else:
+            raise ValidationError('Report has to be timeline, gaps or coverage!')
+    except ValidationError as error:
+        return _error(error)
+
+    pieces = _stream_results(rows, getattr(settings, 'ALIAS_LIST_CHUNK_SIZE', 2000))
+    # Under ASGI the database can not be used while the response is iterated, see index.
+    if isinstance(request, ASGIRequest):
+        return HttpResponse(''.join(pieces), content_type='application/json')
+    return StreamingHttpResponse(pieces, content_type='application/json')
+
+
+def _stream_results(rows, chunk_size):
+    """Yield JSON document {"results": [...]} of row dicts piece by piece."""
+    yield '{"results": ['
+    pieces = []
+    for count, row in enumerate(rows):
+        pieces.append(('' if count == 0 else ',') + json.dumps(row, cls=DjangoJSONEncoder))
+        if len(pieces) >= chunk_size:
+            yield ''.join(pieces)
+            pieces = []
+    yield ''.join(pieces) + ']}'
+
+
+def _error(error: ValidationError):
+    return JsonResponse({'error': error.messages}, status=400)
+
+
+async def aliases(request):
+    """Return {"aliases": [...]} of target in the from-to time range (GET target, from, to)."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        if not request.GET.get('target'):
+            raise ValidationError('Target is required!')
+        from_ = _parse_moment(request.GET.get('from', ''), 'from')
+        to = _parse_moment(request.GET.get('to', ''), 'to')
+        result = await Alias.aget_aliases(request.GET['target'], from_, to)
+    except ValidationError as error:
+        return _error(error)
+    return JsonResponse({'aliases': sorted(result)})
+
+
+async def resolve(request):
+    """Return {"alias": ..., "target": ... or null} of alias at a moment (GET alias, at; now by default)."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        if not request.GET.get('alias'):
+            raise ValidationError('Alias is required!')
+        at = _parse_moment(request.GET['at'], 'at') if request.GET.get('at') else None
+        target = await Alias.aresolve(request.GET['alias'], at)
+    except ValidationError as error:
+        return _error(error)
+    return JsonResponse({'alias': request.GET['alias'], 'target': target})
+
+
+async def replace(request):
+    """Replace alias (POST a JSON object of existing, new, at) and return the new alias."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    # The view is exempt from CSRF checks, a JSON body can not be posted by a cross-site form.
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': ['Content type application/json is required!']}, status=415)
+    try:
+        try:
+            params = json.loads(request.body)
+        except ValueError:
+            raise ValidationError('Invalid JSON!')
+        if not isinstance(params, dict):
+            raise ValidationError('JSON object is required!')
+        if not params.get('existing') or not params.get('new'):
+            raise ValidationError('Existing and new alias values are required!')
+        at = _parse_moment(params['at'], 'at') if params.get('at') else Alias._moment()
+        alias = await Alias.aalias_replace(params['existing'], at, params['new'])
+    except ValidationError as error:
+        return _error(error)
+    except OperationalError as error:
+        # SQLite waited for the write lock of concurrent writers up to its busy timeout.
+        if 'locked' not in str(error):
+            raise
+        response = JsonResponse({'error': ['Database is busy, retry later!']}, status=503)
+        response['Retry-After'] = '1'
+        return response
+    return JsonResponse({field: getattr(alias, field) for field in FIELDS}, status=201)
+
 
+# csrf_exempt wraps async views into sync ones in this Django version.
+replace.csrf_exempt = True
@@ -0,0 +1,201 @@
+"""Group-commit writer coalescing alias writes of many threads into batched transactions."""
+import itertools
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.db import close_old_connections, router, transaction
+from django.dispatch import receiver
+
+from .bulk import _build_alias, _Interval, validate_chunk
+from .models import Alias
+from .sharding import get_shards, shard_for
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class _Request:
+    __slots__ = ('kind', 'args', 'future')
+
+    def __init__(self, kind, args):
+        self.kind, self.args, self.future = kind, args, Future()
+
+
+class AliasWriter:
+    """
+    Write aliases submitted by many threads in batched transactions.
+
+    A worker thread takes all queued requests (up to max_batch, waiting up to
+    max_delay seconds for more) and writes them in one transaction per
+    database: consecutive creations are validated together like an import
+    chunk and inserted with one bulk_create, replacements run alias_replace
+    in savepoints. Requests are applied in the order of submission. Futures
+    are resolved after the commit, with the alias or the ValidationError of
+    the request. If a batch fails as a whole (e.g. by an IntegrityError of
+    the overlap trigger), its requests are written again one by one, so only
+    the failing request gets the error.
+    """
+
+    def __init__(self, max_batch: int = 500, max_delay: float = 0):
+        self.max_batch, self.max_delay = max_batch, max_delay
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        # Requests are not queued after the stop of the worker.
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='alias-writer', daemon=True)
+        self._thread.start()
+
+    def create(self, alias: str, target: str, start, end=None):
+        """Return future of the created Alias instance."""
+        return self._submit('create', {'alias': alias, 'target': target, 'start': start, 'end': end})
+
+    def replace(self, existing_alias: str, replace_at, new_alias_value: str):
+        """Return future of the new Alias instance of alias_replace."""
+        return self._submit('replace', (existing_alias, replace_at, new_alias_value))
+
+    def _submit(self, kind, args):
+        request = _Request(kind, args)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Alias writer is closed.')
+            self._queue.put(request)
+        return request.future
+
+    def close(self, wait: bool = True):
+        """Stop the worker after writing queued requests."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+            self._write([request for request in batch if request.future.set_running_or_notify_cancel()])
+
+    def _write(self, batch):
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            results, written = self._apply(batch)
+        except Exception as error:
+            failure = error
+        else:
+            failure = None
+        finally:
+            close_old_connections()
+
+        if failure is not None:
+            if len(batch) == 1:
+                batch[0].future.set_exception(failure)
+                return
+            for request in batch:
+                self._write([request])
+            return
+
+        self.batches += 1
+        for using, (targets, aliases) in written.items():
+            Alias._invalidate(targets=targets, aliases=aliases, using=using)
+        for request, result in zip(batch, results):
+            if isinstance(result, ValidationError):
+                request.future.set_exception(result)
+            else:
+                request.future.set_result(result)
+
+    def _apply(self, batch):
+        """Write batch, return (results by request, dict of database -> written (targets, aliases))."""
+        results = [None] * len(batch)
+        written = defaultdict(lambda: (set(), set()))
+        with ExitStack() as transactions:
+            for using in get_shards() or (router.db_for_write(Alias),):
+                transactions.enter_context(transaction.atomic(using=using))
+
+            positions = range(len(batch))
+            for kind, group in itertools.groupby(positions, key=lambda position: batch[position].kind):
+                if kind == 'create':
+                    self._create(batch, list(group), results, written)
+                    continue
+                for position in group:
+                    # alias_replace runs in a savepoint, a failed replacement leaves the batch usable.
+                    try:
+                        results[position] = Alias.alias_replace(*batch[position].args)
+                    except ValidationError as error:
+                        results[position] = error
+        return results, written
+
+    @staticmethod
+    def _create(batch, positions, results, written):
+        candidates = []
+        for position in positions:
+            try:
+                candidates.append(_Interval(position, batch[position].args, _build_alias(batch[position].args)))
+            except ValidationError as error:
+                results[position] = error
+            except (TypeError, ValueError) as error:
+                results[position] = ValidationError(str(error))
+
+        databases = defaultdict(list)
+        for item in candidates:
+            databases[shard_for(item.alias.target) or router.db_for_write(Alias)].append(item)
+        for using, items in databases.items():
+            accepted, rejected = validate_chunk(items, using=using)
+            created = Alias.objects.using(using).bulk_create([item.alias for item in accepted])
+            Alias._set_created_pks(created, using)
+            Alias._record_created(created, using)
+            for item in accepted:
+                results[item.line] = item.alias
+                written[using][0].add(item.alias.target)
+                written[using][1].add(item.alias.alias)
+            for item, message in rejected:
+                results[item.line] = ValidationError(message)
+
+
+def get_writer():
+    """Return the shared writer configured by ALIAS_WRITER_MAX_BATCH and ALIAS_WRITER_MAX_DELAY."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AliasWriter(max_batch=getattr(settings, 'ALIAS_WRITER_MAX_BATCH', 500),
+                                      max_delay=getattr(settings, 'ALIAS_WRITER_MAX_DELAY', 0))
+    return _writer
+
+
+@receiver(setting_changed)
+def _reset_writer(setting, **kwargs):
+    global _writer
+    if setting in ('ALIAS_WRITER_MAX_BATCH', 'ALIAS_WRITER_MAX_DELAY') and _writer is not None:
+        _writer.close(wait=False)
+        _writer = None
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'alias.routers.ReplicaStickinessMiddleware',
+    'alias.instrumentation.AliasInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'test_task.urls'
@@ -78,9 +81,57 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Local read replica of the default database, only used if listed in
+    # ALIAS_READ_REPLICAS. Tests mirror it to the default database.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+    # Local second shard, only used if listed in ALIAS_SHARDS.
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_shard_1.sqlite3',
+    },
 }
 
+# Alias reads go to one of these databases, writes to default (see alias.routers).
+ALIAS_READ_REPLICAS = [name for name in os.environ.get('ALIAS_READ_REPLICAS', '').split(',') if name]
+
+# Aliases are sharded by a hash of target across these databases, e.g. ['default', 'shard_1'],
+# every shard has to be migrated. Read replicas are not used with shards.
+ALIAS_SHARDS = [name for name in os.environ.get('ALIAS_SHARDS', '').split(',') if name]
+
+DATABASE_ROUTERS = ['alias.routers.AliasReplicaRouter']
+
+# Connection profile: "development" (default) or "production", chosen by the
+# DJANGO_DATABASE_PROFILE environment variable.
+DATABASE_PROFILE = os.environ.get('DJANGO_DATABASE_PROFILE', 'development')
+
+# Pragmas applied to every new SQLite connection (see alias.sqlite.apply_pragmas).
+ALIAS_SQLITE_PRAGMAS = {}
+
+# Leave the overlap check of Alias.save() to SQLite triggers, installed after migrate
+# or by `manage.py sqlite_overlap_trigger install`.
+ALIAS_SQLITE_OVERLAP_TRIGGER = False
+
+if DATABASE_PROFILE == 'production':
+    # Wait for the write lock instead of failing with "database is locked". The timeout sets
+    # the busy timeout of SQLite, so it is not repeated as a pragma.
+    DATABASES['default']['OPTIONS'] = {'timeout': 20}
+    ALIAS_SQLITE_PRAGMAS = {
+        # Readers do not block the writer and the writer does not block readers.
+        'journal_mode': 'WAL',
+        # Durable in WAL mode except for the last transactions on power loss.
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are KiB: 64 MiB page cache per connection.
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+    ALIAS_SQLITE_OVERLAP_TRIGGER = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -115,7 +166,78 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'aliases': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'aliases',
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Alias app
+
+# Store open-ended aliases with a max-timestamp sentinel instead of NULL, so range
+# lookups are a single sargable condition. Run `manage.py convert_open_ends` after
+# switching it on an existing database.
+ALIAS_OPEN_END_SENTINEL = False
+
+# Answer Alias.get_aliases from an in-process interval index per target, warmed
+# lazily and invalidated by Alias writes of this process.
+ALIAS_INTERVAL_INDEX = False
+ALIAS_INTERVAL_INDEX_TARGETS = 10000
+
+# Cache Alias.resolve results in process: dict with MAX_SIZE entries, TTL and BUCKET
+# seconds, e.g. {'MAX_SIZE': 10000, 'TTL': 60, 'BUCKET': 60}. None disables the cache.
+ALIAS_RESOLVE_CACHE = None
+
+# Rows fetched per database round-trip by the streaming aliases list.
+ALIAS_LIST_CHUNK_SIZE = 2000
+
+# Name of the cache in CACHES read through by Alias.get_aliases, None disables it.
+# Use a cache shared by worker processes (file, database, memcached); keys carry a
+# per-target version, which every write of the target bumps.
+ALIAS_SHARED_CACHE = None
+ALIAS_SHARED_CACHE_TIMEOUT = 300
+
+# Threads running blocking Alias database work of async views and aget_aliases,
+# aresolve and aalias_replace.
+ALIAS_ASYNC_WORKERS = 8
+
+# Default page size of the aliases list under ASGI, where Django 3.1 iterates
+# streaming responses on the event loop, so the page is rendered in the view.
+ALIAS_LIST_ASGI_LIMIT = 1000
+
+# Record queries, database and Python time and rows of Alias methods and views:
+# Server-Timing response headers and histograms at /metrics/.
+ALIAS_INSTRUMENTATION = False
+
+# Append writes of aliases to the AliasChange log in their transaction, consumers
+# read it incrementally with Alias.changes() or /changes/.
+ALIAS_CHANGE_LOG = False
+
+# Keep the ActiveAlias projection of not ended aliases, which serves resolve and
+# active_aliases of the current moment. Fill it with `manage.py active_aliases rebuild`
+# when enabling, and run `manage.py active_aliases sweep` periodically.
+ALIAS_ACTIVE_PROJECTION = False
+
+# Requests per transaction of alias.writer.get_writer() and seconds it waits for
+# more requests after the first one of a batch.
+ALIAS_WRITER_MAX_BATCH = 500
+ALIAS_WRITER_MAX_DELAY = 0
+
+# Consult the AliasArchive for time ranges before the archive cutoff, which
+# `manage.py archive_aliases` advances when moving ended aliases out of the alias table.
+# Reads reaching before the cutoff read it with one more query per database.
+ALIAS_ARCHIVE = False